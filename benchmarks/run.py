@@ -0,0 +1,553 @@
+"""
+GardenGes - Benchmarks das Netlify Functions em Python
+Latência (p50/p95/p99), throughput e pico de RSS dos handlers, com jardins sintéticos
+
+    python benchmarks/run.py                                 # 10, 1k e 100k plantas
+    python benchmarks/run.py --sizes 10,1000 --scenarios plants,sensors
+    python benchmarks/run.py --latency-ms 50 --groq-latency-ms 400
+    python benchmarks/run.py --compare benchmarks/results/antes.json
+
+Os handlers são chamados no próprio processo com eventos sintéticos. Cada
+cenário corre num processo novo (cold start real e pico de RSS só desse
+cenário), sobre uma cópia do estado do jardim: store de plantas, topologia,
+séries dos sensores, caches e outbox num directório temporário. O eWeLink, o
+ntfy.sh e a Groq são servidores locais com latência configurável (stubs.py).
+
+O resultado vai para JSON (por omissão benchmarks/results/<data>-<commit>.json);
+com --compare, cada cenário é comparado com um resultado anterior e o
+processo termina com código 1 se algum piorar mais do que --threshold.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS
+    resource = None
+
+import stubs
+
+ROOT = Path(__file__).resolve().parent.parent
+FUNCTIONS_DIR = ROOT / "netlify" / "functions"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+DEFAULT_SIZES = (10, 1000, 100000)
+
+# Forma dos jardins sintéticos: slots por andar, andares por torre, torres por site
+SLOTS_PER_FLOOR = 500
+FLOORS_PER_TOWER = 10
+TOWERS_PER_SITE = 10
+
+# Plantas gravadas por escrita ao gerar o jardim
+GENERATE_CHUNK = 10000
+
+# Nomes por pedido no cenário de consulta em lote
+BATCH_NAMES = 20
+
+Scenario = namedtuple("Scenario", "function garden event")
+
+
+# ----------------------------------------------------------------------
+# Cenários
+# ----------------------------------------------------------------------
+
+def _get(query=None, path=""):
+    return {"httpMethod": "GET", "path": path, "queryStringParameters": query or {}}
+
+
+def _post(body):
+    return {"httpMethod": "POST", "body": json.dumps(body)}
+
+
+def _put(plant_id, body):
+    return {"httpMethod": "PUT", "path": f"/.netlify/functions/plants/{plant_id}", "body": json.dumps(body)}
+
+
+# Cada cenário: (ficheiro da função, depende do tamanho do jardim, evento da iteração i)
+SCENARIOS = {
+    "plants:list": Scenario("plants", True, lambda ctx, i: _get()),
+    "plants:query": Scenario("plants", True, lambda ctx, i: _get({
+        "andar": str(ctx.floors[i % len(ctx.floors)]), "limit": "50"
+    })),
+    "plants:ndjson": Scenario("plants", True, lambda ctx, i: _get({"format": "ndjson"})),
+    "plants:update": Scenario("plants", True, lambda ctx, i: _put(
+        ctx.plant_ids[i % len(ctx.plant_ids)], {"ajuste_dias": i % 7}
+    )),
+    "calculate-watering:full": Scenario("calculate-watering", True, lambda ctx, i: _post({"notify": True})),
+    "calculate-watering:summary": Scenario("calculate-watering", True, lambda ctx, i: _post({
+        "notify": False, "include_recommendations": False
+    })),
+    "calculate-watering:incremental": Scenario("calculate-watering", True, lambda ctx, i: _post({
+        "incremental": True,
+        "notify": False,
+        "sensors": {str(ctx.floors[i % len(ctx.floors)]): {"humidity": 50 + i % 15, "temperature": 22}}
+    })),
+    "sensors:read": Scenario("sensors", True, lambda ctx, i: _get()),
+    "ai-lookup:catalog": Scenario("ai-lookup", False, lambda ctx, i: _post({
+        "name": ctx.catalog_names[i % len(ctx.catalog_names)]
+    })),
+    "ai-lookup:ai": Scenario("ai-lookup", False, lambda ctx, i: _post({"name": ctx.unknown_name(i)})),
+    "ai-lookup:cached": Scenario("ai-lookup", False, lambda ctx, i: _post({"name": ctx.unknown_name(0)})),
+    "ai-lookup:batch": Scenario("ai-lookup", False, lambda ctx, i: _post({
+        "names": [ctx.unknown_name(i * BATCH_NAMES + n) for n in range(BATCH_NAMES)]
+    })),
+}
+
+
+class Context:
+    """Dados do jardim usados para construir os eventos (lidos fora da medição)"""
+
+    def __init__(self, floors, plant_ids, catalog_names, run_id):
+        self.floors = floors or [1]
+        self.plant_ids = plant_ids or ["inexistente"]
+        self.catalog_names = catalog_names
+        self.run_id = run_id
+
+    def unknown_name(self, i):
+        # Nomes fora do catálogo (sem match aproximado), únicos por execução
+        return f"xq{self.run_id}z{i}kv"
+
+    @classmethod
+    def load(cls, garden):
+        from gardenges.catalog import open_catalog
+        from gardenges.topology import load_topology
+
+        plant_ids = []
+        if garden:
+            from gardenges.store import open_store
+            plants = open_store().all()
+            step = max(1, len(plants) // 1000)
+            plant_ids = [plant["id"] for plant in plants[::step]]
+        return cls(
+            load_topology().floor_ids(), plant_ids, open_catalog().names(),
+            f"{os.getpid()}{int(time.time())}"
+        )
+
+
+def select_scenarios(patterns):
+    """Cenários cujo nome ou função corresponde a um dos padrões ("plants", "plants:list")"""
+    if not patterns:
+        return list(SCENARIOS)
+    selected = [
+        name for name in SCENARIOS
+        if any(name == p or name.split(":")[0] == p for p in patterns)
+    ]
+    unknown = [p for p in patterns if not any(n == p or n.split(":")[0] == p for n in SCENARIOS)]
+    if unknown:
+        raise SystemExit(f"Cenários desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(SCENARIOS)})")
+    return selected
+
+
+# ----------------------------------------------------------------------
+# Jardins sintéticos
+# ----------------------------------------------------------------------
+
+def garden_floors(plants):
+    return list(range(1, max(1, math.ceil(plants / SLOTS_PER_FLOOR)) + 1))
+
+
+def garden_topology(floors):
+    """Topologia site → torre → andar com um sensor simulado por andar"""
+    sites = {}
+    for index, floor in enumerate(floors):
+        tower_index = index // FLOORS_PER_TOWER
+        site = sites.setdefault(f"site-{tower_index // TOWERS_PER_SITE + 1}", {})
+        tower = site.setdefault(f"torre-{tower_index + 1}", [])
+        tower.append({"id": floor, "slots": SLOTS_PER_FLOOR, "device": stubs.device_id(floor)})
+    return {"sites": [
+        {"id": site_id, "towers": [{"id": tower_id, "floors": floors} for tower_id, floors in towers.items()]}
+        for site_id, towers in sites.items()
+    ]}
+
+
+def state_env(directory):
+    """Env vars que levam todo o estado das funções para `directory`"""
+    directory = Path(directory)
+    return {
+        "GARDENGES_STORE_FILE": str(directory / "plants.jsonl"),
+        "GARDENGES_TOPOLOGY_FILE": str(directory / "topology.json"),
+        "GARDENGES_SERIES_DIR": str(directory / "series"),
+        "GARDENGES_HISTORY_DIR": str(directory / "history"),
+        "GARDENGES_FORECAST_FILE": str(directory / "forecast.json"),
+        "GARDENGES_NOTIFY_STATE": str(directory / "notify.json"),
+        "GARDENGES_OUTBOX_FILE": str(directory / "outbox.jsonl"),
+        "GARDENGES_AI_CACHE_FILE": str(directory / "ai_cache.sqlite3"),
+        "EWELINK_TOKEN_CACHE_FILE": str(directory / "ewelink_token.json"),
+        # As leituras do jardim gerado valem durante todo o benchmark
+        "GARDENGES_SENSOR_MAX_AGE": str(7 * 24 * 3600)
+    }
+
+
+def generate_garden(plants, seed):
+    """
+    Preenche o store e as séries do estado actual (env de state_env()) com
+    `plants` plantas do catálogo, distribuídas pelos andares da topologia
+    """
+    from gardenges.catalog import open_catalog
+    from gardenges.ids import new_id
+    from gardenges.store import open_store
+    from gardenges.timeseries import ingest_readings
+    from gardenges.topology import load_topology
+
+    rng = random.Random(seed)
+    catalog = open_catalog()
+    names = catalog.names()
+    floors = load_topology().floor_ids()
+    today = date.today()
+    store = open_store()
+
+    batch = []
+    for index in range(plants):
+        name = rng.choice(names)
+        data = catalog.get(name, description=False)
+        batch.append({
+            "id": new_id(),
+            "nome": name,
+            "andar": floors[index // SLOTS_PER_FLOOR],
+            "slot_index": index % SLOTS_PER_FLOOR,
+            "data_inicio": (today - timedelta(days=rng.randint(0, data["ciclo_total"]))).isoformat(),
+            "ajuste_dias": 0,
+            "ciclo_total": data["ciclo_total"],
+            "targets_humidade": data["targets_humidade"],
+            "created_at": datetime.now().isoformat()
+        })
+        if len(batch) == GENERATE_CHUNK:
+            store.insert_many(batch)
+            batch = []
+    if batch:
+        store.insert_many(batch)
+
+    ingest_readings({
+        floor: {"humidity": rng.randint(40, 75), "temperature": rng.randint(18, 26), "light": rng.randint(300, 900)}
+        for floor in floors
+    })
+
+
+# ----------------------------------------------------------------------
+# Worker (um cenário por processo)
+# ----------------------------------------------------------------------
+
+def load_function(name):
+    """Importa o ficheiro da função (os nomes têm hífens) como módulo"""
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), FUNCTIONS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux em KiB, macOS em bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(ordered, fraction):
+    """Percentil por nearest-rank de uma lista já ordenada"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_worker(name, iterations, warmup, max_seconds):
+    """Corre um cenário neste processo e devolve as métricas"""
+    scenario = SCENARIOS[name]
+    started = time.perf_counter()
+    module = load_function(scenario.function)
+    import_ms = (time.perf_counter() - started) * 1000
+    import_rss = peak_rss_mb()
+
+    ctx = Context.load(scenario.garden)
+    statuses = {}
+
+    def call(i):
+        begin = time.perf_counter()
+        response = module.handler(scenario.event(ctx, i), None)
+        elapsed = (time.perf_counter() - begin) * 1000
+        status = str(response.get("statusCode"))
+        statuses[status] = statuses.get(status, 0) + 1
+        return elapsed
+
+    first_call_ms = call(0)
+    for i in range(1, warmup + 1):
+        call(i)
+
+    latencies = []
+    loop_started = time.perf_counter()
+    for i in range(warmup + 1, warmup + 1 + iterations):
+        latencies.append(call(i))
+        if time.perf_counter() - loop_started >= max_seconds:
+            break
+    wall = time.perf_counter() - loop_started
+
+    ordered = sorted(latencies)
+    return {
+        "cold_start_ms": {"import": round(import_ms, 2), "first_call": round(first_call_ms, 2)},
+        "iterations": len(latencies),
+        "latency_ms": {
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p95": round(percentile(ordered, 0.95), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "mean": round(sum(ordered) / len(ordered), 3),
+            "min": round(ordered[0], 3),
+            "max": round(ordered[-1], 3)
+        },
+        "ops_per_sec": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "import_rss_mb": import_rss,
+        "status_codes": statuses
+    }
+
+
+# ----------------------------------------------------------------------
+# Orquestração
+# ----------------------------------------------------------------------
+
+def _subprocess(args, env, directory):
+    process = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), *args],
+        env={**os.environ, **env}, cwd=directory, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} falhou:\n{process.stdout[-4000:]}")
+    return process
+
+
+def prepare_garden(directory, plants, seed, env):
+    """Gera o estado base de um jardim (num processo à parte)"""
+    floors = garden_floors(plants)
+    with open(Path(directory) / "topology.json", "w", encoding="utf-8") as f:
+        json.dump(garden_topology(floors), f)
+    started = time.perf_counter()
+    _subprocess(["--generate", str(plants), "--seed", str(seed)], {**env, **state_env(directory)}, directory)
+    return floors, time.perf_counter() - started
+
+
+def run_scenario(name, base_dir, work_dir, env, args):
+    """Copia o estado base e corre o cenário num processo novo"""
+    shutil.rmtree(work_dir, ignore_errors=True)
+    shutil.copytree(base_dir, work_dir)
+    result_file = Path(work_dir) / "result.json"
+    _subprocess([
+        "--worker", name, "--result", str(result_file),
+        "--iterations", str(args.iterations), "--warmup", str(args.warmup),
+        "--max-seconds", str(args.max_seconds)
+    ], {**env, **state_env(work_dir)}, work_dir)
+    with open(result_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def git_info():
+    def git(*command):
+        try:
+            return subprocess.run(
+                ["git", *command], cwd=ROOT, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, text=True, timeout=30
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def has_numpy():
+    import importlib.util
+    return importlib.util.find_spec("numpy") is not None
+
+
+def run_all(args):
+    names = select_scenarios(args.scenarios)
+    garden_names = [n for n in names if SCENARIOS[n].garden]
+    other_names = [n for n in names if not SCENARIOS[n].garden]
+    sizes = args.sizes if garden_names else args.sizes[:1]
+
+    latency = {
+        "ewelink": args.ewelink_latency_ms if args.ewelink_latency_ms is not None else args.latency_ms,
+        "ntfy": args.ntfy_latency_ms if args.ntfy_latency_ms is not None else args.latency_ms,
+        "groq": args.groq_latency_ms if args.groq_latency_ms is not None else args.latency_ms
+    }
+    services = stubs.start_stubs([], latency["ewelink"], latency["ntfy"], latency["groq"])
+    env = {**stubs.env(services), "PYTHONDONTWRITEBYTECODE": "1"}
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="gardenges-bench-") as tmp:
+            for position, size in enumerate(sizes):
+                base_dir = Path(tmp) / f"garden-{size}"
+                base_dir.mkdir()
+                floors, generate_s = prepare_garden(base_dir, size, args.seed, env)
+                services["ewelink"].floors = floors
+                print(f"Jardim de {size} plantas ({len(floors)} andares) gerado em {generate_s:.1f}s")
+
+                # Cenários sem jardim (ai-lookup) só correm uma vez
+                todo = garden_names + (other_names if position == 0 else [])
+                for name in todo:
+                    for stub in services.values():
+                        stub.reset()
+                    result = run_scenario(name, base_dir, Path(tmp) / "work", env, args)
+                    endpoint, scenario = name.split(":")
+                    result = {
+                        "endpoint": endpoint,
+                        "scenario": scenario,
+                        "plants": size if SCENARIOS[name].garden else None,
+                        "floors": len(floors) if SCENARIOS[name].garden else None,
+                        **result,
+                        "stub_requests": {key: stub.reset() for key, stub in services.items()}
+                    }
+                    results.append(result)
+                    print_result(result)
+    finally:
+        for stub in services.values():
+            stub.stop()
+
+    return {
+        "meta": {
+            **git_info(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": has_numpy(),
+            "config": {
+                "sizes": list(sizes),
+                "iterations": args.iterations,
+                "warmup": args.warmup,
+                "max_seconds": args.max_seconds,
+                "latency_ms": latency,
+                "slots_per_floor": SLOTS_PER_FLOOR,
+                "seed": args.seed
+            }
+        },
+        "results": results
+    }
+
+
+# ----------------------------------------------------------------------
+# Relatório e comparação
+# ----------------------------------------------------------------------
+
+def result_key(result):
+    return f"{result['endpoint']}:{result['scenario']}@{result['plants'] if result['plants'] is not None else '-'}"
+
+
+def print_result(result):
+    latency = result["latency_ms"]
+    rss = result["peak_rss_mb"]
+    print(
+        f"  {result_key(result):<40} p50 {latency['p50']:>9.2f}ms  p95 {latency['p95']:>9.2f}ms  "
+        f"p99 {latency['p99']:>9.2f}ms  {result['ops_per_sec'] or 0:>9.1f} ops/s  "
+        f"RSS {rss if rss is not None else '-':>7} MB  (n={result['iterations']})"
+    )
+
+
+def compare(report, baseline, threshold, min_delta_ms):
+    """
+    Compara p95 e ops/s com um resultado anterior; devolve as regressões
+    Diferenças de p95 abaixo de `min_delta_ms` são ruído e nunca contam
+    """
+    previous = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\nComparação com {baseline.get('meta', {}).get('commit') or 'resultado anterior'}:")
+    for result in report["results"]:
+        key = result_key(result)
+        old = previous.get(key)
+        if old is None:
+            print(f"  {key:<40} (novo)")
+            continue
+        p95_change = result["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1 if old["latency_ms"]["p95"] else 0
+        ops_change = result["ops_per_sec"] / old["ops_per_sec"] - 1 if old["ops_per_sec"] else 0
+        delta_ms = result["latency_ms"]["p95"] - old["latency_ms"]["p95"]
+        regressed = delta_ms >= min_delta_ms and (p95_change > threshold or ops_change < -threshold)
+        if regressed:
+            regressions.append(key)
+        print(
+            f"  {key:<40} p95 {p95_change:+7.1%}  ops/s {ops_change:+7.1%}"
+            f"{'  ← regressão' if regressed else ''}"
+        )
+    return regressions
+
+
+def _sizes(value):
+    try:
+        sizes = [int(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("tamanhos são inteiros separados por vírgulas")
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError("pelo menos um tamanho, todos ≥ 1")
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das Netlify Functions em Python")
+    parser.add_argument("--sizes", type=_sizes, default=list(DEFAULT_SIZES),
+                        help="nº de plantas dos jardins (ex.: 10,1000,100000)")
+    parser.add_argument("--scenarios", type=lambda v: [s for s in v.split(",") if s],
+                        help="funções ou cenários a correr (ex.: plants,sensors:read)")
+    parser.add_argument("--iterations", type=int, default=200, help="iterações medidas por cenário")
+    parser.add_argument("--warmup", type=int, default=5, help="iterações de aquecimento (não medidas)")
+    parser.add_argument("--max-seconds", type=float, default=20,
+                        help="tempo máximo das iterações medidas de cada cenário")
+    parser.add_argument("--latency-ms", type=float, default=20, help="latência dos serviços simulados")
+    parser.add_argument("--ewelink-latency-ms", type=float)
+    parser.add_argument("--ntfy-latency-ms", type=float)
+    parser.add_argument("--groq-latency-ms", type=float)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="ficheiro JSON do resultado")
+    parser.add_argument("--compare", type=Path, help="resultado anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="piora relativa (p95 ou ops/s) que conta como regressão")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1,
+                        help="piora absoluta mínima do p95 para contar como regressão")
+    # Modos internos (processos filhos)
+    parser.add_argument("--generate", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.generate is not None or args.worker:
+        sys.path.insert(0, str(FUNCTIONS_DIR))
+        if args.generate is not None:
+            generate_garden(args.generate, args.seed)
+        else:
+            result = run_worker(args.worker, args.iterations, args.warmup, args.max_seconds)
+            with open(args.result, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+        return 0
+
+    report = run_all(args)
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        commit = (report["meta"]["commit"] or "local")[:10]
+        output = RESULTS_DIR / f"{stamp}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+GardenGes - Benchmarks: serviços externos simulados
+Servidores HTTP locais no lugar do eWeLink, ntfy.sh e Groq, com latência configurável
+
+Cada stub responde com o formato que as funções esperam e conta os pedidos
+recebidos, para o relatório mostrar quantas chamadas externas cada cenário fez.
+As funções são apontadas para os stubs pelas env vars EWELINK_API_URL,
+NTFY_URL e GROQ_API_URL (ver env()).
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Linha "N. nome" da lista enviada no pedido em lote à Groq
+_LISTING_LINE = re.compile(r"^\s*\d+\.\s*(.+?)\s*$", re.MULTILINE)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como os serviços reais
+    # Headers e body saem em escritas separadas: sem TCP_NODELAY, o Nagle e o
+    # ACK atrasado do cliente somavam ~40 ms a cada resposta
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = {}
+
+        stub.count()
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        url = urlparse(self.path)
+        status, content_type, payload = stub.respond(
+            self.command, url.path, parse_qs(url.query), body
+        )
+        data = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _dispatch
+
+
+class StubServer:
+    """Servidor HTTP em background; as subclasses implementam respond()"""
+
+    name = "stub"
+
+    def __init__(self, latency_ms=0, host="127.0.0.1"):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=f"stub-{self.name}", daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def reset(self):
+        """Zera o contador e devolve o valor anterior"""
+        with self._lock:
+            requests, self.requests = self.requests, 0
+        return requests
+
+    def respond(self, method, path, query, body):
+        raise NotImplementedError
+
+
+class EWeLinkStub(StubServer):
+    """Login, inventário e status dos sensores TH (um dispositivo por andar)"""
+
+    name = "ewelink"
+
+    def __init__(self, floors=(), **kwargs):
+        super().__init__(**kwargs)
+        self.floors = list(floors)
+
+    def respond(self, method, path, query, body):
+        if path == "/v2/user/login":
+            return 200, "application/json", {"error": 0, "data": {"at": "bench-token"}}
+
+        if path == "/v2/device/thing":
+            things = [
+                {"itemType": 1, "itemData": {
+                    "deviceid": device_id(floor),
+                    "name": f"Sensor {floor}º Andar",
+                    "brandName": "SONOFF",
+                    "productModel": "TH16",
+                    "online": True,
+                    "tags": {}
+                }}
+                for floor in self.floors
+            ]
+            return 200, "application/json", {"error": 0, "data": {"thingList": things}}
+
+        if path == "/v2/device/thing/status":
+            floor = int(query.get("id", ["bench-0"])[0].rsplit("-", 1)[-1])
+            params = {
+                "currentHumidity": str(45 + floor * 7 % 30),
+                "currentTemperature": str(20 + floor % 6),
+                "brightness": 600 + floor * 13 % 300
+            }
+            return 200, "application/json", {"error": 0, "data": {"params": params}}
+
+        return 404, "application/json", {"error": 404}
+
+
+class NtfyStub(StubServer):
+    """Publicação de mensagens num tópico"""
+
+    name = "ntfy"
+
+    def respond(self, method, path, query, body):
+        return 200, "application/json", {
+            "id": f"bench{self.requests}", "time": int(time.time()), "event": "message",
+            "topic": path.strip("/")
+        }
+
+
+def _plant_entry(name, index=0):
+    return {
+        "nome": name,
+        "ciclo_total": 60 + index % 90,
+        "targets_humidade": 55 + index % 25,
+        "temperatura_ideal": "18-26°C",
+        "luz": "Sol pleno",
+        "descricao": f"Dados simulados para {name}: regar de manhã e manter o solo húmido."
+    }
+
+
+class GroqStub(StubServer):
+    """Chat completions (JSON ou streaming SSE), para consultas simples e em lote"""
+
+    name = "groq"
+
+    def respond(self, method, path, query, body):
+        messages = body.get("messages") or [{}]
+        prompt = messages[-1].get("content", "")
+        names = _LISTING_LINE.findall(prompt)
+        if names:
+            entries = [_plant_entry(name, i) for i, name in enumerate(names)]
+            content = json.dumps(entries, ensure_ascii=False)
+        else:
+            entry = _plant_entry(prompt)
+            del entry["nome"]
+            content = json.dumps(entry, ensure_ascii=False)
+
+        if not body.get("stream"):
+            return 200, "application/json", {
+                "choices": [{"message": {"role": "assistant", "content": content}}]
+            }
+
+        # Streaming: o conteúdo em pedaços de ~40 caracteres, como o modelo o gera
+        # Texto UTF-8 sem escapes e sem charset no Content-Type, como na Groq
+        events = [
+            "data: " + json.dumps(
+                {"choices": [{"delta": {"content": content[i:i + 40]}}]}, ensure_ascii=False
+            )
+            for i in range(0, len(content), 40)
+        ]
+        events.append("data: [DONE]")
+        return 200, "text/event-stream", ("\n\n".join(events) + "\n\n").encode("utf-8")
+
+
+def device_id(floor):
+    """ID do dispositivo eWeLink simulado de um andar"""
+    return f"bench-{floor}"
+
+
+def start_stubs(floors, ewelink_ms=0, ntfy_ms=0, groq_ms=0):
+    """Arranca os três stubs; devolve {nome: stub}"""
+    return {
+        "ewelink": EWeLinkStub(floors, latency_ms=ewelink_ms).start(),
+        "ntfy": NtfyStub(latency_ms=ntfy_ms).start(),
+        "groq": GroqStub(latency_ms=groq_ms).start()
+    }
+
+
+def env(stubs):
+    """Env vars que apontam as funções para os stubs (e activam eWeLink e IA)"""
+    return {
+        "EWELINK_API_URL": stubs["ewelink"].url,
+        "EWELINK_EMAIL": "bench@example.com",
+        "EWELINK_PASSWORD": "bench",
+        "EWELINK_APP_ID": "bench-app",
+        "EWELINK_APP_SECRET": "bench-secret",
+        "NTFY_URL": stubs["ntfy"].url,
+        "NTFY_TOPIC": "gardenges-bench",
+        "GROQ_API_URL": f"{stubs['groq'].url}/openai/v1/chat/completions",
+        "GROQ_API_KEY": "bench-key"
+    }
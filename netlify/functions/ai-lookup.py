@@ -3,285 +3,131 @@ GardenGes - AI Lookup API
 Netlify Function para obter dados de plantas via IA
 """
 
+# Perfil de imports do cold start (só com GARDENGES_PROFILE_IMPORTS=1): tem de
+# arrancar antes dos restantes imports
+from gardenges import profiling
+profiling.start()
+
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Dados pré-definidos de plantas comuns (fallback se IA não disponível)
-PLANT_DATABASE = {
-    "manjericão": {
-        "ciclo_total": 60,
-        "targets_humidade": 65,
-        "temperatura_ideal": "20-25°C",
-        "luz": "Sol direto, 6-8h",
-        "descricao": "O manjericão é uma erva aromática que prefere sol direto e solo húmido mas bem drenado. Evitar regar as folhas para prevenir doenças fúngicas. Podar regularmente para estimular crescimento compacto."
-    },
-    "tomate": {
-        "ciclo_total": 90,
-        "targets_humidade": 70,
-        "temperatura_ideal": "20-28°C",
-        "luz": "Sol direto, 8h+",
-        "descricao": "Tomates precisam de muito sol e rega regular e profunda. Suporte (tutores) necessário quando crescer. Remover rebentos laterais para maior produção. Regar na base, não nas folhas."
-    },
-    "tomate cherry": {
-        "ciclo_total": 80,
-        "targets_humidade": 68,
-        "temperatura_ideal": "18-26°C",
-        "luz": "Sol direto, 6-8h",
-        "descricao": "Variedade mais compacta e produtiva. Ideal para vasos e estufas. Produz frutos em cachos. Muito saborosos quando colhidos maduros na planta."
-    },
-    "alface": {
-        "ciclo_total": 45,
-        "targets_humidade": 60,
-        "temperatura_ideal": "15-20°C",
-        "luz": "Sol parcial, 4-6h",
-        "descricao": "Alface cresce rapidamente em climas amenos. Colher folhas externas primeiro para prolongar colheita. Evitar sol intenso que causa bolting (floração prematura)."
-    },
-    "rúcula": {
-        "ciclo_total": 35,
-        "targets_humidade": 55,
-        "temperatura_ideal": "15-22°C",
-        "luz": "Sol parcial, 4-5h",
-        "descricao": "Planta de crescimento muito rápido, tolera alguma sombra. Sabor mais picante com calor. Semear em sucessão para colheita contínua."
-    },
-    "espinafre": {
-        "ciclo_total": 40,
-        "targets_humidade": 60,
-        "temperatura_ideal": "10-20°C",
-        "luz": "Sol parcial, 4-6h",
-        "descricao": "Prefere temperaturas amenas, bolt com calor. Muito nutritivo. Colher folhas externas ou cortar toda a planta a 3cm do solo para rebrote."
-    },
-    "salsa": {
-        "ciclo_total": 75,
-        "targets_humidade": 60,
-        "temperatura_ideal": "15-22°C",
-        "luz": "Sol parcial a pleno, 4-6h",
-        "descricao": "Germinação lenta (2-3 semanas). Planta bienal, produz folhas no primeiro ano. Colher folhas externas regularmente. Tolera algum frio."
-    },
-    "coentros": {
-        "ciclo_total": 50,
-        "targets_humidade": 55,
-        "temperatura_ideal": "15-25°C",
-        "luz": "Sol parcial, 4-5h",
-        "descricao": "Ciclo rápido, tende a florescer com calor. Semear a cada 2-3 semanas para colheita contínua. As sementes (coentro seco) também são utilizáveis."
-    },
-    "hortelã": {
-        "ciclo_total": 80,
-        "targets_humidade": 70,
-        "temperatura_ideal": "18-24°C",
-        "luz": "Sol parcial, 4-6h",
-        "descricao": "Muito invasiva, manter em vaso separado ou com barreiras. Gosta de humidade constante. Podar regularmente para manter compacta e aromática."
-    },
-    "cebolinho": {
-        "ciclo_total": 60,
-        "targets_humidade": 55,
-        "temperatura_ideal": "15-25°C",
-        "luz": "Sol pleno a parcial, 4-6h",
-        "descricao": "Perene, volta a crescer após corte. Cortar a 5cm do solo. Flores são comestíveis. Muito resistente e fácil de cultivar."
-    },
-    "morango": {
-        "ciclo_total": 120,
-        "targets_humidade": 65,
-        "temperatura_ideal": "15-25°C",
-        "luz": "Sol direto, 6-8h",
-        "descricao": "Planta perene que produz por vários anos. Produz estolões que podem ser replantados. Mulching ajuda a manter frutos limpos e humidade."
-    },
-    "pimento": {
-        "ciclo_total": 100,
-        "targets_humidade": 65,
-        "temperatura_ideal": "20-28°C",
-        "luz": "Sol direto, 6-8h",
-        "descricao": "Precisa de calor para produzir bem. Suporte pode ser necessário com frutos pesados. Colher quando atingir cor desejada."
-    },
-    "aji limo": {
-        "ciclo_total": 95,
-        "targets_humidade": 65,
-        "temperatura_ideal": "22-30°C",
-        "luz": "Sol direto, 6-8h",
-        "descricao": "Pimenta peruana muito aromática e picante. Gosta de calor intenso. Colher quando amarelo-alaranjado. Usado em ceviches e molhos. Rica em vitamina C."
-    },
-    "pepino": {
-        "ciclo_total": 55,
-        "targets_humidade": 75,
-        "temperatura_ideal": "22-28°C",
-        "luz": "Sol direto, 6-8h",
-        "descricao": "Precisa de muita água e calor. Trepadeira, beneficia de suporte vertical. Colher jovens para melhor sabor e mais produção."
-    },
-    "couve": {
-        "ciclo_total": 65,
-        "targets_humidade": 60,
-        "temperatura_ideal": "15-22°C",
-        "luz": "Sol pleno a parcial, 4-6h",
-        "descricao": "Tolera frio, sabor melhora após geada leve. Variedades incluem couve-galega, couve-de-bruxelas, etc. Vigilar pragas."
-    },
-    "agrião": {
-        "ciclo_total": 30,
-        "targets_humidade": 80,
-        "temperatura_ideal": "12-20°C",
-        "luz": "Sol parcial, 3-5h",
-        "descricao": "Adora humidade, pode crescer em água. Crescimento muito rápido. Colher antes da floração para melhor sabor. Rico em vitaminas."
-    },
-    "orégãos": {
-        "ciclo_total": 85,
-        "targets_humidade": 45,
-        "temperatura_ideal": "18-28°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Planta mediterrânica, prefere solo seco e bem drenado. Perene e resistente. Secar folhas para usar durante o inverno."
-    },
-    # Pimentos picantes
-    "habanero": {
-        "ciclo_total": 120,
-        "targets_humidade": 60,
-        "temperatura_ideal": "24-32°C",
-        "luz": "Sol pleno, 8h+",
-        "descricao": "Pimento muito picante (100k-350k Scoville). Necessita calor intenso e sol pleno. Germinar a 28-30°C. Regar moderadamente, evitar encharcamento."
-    },
-    "jalapeño": {
-        "ciclo_total": 90,
-        "targets_humidade": 65,
-        "temperatura_ideal": "22-28°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento picante médio (2.5k-8k Scoville). Muito produtivo. Colher verde ou vermelho maduro. Ideal para iniciantes."
-    },
-    "jalapeno": {
-        "ciclo_total": 90,
-        "targets_humidade": 65,
-        "temperatura_ideal": "22-28°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento picante médio (2.5k-8k Scoville). Muito produtivo. Colher verde ou vermelho maduro. Ideal para iniciantes."
-    },
-    "carolina reaper": {
-        "ciclo_total": 130,
-        "targets_humidade": 60,
-        "temperatura_ideal": "24-32°C",
-        "luz": "Sol pleno, 8h+",
-        "descricao": "O pimento mais picante do mundo! (1.5M-2.2M Scoville). Requer muito calor e paciência. Usar luvas ao manusear."
-    },
-    "cayenne": {
-        "ciclo_total": 85,
-        "targets_humidade": 60,
-        "temperatura_ideal": "21-29°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento picante versátil (30k-50k Scoville). Fácil de secar. Muito usado em pó. Produtivo em climas quentes."
-    },
-    "piri-piri": {
-        "ciclo_total": 95,
-        "targets_humidade": 60,
-        "temperatura_ideal": "22-30°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento africano picante (50k-175k Scoville). Resistente ao calor. Popular em Portugal. Plantas compactas."
-    },
-    "piri piri": {
-        "ciclo_total": 95,
-        "targets_humidade": 60,
-        "temperatura_ideal": "22-30°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento africano picante (50k-175k Scoville). Resistente ao calor. Popular em Portugal. Plantas compactas."
-    },
-    "malagueta": {
-        "ciclo_total": 90,
-        "targets_humidade": 60,
-        "temperatura_ideal": "22-30°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento brasileiro picante (60k-100k Scoville). Plantas produtivas. Frutos pequenos e alongados."
-    },
-    "ghost pepper": {
-        "ciclo_total": 125,
-        "targets_humidade": 60,
-        "temperatura_ideal": "24-32°C",
-        "luz": "Sol pleno, 8h+",
-        "descricao": "Bhut Jolokia, extremamente picante (1M Scoville). Originário da Índia. Requer calor intenso para amadurecer."
-    },
-    "bhut jolokia": {
-        "ciclo_total": 125,
-        "targets_humidade": 60,
-        "temperatura_ideal": "24-32°C",
-        "luz": "Sol pleno, 8h+",
-        "descricao": "Ghost Pepper, extremamente picante (1M Scoville). Originário da Índia. Requer calor intenso."
-    },
-    "scotch bonnet": {
-        "ciclo_total": 110,
-        "targets_humidade": 65,
-        "temperatura_ideal": "24-30°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento caribenho (100k-350k Scoville). Sabor frutado distintivo. Essencial na culinária jamaicana."
-    },
-    "tabasco": {
-        "ciclo_total": 100,
-        "targets_humidade": 65,
-        "temperatura_ideal": "22-30°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Famoso pelo molho. Pimentos pequenos e muito picantes (30k-50k Scoville). Muito produtivo."
-    },
-    "serrano": {
-        "ciclo_total": 85,
-        "targets_humidade": 65,
-        "temperatura_ideal": "21-29°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento mexicano (10k-25k Scoville). Mais picante que jalapeño. Ideal fresco em salsas."
-    },
-    "poblano": {
-        "ciclo_total": 95,
-        "targets_humidade": 65,
-        "temperatura_ideal": "21-28°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento suave mexicano (1k-2k Scoville). Seco chama-se ancho. Ideal para chiles rellenos."
-    },
-    "thai chili": {
-        "ciclo_total": 90,
-        "targets_humidade": 60,
-        "temperatura_ideal": "24-30°C",
-        "luz": "Sol pleno, 6-8h",
-        "descricao": "Pimento asiático pequeno mas muito picante (50k-100k Scoville). Plantas muito produtivas."
-    },
-    # Outras plantas
-    "cenoura": {
-        "ciclo_total": 75,
-        "targets_humidade": 65,
-        "temperatura_ideal": "15-20°C",
-        "luz": "Sol pleno a parcial, 6h",
-        "descricao": "Solo solto e profundo sem pedras. Desbastar para cenouras maiores. Manter solo húmido."
-    },
-    "beterraba": {
-        "ciclo_total": 60,
-        "targets_humidade": 70,
-        "temperatura_ideal": "15-22°C",
-        "luz": "Sol pleno a parcial, 4-6h",
-        "descricao": "Raiz e folhas comestíveis. Solo solto. Colher quando 5-7cm de diâmetro."
-    },
-    "rabanete": {
-        "ciclo_total": 30,
-        "targets_humidade": 70,
-        "temperatura_ideal": "12-20°C",
-        "luz": "Sol parcial, 4-6h",
-        "descricao": "O mais rápido da horta! Pronto em 4 semanas. Semear em sucessão. Evitar calor."
-    }
+# Headers CORS e respostas JSON/erro partilhados
+from gardenges.responses import cors_headers, error, preflight, respond
+
+# Cliente HTTP com pool de ligações (keep-alive entre invocações)
+from gardenges import httpclient
+
+# Cache persistente das respostas da IA (TTL, LRU, cache negativa)
+from gardenges.aicache import open_cache
+
+# Extracção tolerante de JSON e validação por esquema das respostas da IA
+from gardenges.llmjson import (
+    JsonExtractor,
+    compile_schema,
+    extract_json,
+    integer,
+    temperature_range,
+    text,
+)
+
+# Catálogo local de plantas comuns (fallback se IA não disponível), pré-compilado
+# em gardenges/data/plant_catalog.bin e lido só quando necessário
+from gardenges.catalog import open_catalog
+
+# Índice de pesquisa por nome (sem acentos, aliases, trigramas)
+from gardenges.plantsearch import PlantIndex, normalize
+
+# Marcador de "não está em cache" (None é uma falha em cache)
+_MISSING = object()
+
+# Outros nomes das plantas do catálogo (as variantes sem acentos ou com
+# hífen/espaço já são resolvidas pela normalização do índice)
+PLANT_ALIASES = {
+    "tomateiro": "tomate",
+    "basilico": "manjericão",
+    "menta": "hortelã",
+    "cebolinha": "cebolinho",
+    "coentro": "coentros",
+    "oregano": "orégãos",
+    "morangueiro": "morango",
+    "pimentão": "pimento",
+    "piripiri": "piri-piri",
+    "pimenta malagueta": "malagueta",
+    "caiena": "cayenne",
 }
 
+# Índice construído no primeiro uso e reutilizado no container
+_plant_index = None
 
-def find_plant_data(plant_name):
-    """Procura dados da planta na base de dados local"""
-    name_lower = plant_name.lower().strip()
-    
-    # Procura exacta
-    if name_lower in PLANT_DATABASE:
-        return PLANT_DATABASE[name_lower]
-    
-    # Procura parcial
-    for key, data in PLANT_DATABASE.items():
-        if key in name_lower or name_lower in key:
-            return data
-    
-    return None
 
+def plant_index():
+    """Índice de pesquisa do catálogo local"""
+    global _plant_index
+    if _plant_index is None:
+        _plant_index = PlantIndex(open_catalog().names(), PLANT_ALIASES)
+    return _plant_index
 
-def get_ai_plant_data(plant_name):
+
+def find_plant_data(plant_name):
     """
-    Consulta IA para obter dados da planta
-    Usa Groq - API gratuita
+    Procura dados da planta na base de dados local
+    Nome exacto ou alias primeiro, depois o nome mais parecido
     """
-    import requests
-    
+    key = plant_index().best(plant_name)
+    return open_catalog().get(key) if key else None
+
+
+# Groq (API compatível com OpenAI)
+GROQ_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+SYSTEM_PROMPT = """És um especialista em horticultura. Quando te perguntarem sobre uma planta, 
+responde APENAS com um JSON válido com esta estrutura exacta:
+{
+    "ciclo_total": <número de dias do ciclo de vida>,
+    "targets_humidade": <percentagem ideal de humidade do solo>,
+    "temperatura_ideal": "<range de temperatura em Celsius>",
+    "luz": "<requisitos de luz>",
+    "descricao": "<descrição breve com dicas de cultivo>"
+}
+Não incluas markdown, apenas o JSON puro."""
+
+BATCH_SYSTEM_PROMPT = """És um especialista em horticultura. Vais receber uma lista numerada de plantas.
+Responde APENAS com um array JSON válido, com um objecto por planta, pela mesma ordem:
+[
+    {
+        "nome": "<nome exactamente como foi pedido>",
+        "ciclo_total": <número de dias do ciclo de vida>,
+        "targets_humidade": <percentagem ideal de humidade do solo>,
+        "temperatura_ideal": "<range de temperatura em Celsius>",
+        "luz": "<requisitos de luz>",
+        "descricao": "<descrição breve com dicas de cultivo>"
+    }
+]
+Não incluas markdown, apenas o JSON puro."""
+
+# Esquema de uma resposta da IA (coerção de tipos e limites por campo)
+validate_plant_data = compile_schema({
+    "ciclo_total": integer(7, 3650),
+    "targets_humidade": integer(10, 100),
+    "temperatura_ideal": temperature_range(),
+    "luz": text(200),
+    "descricao": text(1000)
+})
+
+# Respostas da consulta individual em streaming (parar de ler quando o JSON fecha)
+GROQ_STREAM = os.environ.get("GARDENGES_AI_STREAM", "1") == "1"
+
+# Lotes: máximo de nomes por pedido e orçamento de tokens de resposta por chamada
+MAX_BATCH_NAMES = 100
+BATCH_TOKEN_BUDGET = 4000
+TOKENS_PER_PLANT = 120  # estimativa de tokens de resposta por planta
+
+
+def groq_chat(messages, timeout=15, max_tokens=None):
+    """Chamada ao chat da Groq; devolve o texto da resposta ou None"""
     # Verificar se temos API key configurada
     api_key = os.environ.get("GROQ_API_KEY")
     
@@ -293,51 +139,15 @@ def get_ai_plant_data(plant_name):
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
+        payload = {"model": GROQ_MODEL, "messages": messages, "temperature": 0.3}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
         
-        payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": """És um especialista em horticultura. Quando te perguntarem sobre uma planta, 
-responde APENAS com um JSON válido com esta estrutura exacta:
-{
-    "ciclo_total": <número de dias do ciclo de vida>,
-    "targets_humidade": <percentagem ideal de humidade do solo>,
-    "temperatura_ideal": "<range de temperatura em Celsius>",
-    "luz": "<requisitos de luz>",
-    "descricao": "<descrição breve com dicas de cultivo>"
-}
-Não incluas markdown, apenas o JSON puro."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Dados de cultivo para: {plant_name}"
-                }
-            ],
-            "temperature": 0.3
-        }
-        
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=15
-        )
+        response = httpclient.post(GROQ_URL, headers=headers, json=payload, timeout=timeout)
         
         if response.status_code == 200:
             data = response.json()
-            result = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-            
-            # Limpar possíveis marcadores de código
-            result = result.strip()
-            if result.startswith("```"):
-                result = result.split("```")[1]
-                if result.startswith("json"):
-                    result = result[4:]
-            result = result.strip()
-            
-            return json.loads(result)
+            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
         elif response.status_code == 403:
             print(f"Groq API - sem permissões: {response.text}")
             return None
@@ -350,76 +160,225 @@ Não incluas markdown, apenas o JSON puro."""
         return None
 
 
-def handler(event, context):
-    """Handler principal da função Netlify"""
+def groq_stream_json(messages, timeout=15):
+    """
+    Chamada à Groq em streaming: lê os pedaços da resposta e pára assim que o
+    primeiro objecto JSON fica completo; devolve o objecto ou None
+    """
+    api_key = os.environ.get("GROQ_API_KEY")
     
-    headers = {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type",
-        "Access-Control-Allow-Methods": "POST, OPTIONS",
-        "Content-Type": "application/json"
+    if not api_key:
+        return None
+    
+    try:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        payload = {"model": GROQ_MODEL, "messages": messages, "temperature": 0.3, "stream": True}
+        
+        response = httpclient.post(
+            GROQ_URL, headers=headers, json=payload, timeout=timeout, stream=True
+        )
+        try:
+            if response.status_code != 200:
+                print(f"Groq API error: {response.status_code} - {response.text}")
+                return None
+            
+            # SSE é sempre UTF-8; sem charset no Content-Type o requests
+            # descodificaria como ISO-8859-1 ("hÃºmido")
+            response.encoding = "utf-8"
+            extractor = JsonExtractor("{")
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data).get("choices", [{}])[0].get("delta", {})
+                if extractor.feed(delta.get("content") or ""):
+                    break
+            return extractor.value
+        finally:
+            response.close()
+        
+    except Exception as e:
+        print(f"Erro ao consultar Groq: {e}")
+        return None
+
+
+def get_ai_plant_data(plant_name):
+    """
+    Consulta IA para obter dados da planta
+    Usa Groq - API gratuita
+    A resposta pode trazer prosa ou markdown à volta do JSON; os campos são
+    convertidos e limitados pelo esquema (None se a resposta for inválida)
+    """
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Dados de cultivo para: {plant_name}"}
+    ]
+    if GROQ_STREAM:
+        return validate_plant_data(groq_stream_json(messages))
+    return validate_plant_data(extract_json(groq_chat(messages), "{"))
+
+
+def get_ai_plants_batch(plant_names):
+    """
+    Consulta IA para várias plantas num só pedido
+    Devolve {nome: dados} apenas com as entradas válidas
+    """
+    listing = "\n".join(f"{i}. {name}" for i, name in enumerate(plant_names, start=1))
+    result = groq_chat([
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Dados de cultivo para:\n{listing}"}
+    ], timeout=30, max_tokens=TOKENS_PER_PLANT * len(plant_names) + 200)
+    entries = extract_json(result, "[")
+    if not isinstance(entries, list):
+        print("Resposta da IA sem array JSON válido")
+        return {}
+
+    # Associar pelo nome devolvido; sem nome reconhecível, pela posição
+    by_key = {normalize(name): name for name in plant_names}
+    found = {}
+    for position, entry in enumerate(entries):
+        data = validate_plant_data(entry)
+        if data is None:
+            continue
+        name = by_key.get(normalize(entry.get("nome", "")))
+        if name is None and position < len(plant_names):
+            name = plant_names[position]
+        if name is not None and name not in found:
+            found[name] = data
+    return found
+
+
+def batch_chunks(plant_names):
+    """Divide os nomes em lotes que cabem no orçamento de tokens de resposta"""
+    size = max(1, BATCH_TOKEN_BUDGET // TOKENS_PER_PLANT)
+    return [plant_names[i:i + size] for i in range(0, len(plant_names), size)]
+
+
+def default_plant_data(plant_name):
+    """Valores genéricos quando nem o catálogo nem a IA conhecem a planta"""
+    return {
+        "ciclo_total": 60,
+        "targets_humidade": 65,
+        "temperatura_ideal": "18-25°C",
+        "luz": "Sol parcial a pleno",
+        "descricao": f"Dados genéricos para {plant_name}. Recomendamos pesquisar requisitos específicos desta planta."
     }
+
+
+def batch_lookup(plant_names):
+    """
+    Resolve vários nomes: catálogo local, depois cache da IA e, para os
+    restantes, uma chamada à IA por lote (lotes em paralelo)
+    """
+    cache = open_cache()
+    use_ai = bool(os.environ.get("GROQ_API_KEY"))
+    results = {}
+    misses = []
+
+    for name in dict.fromkeys(plant_names):
+        data = find_plant_data(name)
+        if data:
+            results[name] = (data, "database", False)
+            continue
+        if use_ai:
+            data = cache.get(name, _MISSING)
+            if data is not _MISSING:
+                results[name] = (data, "ai", True)
+                continue
+            misses.append(name)
+
+    chunks = batch_chunks(misses)
+    if chunks:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            answers = list(executor.map(get_ai_plants_batch, chunks))
+        for chunk, found in zip(chunks, answers):
+            for name in chunk:
+                data = found.get(name)
+                cache.put(name, data)
+                results[name] = (data, "ai", False)
+
+    items = []
+    for name in plant_names:
+        data, source, cached = results.get(name, (None, "default", False))
+        if not data:
+            data, source = default_plant_data(name), "default"
+        items.append({**data, "source": source, "cached": cached, "plant_name": name})
+    return items, len(chunks)
+
+
+def batch_handler(names, headers):
+    """Consulta de vários nomes (ex.: todos os slots de uma torre nova)"""
+    if not isinstance(names, list):
+        return error(headers, 400, "names deve ser uma lista")
     
-    if event.get("httpMethod") == "OPTIONS":
-        return {"statusCode": 200, "headers": headers, "body": ""}
+    names = [str(name).strip() for name in names if str(name).strip()]
+    if not names:
+        return error(headers, 400, "Nome da planta é obrigatório")
+    if len(names) > MAX_BATCH_NAMES:
+        return error(headers, 400, f"Máximo de {MAX_BATCH_NAMES} nomes por pedido")
     
-    if event.get("httpMethod") != "POST":
-        return {
-            "statusCode": 405,
-            "headers": headers,
-            "body": json.dumps({"error": "Apenas POST é permitido"})
-        }
+    results, llm_calls = batch_lookup(names)
+    sources = {}
+    for item in results:
+        sources[item["source"]] = sources.get(item["source"], 0) + 1
+    
+    return respond(headers, 200, {
+        "results": results,
+        "count": len(results),
+        "sources": sources,
+        "llm_calls": llm_calls
+    }, ensure_ascii=False)
+
+
+def handler(event, context):
+    """Handler principal da função Netlify"""
+    
+    headers = cors_headers("POST, OPTIONS")
+    
+    early = preflight(event, headers, "POST")
+    if early:
+        return early
     
     try:
         body = json.loads(event.get("body", "{}"))
+        
+        # Modo lote: {"names": [...]} resolve todos os nomes de uma vez
+        if "names" in body:
+            return batch_handler(body.get("names"), headers)
+        
         plant_name = body.get("name", "").strip()
         
         if not plant_name:
-            return {
-                "statusCode": 400,
-                "headers": headers,
-                "body": json.dumps({"error": "Nome da planta é obrigatório"})
-            }
+            return error(headers, 400, "Nome da planta é obrigatório")
         
         # Primeiro, tentar base de dados local
         plant_data = find_plant_data(plant_name)
         source = "database"
+        cached = False
         
-        # Se não encontrado localmente, tentar IA
-        if not plant_data:
-            plant_data = get_ai_plant_data(plant_name)
+        # Se não encontrado localmente, tentar IA (respostas e falhas ficam em cache)
+        if not plant_data and os.environ.get("GROQ_API_KEY"):
+            plant_data, cached = open_cache().get_or_compute(plant_name, get_ai_plant_data)
             source = "ai"
         
         # Se ainda não encontrado, usar valores default
         if not plant_data:
-            plant_data = {
-                "ciclo_total": 60,
-                "targets_humidade": 65,
-                "temperatura_ideal": "18-25°C",
-                "luz": "Sol parcial a pleno",
-                "descricao": f"Dados genéricos para {plant_name}. Recomendamos pesquisar requisitos específicos desta planta."
-            }
+            plant_data = default_plant_data(plant_name)
             source = "default"
         
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
-                **plant_data,
-                "source": source,
-                "plant_name": plant_name
-            }, ensure_ascii=False)
-        }
+        return respond(headers, 200, {
+            **plant_data,
+            "source": source,
+            "cached": cached,
+            "plant_name": plant_name
+        }, ensure_ascii=False)
         
     except json.JSONDecodeError:
-        return {
-            "statusCode": 400,
-            "headers": headers,
-            "body": json.dumps({"error": "JSON inválido"})
-        }
+        return error(headers, 400, "JSON inválido")
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": headers,
-            "body": json.dumps({"error": f"Erro interno: {str(e)}"})
-        }
+        return error(headers, 500, f"Erro interno: {str(e)}")
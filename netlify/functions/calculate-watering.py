@@ -3,47 +3,85 @@ GardenGes - Watering Calculator API
 Netlify Function para calcular necessidades de rega e enviar notificações
 """
 
+# Perfil de imports do cold start (só com GARDENGES_PROFILE_IMPORTS=1): tem de
+# arrancar antes dos restantes imports
+from gardenges import profiling
+profiling.start()
+
 import json
+import math
 import os
-import requests
 from datetime import datetime
-from pathlib import Path
 
-# Ficheiro de dados (mesmo usado por plants.py)
-DATA_FILE = Path("/tmp/plants_data.json")
+# Headers CORS e respostas JSON/erro partilhados
+from gardenges.responses import cors_headers, error, preflight, respond
+
+# Pipeline de notificações ntfy (dedup, digest, rate limiting, envio em background)
+from gardenges import notifications, outbox
+
+# Store de plantas (o mesmo usado por plants.py)
+from gardenges.store import open_store
+
+# Recálculo incremental (só as plantas afectadas por alterações)
+from gardenges.incremental import incremental_state
+
+# Previsão de rega (modelo de secagem por andar)
+from gardenges import forecast
+
+# Leituras registadas pela função sensors (séries temporais por andar)
+from gardenges.timeseries import floor_aggregates, latest_readings, open_series
+
+# Topologia da instalação (sites, torres e andares)
+from gardenges.topology import load_topology
 
-# Constantes de cálculo
-ML_PER_PERCENT = 2.0  # ml de água por % de humidade a subir
-DROPPER_ML = 0.55  # ml por gota (padrão)
-SPRAY_ML = 0.55  # ml por spray de pulverizador
+# Motor de rega em lote e constantes de cálculo
+from gardenges.watering import DROPPER_ML, ML_PER_PERCENT, SPRAY_ML, evaluate
 
 
 def get_plants_data():
     """Carrega dados das plantas"""
-    if DATA_FILE.exists():
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"plants": []}
+    return {"plants": open_store().all()}
+
+
+# Humidade e temperatura base dos dados mock por andar (restantes: MOCK_DEFAULT)
+MOCK_BASE = {1: (55, 23), 2: (62, 22), 3: (58, 24)}
+MOCK_DEFAULT = (58, 23)
 
 
 def get_mock_sensors():
-    """Dados mock de sensores (quando eWeLink não disponível)"""
+    """Dados mock de sensores para todos os andares da topologia (quando eWeLink não disponível)"""
     import random
-    return {
-        1: {"humidity": 55 + random.randint(-5, 5), "temperature": 23},
-        2: {"humidity": 62 + random.randint(-5, 5), "temperature": 22},
-        3: {"humidity": 58 + random.randint(-5, 5), "temperature": 24}
-    }
+    sensors = {}
+    for floor in load_topology().floor_ids():
+        humidity, temperature = MOCK_BASE.get(floor, MOCK_DEFAULT)
+        sensors[floor] = {"humidity": humidity + random.randint(-5, 5), "temperature": temperature}
+    return sensors
+
+
+# Idade máxima (segundos) de uma leitura registada para ainda ser usada
+SENSOR_MAX_AGE = int(os.environ.get("GARDENGES_SENSOR_MAX_AGE", "1800"))
+
+
+def get_sensors():
+    """
+    Leituras actuais de todos os andares: a última leitura registada pela
+    função sensors, se recente; caso contrário, dados mock
+    """
+    floors = load_topology().floor_ids()
+    sensors = latest_readings(floors, max_age=SENSOR_MAX_AGE)
+    if len(sensors) < len(floors):
+        mock = get_mock_sensors()
+        for floor in floors:
+            sensors.setdefault(floor, mock[floor])
+    return sensors
 
 
 def get_sensor_data(floor):
     """
     Obtém dados dos sensores para um andar específico
-    Em produção, isto chamaria a função sensors.py ou eWeLink directamente
+    Usa a última leitura registada pela função sensors (ou mock)
     """
-    # Por simplicidade, usar mock data aqui
-    # Em produção, fazer request interno à função sensors
-    sensors = get_mock_sensors()
+    sensors = get_sensors()
     return sensors.get(floor, {"humidity": 50, "temperature": 22})
 
 
@@ -52,77 +90,81 @@ def calculate_watering_needs(plants, sensors):
     Calcula necessidades de rega para cada planta
     Fórmula: (Target - Atual) * ML_PER_PERCENT / DROPPER_ML
     """
-    recommendations = []
-    
-    for plant in plants:
-        floor = plant.get("andar")
-        sensor = sensors.get(floor, {})
-        current_humidity = sensor.get("humidity", 50)
-        target_humidity = plant.get("targets_humidade", 65)
-        
-        diff = target_humidity - current_humidity
-        
-        if diff <= 0:
-            # Humidade adequada ou acima do target
-            recommendations.append({
-                "plant_id": plant["id"],
-                "plant_name": plant["nome"],
-                "floor": floor,
-                "slot": plant.get("slot_index"),
-                "current_humidity": current_humidity,
-                "target_humidity": target_humidity,
-                "difference": diff,
-                "ml_needed": 0,
-                "drops_needed": 0,
-                "sprays_needed": 0,
-                "status": "ok",
-                "message": "Humidade adequada"
-            })
-        elif diff <= 5:
-            # Ligeiramente abaixo, rega leve recomendada
-            ml_needed = round((diff * ML_PER_PERCENT), 1)
-            drops = round(ml_needed / DROPPER_ML)
-            sprays = round(ml_needed / SPRAY_ML)
-            recommendations.append({
-                "plant_id": plant["id"],
-                "plant_name": plant["nome"],
-                "floor": floor,
-                "slot": plant.get("slot_index"),
-                "current_humidity": current_humidity,
-                "target_humidity": target_humidity,
-                "difference": diff,
-                "ml_needed": ml_needed,
-                "drops_needed": drops,
-                "sprays_needed": sprays,
-                "status": "light_water",
-                "message": f"Rega leve: {sprays} spray(s) ({ml_needed}ml)"
-            })
-        else:
-            # Precisa de rega significativa
-            ml_needed = round((diff * ML_PER_PERCENT), 1)
-            drops = round(ml_needed / DROPPER_ML)
-            sprays = round(ml_needed / SPRAY_ML)
-            recommendations.append({
-                "plant_id": plant["id"],
-                "plant_name": plant["nome"],
-                "floor": floor,
-                "slot": plant.get("slot_index"),
-                "current_humidity": current_humidity,
-                "target_humidity": target_humidity,
-                "difference": diff,
-                "ml_needed": ml_needed,
-                "drops_needed": drops,
-                "sprays_needed": sprays,
-                "status": "needs_water",
-                "message": f"Regar: {sprays} spray(s) ({ml_needed}ml)"
-            })
-    
-    return recommendations
+    return evaluate(plants, sensors).recommendations()
+
+
+def parse_sensor_delta(value):
+    """
+    Leituras enviadas no body ({andar: {"humidity": número, ...}}), com os
+    andares convertidos para inteiros; ValueError se o formato for inválido
+    """
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError("sensors tem de ser um objecto {andar: leitura}")
+    delta = {}
+    for floor, reading in value.items():
+        try:
+            floor_id = int(floor)
+        except ValueError:
+            raise ValueError(f"andar inválido: {floor}") from None
+        humidity = reading.get("humidity") if isinstance(reading, dict) else None
+        if (isinstance(humidity, bool) or not isinstance(humidity, (int, float))
+                or not math.isfinite(humidity)):
+            raise ValueError(f"humidade numérica em falta no andar {floor}")
+        delta[floor_id] = reading
+    return delta
 
 
-def send_ntfy_notification(recommendations):
+def incremental_watering(floors=None, sensor_delta=None):
     """
-    Envia notificação via ntfy.sh para plantas que precisam de água
+    Sincroniza o estado incremental com o store e os sensores
+    `sensor_delta` ({andar: leitura}) sobrepõe-se às leituras registadas
+    Devolve só as recomendações que mudaram desde o último cálculo
+    """
+    store = open_store()
+    state = incremental_state(store)
+    sensors = get_sensors()
+    sensors.update(sensor_delta or {})
+    mode, changed, removed = state.sync(store, sensors, floors)
+    return {
+        "mode": mode,
+        "changed": changed,
+        "removed": removed,
+        "summary": state.summary(floors)
+    }
+
+
+def forecast_watering(plants, sensors, floors):
+    """
+    Agenda prevista: quando cada planta desce abaixo do seu target e quanto
+    tempo o job agendado pode dormir até à próxima rega
+    """
+    models = forecast.load_models()
+    for floor in floors:
+        if floor not in models:
+            # Sem estado (cold start): ajustar a partir da série já registada
+            models[floor] = forecast.bootstrap_model(open_series(floor).samples())
+
+    now = datetime.now().timestamp()
+    events, unpredictable = forecast.schedule(plants, sensors, models, now)
+    next_check = forecast.next_sleep(events, now, len(unpredictable))
+    for event in events:
+        event["due_at"] = datetime.fromtimestamp(event["due_at"]).isoformat()
+    return {
+        "schedule": events,
+        "unpredictable": unpredictable,
+        "next_check_seconds": next_check,
+        "models": forecast.model_summary({f: models[f] for f in floors})
+    }
+
+
+def send_ntfy_notification(recommendations, sites=None):
+    """
+    Encaminha as plantas que precisam de água para a pipeline de notificações
+    (deduplicação, digest e rate limiting; envio em background para o ntfy.sh)
+    Devolve o estado da fila: alertas novos, suprimidos (cooldown), pendentes
+    e o ID da mensagem na outbox (consultável em notification-status)
     Requer NTFY_TOPIC nas env vars
     """
     topic = os.environ.get("NTFY_TOPIC")
@@ -136,32 +178,10 @@ def send_ntfy_notification(recommendations):
     if not needs_water:
         return {"sent": False, "reason": "Nenhuma planta precisa de água"}
     
-    # Construir mensagem
-    plants_list = "\n".join([
-        f"• {r['plant_name']} ({r['floor']}º andar): {r['sprays_needed']} spray(s)"
-        for r in needs_water
-    ])
-    
-    total_sprays = sum(r['sprays_needed'] for r in needs_water)
-    message = f"🌱 Rega Necessária\n\n{plants_list}\n\nTotal: {total_sprays} spray(s) em {len(needs_water)} planta(s)"
-    
     try:
-        response = requests.post(
-            f"https://ntfy.sh/{topic}",
-            data=message.encode('utf-8'),
-            headers={
-                "Title": "GardenGes - Alerta de Rega",
-                "Priority": "high" if any(r["difference"] > 10 for r in needs_water) else "default",
-                "Tags": "seedling,droplet"
-            },
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return {"sent": True, "plants_notified": len(needs_water)}
-        else:
-            return {"sent": False, "reason": f"HTTP {response.status_code}"}
-            
+        # Retomar mensagens que ficaram na outbox de invocações anteriores
+        outbox.start_drainer()
+        return notifications.notify(topic, needs_water, sites)
     except Exception as e:
         return {"sent": False, "reason": str(e)}
 
@@ -169,90 +189,97 @@ def send_ntfy_notification(recommendations):
 def handler(event, context):
     """Handler principal da função Netlify"""
     
-    headers = {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type",
-        "Access-Control-Allow-Methods": "POST, OPTIONS",
-        "Content-Type": "application/json"
-    }
-    
-    if event.get("httpMethod") == "OPTIONS":
-        return {"statusCode": 200, "headers": headers, "body": ""}
+    headers = cors_headers("POST, OPTIONS")
     
-    if event.get("httpMethod") != "POST":
-        return {
-            "statusCode": 405,
-            "headers": headers,
-            "body": json.dumps({"error": "Apenas POST é permitido"})
-        }
+    early = preflight(event, headers, "POST")
+    if early:
+        return early
     
     try:
         body = json.loads(event.get("body", "{}"))
         floor_filter = body.get("floor")  # Opcional: filtrar por andar
+        site_filter = body.get("site")  # Opcional: filtrar por site
+        tower_filter = body.get("tower")  # Opcional: filtrar por torre
         send_notification = body.get("notify", True)  # Por defeito, envia notificação
+        include_aggregates = body.get("aggregates", False)  # Opcional: médias 1h/24h/7d
+        include_forecast = body.get("forecast", False)  # Opcional: agenda prevista de rega
+        # Opcional: só o resumo, sem construir uma recomendação por planta
+        include_details = body.get("include_recommendations", True)
+        
+        # Modo incremental: só as recomendações alteradas desde o último cálculo
+        if body.get("incremental"):
+            topology = load_topology()
+            # Mesmos filtros do cálculo completo (andar e site/torre combinam-se)
+            floors = None
+            if floor_filter:
+                floors = {int(floor_filter)}
+            if site_filter or tower_filter:
+                site_floors = set(topology.floor_ids(site_filter, tower_filter))
+                floors = site_floors if floors is None else floors & site_floors
+            try:
+                sensor_delta = parse_sensor_delta(body.get("sensors"))
+            except ValueError as e:
+                return error(headers, 400, f"Leituras de sensores inválidas: {e}")
+            delta = incremental_watering(floors, sensor_delta)
+            notification_result = None
+            if send_notification:
+                notification_result = send_ntfy_notification(
+                    delta["changed"], topology.site_map()
+                )
+            return respond(headers, 200, {
+                **delta,
+                "notification": notification_result,
+                "timestamp": datetime.now().isoformat()
+            }, ensure_ascii=False)
         
         # Obter plantas
         data = get_plants_data()
         plants = data.get("plants", [])
         
         if not plants:
-            return {
-                "statusCode": 200,
-                "headers": headers,
-                "body": json.dumps({
-                    "recommendations": [],
-                    "message": "Nenhuma planta registada"
-                })
-            }
+            return respond(headers, 200, {
+                "recommendations": [],
+                "message": "Nenhuma planta registada"
+            })
         
-        # Filtrar por andar se especificado
+        topology = load_topology()
+        
+        # Filtrar por andar, site ou torre se especificado
         if floor_filter:
             plants = [p for p in plants if p.get("andar") == int(floor_filter)]
+        if site_filter or tower_filter:
+            floors = set(topology.floor_ids(site_filter, tower_filter))
+            plants = [p for p in plants if p.get("andar") in floors]
         
-        # Obter dados dos sensores
-        sensors = get_mock_sensors()
+        # Obter dados dos sensores (todos os andares de todos os sites)
+        sensors = get_sensors()
         
-        # Calcular necessidades de rega
-        recommendations = calculate_watering_needs(plants, sensors)
+        # Calcular necessidades de rega (e estatísticas) numa só passagem
+        result = evaluate(plants, sensors)
+        recommendations = result.recommendations() if include_details else None
         
         # Enviar notificação se solicitado e se houver plantas que precisam de água
         notification_result = None
         if send_notification:
-            notification_result = send_ntfy_notification(recommendations)
-        
-        # Estatísticas
-        total_plants = len(recommendations)
-        needs_water = len([r for r in recommendations if r["status"] == "needs_water"])
-        light_water = len([r for r in recommendations if r["status"] == "light_water"])
-        ok_plants = len([r for r in recommendations if r["status"] == "ok"])
-        total_ml = sum(r["ml_needed"] for r in recommendations)
+            notification_result = send_ntfy_notification(
+                result.needing_water(), topology.site_map()
+            )
         
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
-                "recommendations": recommendations,
-                "summary": {
-                    "total_plants": total_plants,
-                    "needs_water": needs_water,
-                    "light_water": light_water,
-                    "ok": ok_plants,
-                    "total_ml_needed": round(total_ml, 1)
-                },
-                "notification": notification_result,
-                "timestamp": datetime.now().isoformat()
-            }, ensure_ascii=False)
-        }
+        return respond(headers, 200, {
+            "recommendations": recommendations,
+            "summary": result.summary,
+            "summary_by_site": result.grouped_summary(
+                [topology.site_of(p.get("andar")) for p in result.plants]
+            ),
+            "aggregates": floor_aggregates(topology.floor_ids()) if include_aggregates else None,
+            "forecast": forecast_watering(
+                result.plants, sensors, topology.floor_ids()
+            ) if include_forecast else None,
+            "notification": notification_result,
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False)
         
     except json.JSONDecodeError:
-        return {
-            "statusCode": 400,
-            "headers": headers,
-            "body": json.dumps({"error": "JSON inválido"})
-        }
+        return error(headers, 400, "JSON inválido")
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": headers,
-            "body": json.dumps({"error": f"Erro interno: {str(e)}"})
-        }
+        return error(headers, 500, f"Erro interno: {str(e)}")
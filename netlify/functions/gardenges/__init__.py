@@ -0,0 +1,3 @@
+"""
+GardenGes - Módulos partilhados pelas Netlify Functions em Python
+"""
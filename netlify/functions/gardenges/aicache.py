@@ -0,0 +1,180 @@
+"""
+GardenGes - Cache das consultas à IA
+Cache persistente (SQLite em /tmp) das respostas por nome de planta normalizado
+
+    - TTL: respostas válidas duram AI_CACHE_TTL; falhas (cache negativa)
+      só AI_CACHE_NEGATIVE_TTL, para voltar a tentar mais cedo
+    - LRU: acima de AI_CACHE_MAX_ENTRIES, saem as entradas menos usadas
+    - single-flight: pedidos simultâneos do mesmo nome esperam pela primeira
+      consulta em vez de repetirem a chamada à API
+
+À frente do SQLite há uma pequena LRU em memória, pelo que pedidos repetidos
+no mesmo container não tocam no disco.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from gardenges.plantsearch import normalize
+
+AI_CACHE_FILE = Path(os.environ.get("GARDENGES_AI_CACHE_FILE", "/tmp/gardenges_ai_cache.sqlite3"))
+
+AI_CACHE_TTL = float(os.environ.get("GARDENGES_AI_CACHE_TTL", str(30 * 24 * 3600)))
+AI_CACHE_NEGATIVE_TTL = float(os.environ.get("GARDENGES_AI_CACHE_NEGATIVE_TTL", "3600"))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("GARDENGES_AI_CACHE_MAX_ENTRIES", "5000"))
+
+# Entradas mantidas em memória
+MEMORY_ENTRIES = 256
+
+# Intervalo mínimo entre actualizações do instante de acesso (LRU) no disco
+TOUCH_INTERVAL = 60
+
+_MISSING = object()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class LookupCache:
+    """Cache nome normalizado -> dados da planta (None = falha em cache)"""
+
+    def __init__(self, path=AI_CACHE_FILE, ttl=AI_CACHE_TTL,
+                 negative_ttl=AI_CACHE_NEGATIVE_TTL, max_entries=AI_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # chave -> (valor, expira, último acesso no disco)
+        self._lock = threading.Lock()
+        self._inflight = {}           # chave -> threading.Event da consulta em curso
+
+        self._db = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " key TEXT PRIMARY KEY, value TEXT, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)")
+        self._db.commit()
+
+    # ------------------------------------------------------------------
+    # Leitura e escrita
+    # ------------------------------------------------------------------
+
+    def _remember(self, key, value, expires, accessed):
+        self._memory[key] = (value, expires, accessed)
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def get(self, name, default=None):
+        """Dados em cache para o nome (None se for uma falha em cache), ou `default`"""
+        key = normalize(name)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db.execute(
+                    "SELECT value, expires, accessed FROM lookups WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return default
+                entry = (json.loads(row[0]) if row[0] is not None else None, row[1], row[2])
+
+            value, expires, accessed = entry
+            if expires <= now:
+                self._memory.pop(key, None)
+                self._db.execute("DELETE FROM lookups WHERE key = ?", (key,))
+                self._db.commit()
+                return default
+
+            if now - accessed >= TOUCH_INTERVAL:
+                self._db.execute("UPDATE lookups SET accessed = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                accessed = now
+            self._remember(key, value, expires, accessed)
+            return value
+
+    def put(self, name, value):
+        """Guarda o resultado de uma consulta (None = falha, com TTL curto)"""
+        key = normalize(name)
+        now = time.time()
+        expires = now + (self.ttl if value is not None else self.negative_ttl)
+        raw = json.dumps(value, ensure_ascii=False) if value is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO lookups (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, raw, expires, now)
+            )
+            self._evict()
+            self._db.commit()
+            self._remember(key, value, expires, now)
+
+    def _evict(self):
+        """Remove as entradas expiradas e, acima do limite, as menos usadas (LRU)"""
+        self._db.execute("DELETE FROM lookups WHERE expires <= ?", (time.time(),))
+        excess = self._db.execute("SELECT COUNT(*) FROM lookups").fetchone()[0] - self.max_entries
+        if excess > 0:
+            evicted = [row[0] for row in self._db.execute(
+                "SELECT key FROM lookups ORDER BY accessed LIMIT ?", (excess,)
+            )]
+            self._db.executemany("DELETE FROM lookups WHERE key = ?", [(k,) for k in evicted])
+            for key in evicted:
+                self._memory.pop(key, None)
+
+    # ------------------------------------------------------------------
+    # Single-flight
+    # ------------------------------------------------------------------
+
+    def get_or_compute(self, name, compute):
+        """
+        Devolve (dados, veio_da_cache); em caso de miss chama compute(name)
+        uma só vez, mesmo com vários pedidos simultâneos do mesmo nome
+        """
+        key = normalize(name)
+        while True:
+            value = self.get(name, _MISSING)
+            if value is not _MISSING:
+                return value, True
+
+            with self._lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+
+            if not leader:
+                # Outro pedido já está a consultar: esperar e voltar a ler a cache
+                event.wait()
+                continue
+
+            try:
+                value = compute(name)
+                self.put(name, value)
+                return value, False
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM lookups")
+            self._db.commit()
+
+
+def open_cache(path=AI_CACHE_FILE):
+    """Cache partilhada pelas invocações do mesmo container"""
+    path = Path(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = LookupCache(path)
+        return cache
@@ -0,0 +1,227 @@
+"""
+GardenGes - Catálogo de plantas
+Catálogo pré-compilado num ficheiro binário, lido por mmap e só quando usado
+
+O catálogo é editado em data/plant_catalog.json e compilado para
+data/plant_catalog.bin com:
+
+    python -m gardenges.catalog
+
+Layout do binário (little-endian):
+    cabeçalho   magic, versão, nº de plantas, SHA-256, tamanho e mtime (ns)
+                do JSON de origem
+    índice      por planta (ordenado por nome): offset/tamanho do nome e
+                offset do registo
+    nomes       nomes UTF-8, contíguos
+    registos    ciclo_total (u16), targets_humidade (u8), temperatura_ideal
+                e luz (u8 + UTF-8), descricao (u16 + UTF-8)
+
+Abrir o catálogo só lê o índice e os nomes; cada registo é descodificado
+quando é pedido, e a descrição só se for devolvida.
+
+O binário empacotado só é usado se for do JSON actual: primeiro compara-se o
+tamanho e o mtime guardados no cabeçalho (um stat(), sem ler o JSON) e, se
+diferirem, o hash (as datas de modificação não sobrevivem a um git checkout
+nem ao bundle das funções). Se o hash também diferir, é compilado um novo em /tmp.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_left
+from pathlib import Path
+
+from gardenges.lazy import lazy
+
+hashlib = lazy("hashlib")
+
+DATA_DIR = Path(__file__).parent / "data"
+CATALOG_SOURCE = DATA_DIR / "plant_catalog.json"
+CATALOG_FILE = DATA_DIR / "plant_catalog.bin"
+
+# Compilação em runtime quando o binário falta ou está desactualizado
+FALLBACK_FILE = Path("/tmp/gardenges_plant_catalog.bin")
+
+MAGIC = b"GGPC"
+VERSION = 3
+# magic, versão, nº de plantas, SHA-256, tamanho e mtime_ns da fonte
+HEADER = struct.Struct("<4sHI32sQq")
+ENTRY = struct.Struct("<IHI")   # offset do nome, tamanho do nome, offset do registo
+NUMBERS = struct.Struct("<HB")  # ciclo_total, targets_humidade
+SHORT = struct.Struct("<B")
+LONG = struct.Struct("<H")
+
+_catalog = None
+
+
+def _pack_text(size_struct, value):
+    data = value.encode('utf-8')
+    return size_struct.pack(len(data)) + data
+
+
+def source_digest(raw):
+    """SHA-256 do JSON de origem, guardado no cabeçalho do binário"""
+    return hashlib.sha256(raw).digest()
+
+
+def compile_catalog(entries, path=CATALOG_FILE, digest=bytes(32), source_stat=(0, 0)):
+    """Escreve o catálogo {nome: dados} no formato binário (rename atómico)"""
+    names = sorted(entries)
+    name_blob = bytearray()
+    records = bytearray()
+    index = []
+    for name in names:
+        data = entries[name]
+        encoded = name.encode('utf-8')
+        index.append((len(name_blob), len(encoded), len(records)))
+        name_blob += encoded
+        records += NUMBERS.pack(int(data["ciclo_total"]), int(data["targets_humidade"]))
+        records += _pack_text(SHORT, data["temperatura_ideal"])
+        records += _pack_text(SHORT, data["luz"])
+        records += _pack_text(LONG, data["descricao"])
+
+    names_offset = HEADER.size + ENTRY.size * len(names)
+    records_offset = names_offset + len(name_blob)
+    blob = bytearray(HEADER.pack(MAGIC, VERSION, len(names), digest, *source_stat))
+    for name_offset, name_size, record_offset in index:
+        blob += ENTRY.pack(names_offset + name_offset, name_size, records_offset + record_offset)
+    blob += name_blob + records
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+
+def compile_source(source=CATALOG_SOURCE, path=CATALOG_FILE):
+    """Compila o JSON `source` para `path`, com o hash e o stat da fonte no cabeçalho"""
+    raw, source_stat = _read_source(source)
+    return compile_catalog(json.loads(raw), path, source_digest(raw), source_stat)
+
+
+def _read_source(source):
+    """Conteúdo do JSON e (tamanho, mtime_ns) do mesmo ficheiro aberto"""
+    with open(source, 'rb') as f:
+        st = os.fstat(f.fileno())
+        return f.read(), (st.st_size, st.st_mtime_ns)
+
+
+def _header(path):
+    """(magic, versão, nº de plantas, hash, tamanho, mtime_ns) do binário, ou None"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER.size)
+    except OSError:
+        return None
+    return HEADER.unpack(data) if len(data) == HEADER.size else None
+
+
+class Catalog:
+    """Leitura do catálogo binário por mmap"""
+
+    def __init__(self, path=CATALOG_FILE):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, self.digest, _, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Catálogo inválido: {self.path}")
+
+        self._names = []
+        self._records = []
+        for i in range(count):
+            name_offset, name_size, record_offset = ENTRY.unpack_from(
+                self._map, HEADER.size + i * ENTRY.size
+            )
+            self._names.append(self._map[name_offset:name_offset + name_size].decode('utf-8'))
+            self._records.append(record_offset)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return self._position(name) is not None
+
+    def names(self):
+        """Nomes do catálogo (ordenados), sem descodificar os registos"""
+        return list(self._names)
+
+    def _position(self, name):
+        i = bisect_left(self._names, name)
+        return i if i < len(self._names) and self._names[i] == name else None
+
+    def get(self, name, description=True):
+        """Dados da planta, ou None; `description=False` não descodifica a descrição"""
+        i = self._position(name)
+        if i is None:
+            return None
+
+        offset = self._records[i]
+        ciclo_total, targets_humidade = NUMBERS.unpack_from(self._map, offset)
+        offset += NUMBERS.size
+        texts = []
+        for size_struct in (SHORT, SHORT):
+            (size,) = size_struct.unpack_from(self._map, offset)
+            offset += size_struct.size
+            texts.append(self._map[offset:offset + size].decode('utf-8'))
+            offset += size
+
+        data = {
+            "ciclo_total": ciclo_total,
+            "targets_humidade": targets_humidade,
+            "temperatura_ideal": texts[0],
+            "luz": texts[1]
+        }
+        if description:
+            (size,) = LONG.unpack_from(self._map, offset)
+            offset += LONG.size
+            data["descricao"] = self._map[offset:offset + size].decode('utf-8')
+        return data
+
+
+def _catalog_path():
+    """
+    Binário empacotado; se faltar, for de outra versão do formato ou de outro
+    JSON, compilar em /tmp. Sem o JSON, usa-se o binário
+    O JSON só é lido e hashed se o tamanho/mtime do cabeçalho não coincidirem
+    """
+    try:
+        st = CATALOG_SOURCE.stat()
+    except FileNotFoundError:
+        return CATALOG_FILE
+
+    candidates = []
+    for path in (CATALOG_FILE, FALLBACK_FILE):
+        header = _header(path)
+        if header is None or header[0] != MAGIC or header[1] != VERSION:
+            continue
+        if header[4:] == (st.st_size, st.st_mtime_ns):
+            return path
+        candidates.append((path, header[3]))
+
+    raw, source_stat = _read_source(CATALOG_SOURCE)
+    digest = source_digest(raw)
+    for path, header_digest in candidates:
+        if header_digest == digest:
+            return path
+    return compile_catalog(json.loads(raw), FALLBACK_FILE, digest, source_stat)
+
+
+def open_catalog():
+    """Catálogo partilhado pelas invocações do mesmo container"""
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog(_catalog_path())
+    return _catalog
+
+
+if __name__ == "__main__":
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else CATALOG_SOURCE
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else CATALOG_FILE
+    compile_source(source, target)
+    print(f"{len(Catalog(target))} plantas → {target}")
@@ -0,0 +1,245 @@
+"""
+GardenGes - Previsão de rega
+Modelo de secagem por andar e agenda das próximas regas
+
+Entre regas a humidade de um andar decai aproximadamente de forma
+exponencial: h(t) = h0 · e^(-k·t). Cada leitura actualiza, em O(1), uma
+regressão ponderada de ln(h) em função do tempo (somas com esquecimento
+exponencial, constante FORECAST_TAU_HOURS); um salto de humidade acima de
+WATERING_JUMP é tratado como uma rega e recomeça o ajuste.
+
+Com a taxa k de cada andar, o instante em que uma planta desce abaixo do seu
+`targets_humidade` é t = ln(h_actual / target) / k, o que permite ao job
+agendado dormir até ao próximo evento previsto em vez de consultar a cada
+10 minutos.
+"""
+
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): sem lock entre processos
+    fcntl = None
+
+from gardenges.watering import DEFAULT_HUMIDITY, DEFAULT_TARGET
+
+# Estado dos modelos (um registo por andar)
+FORECAST_FILE = Path(os.environ.get("GARDENGES_FORECAST_FILE", "/tmp/gardenges_forecast.json"))
+
+# Memória do ajuste: leituras com mais de ~TAU horas pesam cada vez menos
+FORECAST_TAU_HOURS = float(os.environ.get("GARDENGES_FORECAST_TAU_HOURS", "24"))
+
+# Subida de humidade (%) entre leituras que indica uma rega
+WATERING_JUMP = 3.0
+
+# Nº mínimo de leituras no segmento actual para haver previsão
+MIN_SAMPLES = 3
+
+# Taxa mínima (por hora) para considerar que o andar está a secar
+MIN_DECAY_RATE = 1e-4
+
+# Limites da espera sugerida ao job agendado (segundos)
+MIN_SLEEP = 60
+MAX_SLEEP = int(os.environ.get("GARDENGES_FORECAST_MAX_SLEEP", str(6 * 3600)))
+
+# Espera enquanto a previsão não cobre todas as plantas (sem modelo ou sem
+# tendência): o mesmo intervalo do job agendado (netlify.toml, */10 min)
+POLL_INTERVAL = int(os.environ.get("GARDENGES_FORECAST_POLL_INTERVAL", "600"))
+
+
+class DecayModel:
+    """Regressão ponderada incremental de ln(humidade) no tempo (horas)"""
+
+    __slots__ = ("t0", "last_ts", "last_humidity", "n", "sw", "sx", "sy", "sxx", "sxy")
+
+    def __init__(self, t0=None, last_ts=None, last_humidity=None, n=0,
+                 sw=0.0, sx=0.0, sy=0.0, sxx=0.0, sxy=0.0):
+        self.t0 = t0
+        self.last_ts = last_ts
+        self.last_humidity = last_humidity
+        self.n = n
+        self.sw, self.sx, self.sy, self.sxx, self.sxy = sw, sx, sy, sxx, sxy
+
+    def reset(self, ts):
+        """Começa um novo segmento de secagem (ex.: depois de uma rega)"""
+        self.t0 = ts
+        self.n = 0
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def update(self, ts, humidity):
+        """Acrescenta uma leitura; devolve False se for antiga ou inválida"""
+        if humidity is None or humidity <= 0:
+            return False
+        if self.last_ts is not None and ts <= self.last_ts:
+            return False
+
+        if self.t0 is None or (
+            self.last_humidity is not None and humidity - self.last_humidity > WATERING_JUMP
+        ):
+            self.reset(ts)
+        elif self.n:
+            decay = math.exp(-(ts - self.last_ts) / 3600 / FORECAST_TAU_HOURS)
+            self.sw *= decay
+            self.sx *= decay
+            self.sy *= decay
+            self.sxx *= decay
+            self.sxy *= decay
+
+        x = (ts - self.t0) / 3600
+        y = math.log(humidity)
+        self.n += 1
+        self.sw += 1.0
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+        self.last_ts = ts
+        self.last_humidity = humidity
+        return True
+
+    def rate(self):
+        """Taxa de secagem k (por hora), ou None se não houver tendência de descida"""
+        if self.n < MIN_SAMPLES:
+            return None
+        denominator = self.sw * self.sxx - self.sx * self.sx
+        if denominator <= 1e-12:
+            return None
+        slope = (self.sw * self.sxy - self.sx * self.sy) / denominator
+        return -slope if -slope >= MIN_DECAY_RATE else None
+
+    def hours_until(self, current, target):
+        """
+        Horas até a humidade descer abaixo de `target` a partir de `current`
+        0 se já está abaixo; None se o andar não está a secar
+        """
+        if current <= target:
+            return 0.0
+        k = self.rate()
+        if k is None:
+            return None
+        return math.log(current / target) / k
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__ if name in data})
+
+
+@contextmanager
+def _locked():
+    if fcntl is None:
+        yield
+        return
+    with open(FORECAST_FILE.with_name(FORECAST_FILE.name + ".lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_models():
+    """Modelos por andar {andar: DecayModel} (vazio se ainda não há estado)"""
+    try:
+        with open(FORECAST_FILE, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {int(floor): DecayModel.from_dict(data) for floor, data in raw.items()}
+
+
+def _save_models(models):
+    tmp_path = FORECAST_FILE.with_name(FORECAST_FILE.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({str(floor): model.to_dict() for floor, model in models.items()}, f)
+    os.replace(tmp_path, FORECAST_FILE)
+
+
+def update_models(sensors, ts=None):
+    """Actualiza o modelo de cada andar com as leituras {andar: {"humidity": ...}}"""
+    ts = time.time() if ts is None else ts
+    with _locked():
+        models = load_models()
+        changed = False
+        for floor, reading in sensors.items():
+            model = models.setdefault(int(floor), DecayModel())
+            changed |= model.update(ts, reading.get("humidity"))
+        if changed:
+            _save_models(models)
+    return models
+
+
+def bootstrap_model(samples):
+    """Modelo construído a partir de amostras (ts, {"humidity": ...}) já registadas"""
+    model = DecayModel()
+    for ts, values in samples:
+        model.update(ts, values.get("humidity"))
+    return model
+
+
+def schedule(plants, sensors, models, now=None):
+    """
+    Agenda de rega prevista, ordenada pelo instante previsto
+    Plantas de andares sem tendência de secagem ficam em `unpredictable`
+    """
+    now = time.time() if now is None else now
+    events = []
+    unpredictable = []
+
+    for plant in plants:
+        floor = plant.get("andar")
+        current = sensors.get(floor, {}).get("humidity", DEFAULT_HUMIDITY)
+        target = plant.get("targets_humidade", DEFAULT_TARGET)
+        model = models.get(floor) or DecayModel()
+        hours = model.hours_until(current, target)
+        if hours is None:
+            unpredictable.append(plant["id"])
+            continue
+        events.append({
+            "plant_id": plant["id"],
+            "plant_name": plant["nome"],
+            "floor": floor,
+            "current_humidity": current,
+            "target_humidity": target,
+            "due_in_seconds": round(hours * 3600),
+            "due_at": now + hours * 3600
+        })
+
+    events.sort(key=lambda e: e["due_at"])
+    return events, unpredictable
+
+
+def next_sleep(events, now=None, unpredictable=0):
+    """
+    Segundos que o job agendado pode dormir até à próxima rega prevista
+    (as plantas já abaixo do target são tratadas na execução actual)
+    Só com todas as plantas previstas se dorme até MAX_SLEEP; com plantas
+    em `unpredictable` (ou sem nenhuma previsão) a espera não passa de
+    POLL_INTERVAL, porque o modelo nada sabe sobre elas
+    """
+    now = time.time() if now is None else now
+    upcoming = [e["due_at"] - now for e in events if e["due_at"] > now]
+    limit = MAX_SLEEP if upcoming and not unpredictable else POLL_INTERVAL
+    if not upcoming:
+        return limit
+    return int(min(max(min(upcoming), MIN_SLEEP), limit))
+
+
+def model_summary(models):
+    """Taxa de secagem por andar (%/hora relativa) para a resposta da API"""
+    summary = {}
+    for floor, model in models.items():
+        k = model.rate()
+        summary[floor] = {
+            "decay_per_hour": round(k, 5) if k is not None else None,
+            "samples": model.n,
+            "segment_start": model.t0
+        }
+    return summary
@@ -0,0 +1,259 @@
+"""
+GardenGes - Histórico dos sensores
+Colunas NumPy memory-mapped por andar, com rollups por minuto/hora/dia
+
+Cada andar tem um directório com um "tier" por resolução:
+    raw     uma linha por leitura (ts, humidity, temperature, light)
+    minute  uma linha por minuto  (ts, count, <métrica>_sum/_min/_max)
+    hour    uma linha por hora
+    day     uma linha por dia
+
+Cada coluna é um ficheiro binário próprio, aberto com np.memmap. Uma consulta
+escolhe o tier mais grosseiro que ainda satisfaz a resolução pedida e devolve
+fatias (views, sem cópia) das colunas desse tier: um gráfico de 30 dias lê
+algumas centenas de linhas do tier "hour" em vez de todas as leituras.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): sem lock entre processos
+    fcntl = None
+
+from gardenges.lazy import optional
+
+# Sem NumPy o histórico fica desactivado (ver available()); com ele, o import
+# só acontece na primeira escrita ou consulta
+np = optional("numpy")
+
+HISTORY_DIR = Path(os.environ.get("GARDENGES_HISTORY_DIR", "/tmp/gardenges_history"))
+
+METRICS = ("humidity", "temperature", "light")
+
+# Tiers: (nome, largura do bucket em segundos); 0 = leituras em bruto
+TIERS = (("raw", 0), ("minute", 60), ("hour", 3600), ("day", 86400))
+
+INITIAL_CAPACITY = 1024
+
+_floors = {}
+_floors_lock = threading.Lock()
+
+
+def available():
+    """O histórico precisa de NumPy"""
+    return np is not None
+
+
+def _tier_columns(width):
+    if width == 0:
+        return [("ts", "f8")] + [(metric, "f4") for metric in METRICS]
+    columns = [("ts", "f8"), ("count", "u4")]
+    for metric in METRICS:
+        columns += [(f"{metric}_sum", "f8"), (f"{metric}_min", "f4"), (f"{metric}_max", "f4")]
+    return columns
+
+
+class Tier:
+    """Conjunto de colunas memory-mapped com comprimento partilhado"""
+
+    def __init__(self, path, name, width):
+        self.path = Path(path)
+        self.name = name
+        self.width = width
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._dtypes = dict(_tier_columns(width))
+        self._length = self._open("length", "i8", 1)
+        self._capacity = 0
+        self.columns = {}
+        self._remap(max(INITIAL_CAPACITY, self.length))
+
+    def _open(self, name, dtype, rows):
+        file_path = self.path / f"{name}.col"
+        size = np.dtype(dtype).itemsize * rows
+        with open(file_path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=(rows,))
+
+    def _remap(self, capacity):
+        self.columns = {
+            name: self._open(name, dtype, capacity) for name, dtype in self._dtypes.items()
+        }
+        self._capacity = capacity
+
+    @property
+    def length(self):
+        return int(self._length[0])
+
+    def refresh(self):
+        """Volta a mapear as colunas se outro processo as fez crescer"""
+        if self.length > self._capacity:
+            self._remap(max(self.length, self._capacity * 2))
+
+    def append(self, row):
+        length = self.length
+        if length >= self._capacity:
+            self._remap(self._capacity * 2)
+        for name, value in row.items():
+            self.columns[name][length] = value
+        self._length[0] = length + 1
+
+    def last_ts(self):
+        length = self.length
+        return float(self.columns["ts"][length - 1]) if length else None
+
+    def range(self, start, end):
+        """Fatias (views) das colunas com start <= ts < end"""
+        self.refresh()
+        length = self.length
+        ts = self.columns["ts"][:length]
+        lo = int(np.searchsorted(ts, start, side="left"))
+        hi = int(np.searchsorted(ts, end, side="left"))
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+
+class FloorHistory:
+    """Histórico de um andar: tier raw + rollups"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tiers = {name: Tier(self.path / name, name, width) for name, width in TIERS}
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path / ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, ts, values):
+        """Regista uma leitura em todos os tiers (ignora leituras fora de ordem)"""
+        with self._locked():
+            for tier in self.tiers.values():
+                tier.refresh()
+
+            raw = self.tiers["raw"]
+            last = raw.last_ts()
+            if last is not None and ts <= last:
+                return False
+            raw.append({"ts": ts, **dict(zip(METRICS, values))})
+
+            for name, width in TIERS[1:]:
+                tier = self.tiers[name]
+                bucket = (ts // width) * width
+                length = tier.length
+                if length and tier.columns["ts"][length - 1] == bucket:
+                    i = length - 1
+                    cols = tier.columns
+                    cols["count"][i] += 1
+                    for metric, value in zip(METRICS, values):
+                        cols[f"{metric}_sum"][i] += value
+                        cols[f"{metric}_min"][i] = min(cols[f"{metric}_min"][i], value)
+                        cols[f"{metric}_max"][i] = max(cols[f"{metric}_max"][i], value)
+                else:
+                    row = {"ts": bucket, "count": 1}
+                    for metric, value in zip(METRICS, values):
+                        row.update({
+                            f"{metric}_sum": value, f"{metric}_min": value, f"{metric}_max": value
+                        })
+                    tier.append(row)
+            return True
+
+    def choose_tier(self, start, end, resolution=None, points=None):
+        """Tier mais grosseiro cuja largura não excede a resolução pedida"""
+        name, _ = tier_for(start, end, resolution, points)
+        return self.tiers[name]
+
+    def query(self, start, end, resolution=None, points=None):
+        """
+        Consulta [start, end): devolve (tier, colunas)
+        As colunas são views do memmap; nos rollups há count/_sum/_min/_max
+        """
+        tier = self.choose_tier(start, end, resolution, points)
+        return tier, tier.range(start, end)
+
+
+def tier_for(start, end, resolution=None, points=None):
+    """(nome, largura) do tier mais grosseiro que satisfaz a resolução pedida"""
+    wanted = resolution or 0
+    if points:
+        wanted = max(wanted, (end - start) / points)
+    chosen = TIERS[0]
+    for name, width in TIERS:
+        if width <= wanted:
+            chosen = (name, width)
+    return chosen
+
+
+def open_history(floor, create=True):
+    """
+    Histórico de um andar (mapeado uma vez por container)
+    Com `create=False` (consultas) devolve None se o andar ainda não tem
+    histórico, em vez de criar o directório e as colunas
+    """
+    with _floors_lock:
+        history = _floors.get(floor)
+        if history is None:
+            path = HISTORY_DIR / f"floor_{floor}"
+            if not create and not path.is_dir():
+                return None
+            history = FloorHistory(path)
+            _floors[floor] = history
+        return history
+
+
+def append_readings(sensors, ts):
+    """Regista as leituras {andar: {métrica: valor}} no histórico"""
+    if not available():
+        return 0
+    written = 0
+    for floor, reading in sensors.items():
+        values = [float(reading.get(metric) or 0) for metric in METRICS]
+        if open_history(int(floor)).append(ts, values):
+            written += 1
+    return written
+
+
+def series(tier, columns):
+    """Pontos do gráfico: média por bucket (ou valor em bruto) de cada métrica"""
+    if tier.width == 0:
+        values = {metric: columns[metric] for metric in METRICS}
+    else:
+        count = columns["count"]
+        values = {metric: columns[f"{metric}_sum"] / count for metric in METRICS}
+    return columns["ts"], values
+
+
+def empty_stats():
+    """Estatísticas de um intervalo sem leituras"""
+    return {metric: {"min": 0, "max": 0, "avg": 0} for metric in METRICS}
+
+
+def stats(tier, columns):
+    """Mínimo, máximo e média do intervalo, calculados sobre o tier escolhido"""
+    result = {}
+    if not len(columns["ts"]):
+        return empty_stats()
+    for metric in METRICS:
+        if tier.width == 0:
+            column = columns[metric]
+            low, high, avg = column.min(), column.max(), column.mean(dtype=np.float64)
+        else:
+            low = columns[f"{metric}_min"].min()
+            high = columns[f"{metric}_max"].max()
+            avg = columns[f"{metric}_sum"].sum() / columns["count"].sum()
+        result[metric] = {
+            "min": round(float(low), 1),
+            "max": round(float(high), 1),
+            "avg": round(float(avg), 1)
+        }
+    return result
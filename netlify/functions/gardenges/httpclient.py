@@ -0,0 +1,91 @@
+"""
+GardenGes - Cliente HTTP partilhado
+Sessão `requests` com pool de ligações keep-alive, reutilizada entre invocações
+
+Todas as chamadas externas (eWeLink, ntfy.sh, Groq) passam por aqui, para que
+pedidos repetidos no mesmo container reaproveitem as ligações TCP/TLS já
+abertas. Só os métodos idempotentes (GET, HEAD, OPTIONS) são repetidos com
+backoff em caso de falha de ligação ou resposta 429/5xx.
+"""
+
+import os
+import threading
+import time
+
+from gardenges.lazy import lazy
+
+# requests + urllib3 custam ~100 ms de import: só no primeiro pedido HTTP
+requests = lazy("requests")
+
+# Timeouts (segundos): ligação e leitura por pedido
+CONNECT_TIMEOUT = float(os.environ.get("GARDENGES_HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("GARDENGES_HTTP_READ_TIMEOUT", "10"))
+
+# Pool: nº de hosts em cache e ligações simultâneas por host
+POOL_CONNECTIONS = int(os.environ.get("GARDENGES_HTTP_POOL_CONNECTIONS", "8"))
+POOL_MAXSIZE = int(os.environ.get("GARDENGES_HTTP_POOL_MAXSIZE", "16"))
+
+# Repetições dos pedidos idempotentes
+RETRY_TOTAL = int(os.environ.get("GARDENGES_HTTP_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("GARDENGES_HTTP_BACKOFF", "0.3"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Sessão partilhada (criada no primeiro uso e mantida no container)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def request(method, url, timeout=None, deadline=None, **kwargs):
+    """
+    Faz um pedido pela sessão partilhada
+    `timeout` limita a leitura deste pedido; `deadline` (time.monotonic())
+    é o orçamento total da invocação e encurta o timeout se estiver perto
+    """
+    read_timeout = READ_TIMEOUT if timeout is None else timeout
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout("Orçamento de tempo esgotado")
+        read_timeout = min(read_timeout, remaining)
+    return get_session().request(
+        method, url, timeout=(min(CONNECT_TIMEOUT, read_timeout), read_timeout), **kwargs
+    )
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
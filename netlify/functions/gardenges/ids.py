@@ -0,0 +1,107 @@
+"""
+GardenGes - Gerador de IDs
+IDs únicos e ordenáveis no estilo ULID/Snowflake
+
+Layout (80 bits, 16 caracteres em Base32 Crockford):
+    48 bits  timestamp em milissegundos
+    16 bits  nó (processo/container)
+    16 bits  sequência dentro do mesmo milissegundo
+
+A ordem lexicográfica das strings coincide com a ordem temporal, pelo que os
+IDs servem directamente como chave de paginação.
+"""
+
+import os
+import random
+import threading
+import time
+
+# Alfabeto Base32 de Crockford (ordem ASCII crescente, sem I, L, O, U)
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+NODE_BITS = 16
+SEQUENCE_BITS = 16
+ID_LENGTH = 16
+
+_MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Tabela de pares de caracteres (10 bits de cada vez) para codificar mais depressa
+_PAIRS = [a + b for a in _ALPHABET for b in _ALPHABET]
+
+
+def _default_node():
+    """Nó configurado em GARDENGES_NODE_ID ou aleatório por processo"""
+    configured = os.environ.get("GARDENGES_NODE_ID")
+    if configured:
+        return int(configured) & ((1 << NODE_BITS) - 1)
+    return random.SystemRandom().getrandbits(NODE_BITS)
+
+
+class IdGenerator:
+    """Gerador monotónico: nunca repete nem recua, mesmo que o relógio recue"""
+
+    def __init__(self, node=None):
+        self.node = _default_node() if node is None else node
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _next_parts(self):
+        with self._lock:
+            now_ms = int(time.time() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            elif self._sequence < _MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                # Sequência esgotada neste milissegundo: avançar o relógio lógico
+                self._last_ms += 1
+                self._sequence = 0
+            return self._last_ms, self._sequence
+
+    def new_int(self):
+        """ID como inteiro de 80 bits"""
+        ms, sequence = self._next_parts()
+        return (ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node << SEQUENCE_BITS) | sequence
+
+    def new_id(self):
+        """ID como string Base32 de 16 caracteres"""
+        return encode(self.new_int())
+
+
+def encode(value):
+    """Codifica um inteiro de 80 bits em Base32 Crockford (largura fixa)"""
+    pairs = _PAIRS
+    return (
+        pairs[(value >> 70) & 1023] + pairs[(value >> 60) & 1023]
+        + pairs[(value >> 50) & 1023] + pairs[(value >> 40) & 1023]
+        + pairs[(value >> 30) & 1023] + pairs[(value >> 20) & 1023]
+        + pairs[(value >> 10) & 1023] + pairs[value & 1023]
+    )
+
+
+def timestamp_ms(plant_id):
+    """Extrai o timestamp (ms) de um ID gerado por este módulo"""
+    value = 0
+    for char in plant_id.upper():
+        value = (value << 5) | _ALPHABET.index(char)
+    return value >> (NODE_BITS + SEQUENCE_BITS)
+
+
+_generator = IdGenerator()
+
+
+def _reseed_after_fork():
+    # Processos filhos não podem partilhar o nó nem a sequência do pai
+    global _generator
+    _generator = IdGenerator()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_after_fork)
+
+
+def new_id():
+    """Novo ID único e ordenável no tempo"""
+    return _generator.new_id()
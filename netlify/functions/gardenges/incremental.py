@@ -0,0 +1,137 @@
+"""
+GardenGes - Rega incremental
+Recalcula apenas as plantas afectadas por uma alteração
+
+Mantém, por container, a última recomendação de cada planta, um índice de
+dependências andar → plantas e a humidade usada em cada andar. Em cada
+sincronização só são reavaliadas:
+    - as plantas alteradas no store desde a última vez (journal do store)
+    - as plantas dos andares cuja humidade mudou
+e só as recomendações que mudaram são devolvidas. O resumo global é mantido
+por contadores, sem percorrer o jardim inteiro.
+"""
+
+from gardenges.watering import DEFAULT_HUMIDITY, STATUSES, _summary, evaluate
+
+# Estado por store (vive enquanto o container estiver "warm")
+_states = {}
+
+
+class IncrementalWatering:
+    """Recomendações em cache com índice de dependências por andar"""
+
+    def __init__(self):
+        self.recommendations = {}  # plant_id -> recomendação
+        self.floors = {}           # andar -> {plant_id}
+        self.humidity = {}         # andar -> humidade usada no último cálculo
+        self.store = None          # store acompanhado
+        self.generation = None     # geração do store já aplicada
+        self._counts = [0, 0, 0]   # nº de plantas por estado (ordem de STATUSES)
+        self._total_ml = 0.0
+
+    def summary(self, floors=None):
+        """
+        Resumo global (pelos contadores) ou só dos andares em `floors`
+        (percorre apenas as plantas desses andares, pelo índice)
+        """
+        if floors is None:
+            return _summary(len(self.recommendations), self._counts, self._total_ml)
+        total = 0
+        counts = [0, 0, 0]
+        total_ml = 0.0
+        for floor in floors:
+            for plant_id in self.floors.get(floor, ()):
+                rec = self.recommendations[plant_id]
+                total += 1
+                counts[STATUSES.index(rec["status"])] += 1
+                total_ml += rec["ml_needed"]
+        return _summary(total, counts, total_ml)
+
+    def _forget(self, plant_id):
+        old = self.recommendations.pop(plant_id, None)
+        if old is None:
+            return None
+        self._counts[STATUSES.index(old["status"])] -= 1
+        self._total_ml -= old["ml_needed"]
+        floor_plants = self.floors.get(old["floor"])
+        if floor_plants is not None:
+            floor_plants.discard(plant_id)
+        return old
+
+    def _remember(self, rec):
+        self.recommendations[rec["plant_id"]] = rec
+        self._counts[STATUSES.index(rec["status"])] += 1
+        self._total_ml += rec["ml_needed"]
+        self.floors.setdefault(rec["floor"], set()).add(rec["plant_id"])
+
+    def _changed_floors(self, sensors):
+        changed = set()
+        for floor in set(self.humidity) | set(sensors):
+            humidity = sensors.get(floor, {}).get("humidity", DEFAULT_HUMIDITY)
+            if self.humidity.get(floor) != humidity:
+                changed.add(floor)
+                self.humidity[floor] = humidity
+        return changed
+
+    def sync(self, store, sensors, floors=None):
+        """
+        Aplica as alterações do store e dos sensores
+        Devolve (modo, recomendações alteradas, IDs removidos), só dos andares
+        em `floors` se indicados (o estado é sempre actualizado para todos)
+        """
+        plant_ids = None
+        if store is self.store and self.generation is not None:
+            plant_ids = store.changes_since(self.generation)
+        changed_floors = self._changed_floors(sensors)
+
+        if plant_ids is None:
+            # Primeira sincronização ou journal perdido: reconstruir tudo
+            mode = "full"
+            previous = self.recommendations
+            self.__init__()
+            self._changed_floors(sensors)
+            plants = store.all()
+            removed = [old for plant_id, old in previous.items() if store.get(plant_id) is None]
+        else:
+            mode = "incremental"
+            affected = set(plant_ids)
+            for floor in changed_floors:
+                affected |= self.floors.get(floor, set())
+            previous = {}
+            plants = []
+            removed = []
+            for plant_id in affected:
+                old = self._forget(plant_id)
+                if old is not None:
+                    previous[plant_id] = old
+                plant = store.get(plant_id)
+                if plant is not None:
+                    plants.append(plant)
+                elif old is not None:
+                    removed.append(old)
+
+        changed = []
+        for rec in evaluate(plants, sensors).recommendations():
+            self._remember(rec)
+            if previous.get(rec["plant_id"]) != rec:
+                changed.append(rec)
+
+        self.store = store
+        self.generation = store.generation
+        if floors is not None:
+            changed = [rec for rec in changed if rec["floor"] in floors]
+            removed = [old for old in removed if old["floor"] in floors]
+        return mode, changed, [old["plant_id"] for old in removed]
+
+
+def incremental_state(store):
+    """Estado incremental associado a um store (um por ficheiro de log)"""
+    state = _states.get(store.path)
+    if state is None:
+        state = _states[store.path] = IncrementalWatering()
+    return state
+
+
+def reset_state():
+    """Esquece todo o estado incremental (o próximo cálculo é completo)"""
+    _states.clear()
@@ -0,0 +1,62 @@
+"""
+GardenGes - Imports lazy
+Módulos pesados (requests, NumPy, hashlib...) só são importados no primeiro uso
+
+    np = optional("numpy")      # None se o NumPy não estiver instalado
+    hashlib = lazy("hashlib")   # importado no primeiro hashlib.sha256(...)
+
+Assim um pedido que não chega a usar o módulo (ex.: calculate-watering sem
+notify, plants sem paginação) não paga o import no cold start.
+"""
+
+import importlib.util
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Proxy que importa o módulo no primeiro acesso a um atributo"""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    # __import__ (e não importlib) para o perfil de imports o ver
+                    __import__(self._name)
+                    module = self.__dict__["_module"] = sys.modules[self._name]
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        state = "carregado" if self.__dict__["_module"] is not None else "por carregar"
+        return f"<módulo lazy {self._name!r} ({state})>"
+
+
+def lazy(name):
+    """Módulo importado no primeiro uso (já carregado: devolvido directamente)"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def optional(name):
+    """Como lazy(), mas None se o módulo não estiver instalado"""
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        found = importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        found = False
+    return LazyModule(name) if found else None
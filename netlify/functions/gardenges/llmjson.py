@@ -0,0 +1,178 @@
+"""
+GardenGes - JSON em respostas de LLM
+Extracção tolerante de JSON e validação/coerção por esquema
+
+O extractor percorre o texto (ou os pedaços de uma resposta em streaming) à
+procura do primeiro objecto ou array equilibrado, ignorando prosa, blocos
+```json``` e texto depois do fecho. Com streaming, quem consome pode parar
+de ler assim que o JSON fecha.
+
+Os esquemas são compilados uma vez numa lista de funções de coerção por
+campo: números em texto ("70 dias", "65%") passam a inteiros limitados ao
+intervalo do campo, e textos são normalizados e truncados.
+"""
+
+import json
+import math
+import re
+
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+class JsonExtractor:
+    """Procura incremental do primeiro valor JSON equilibrado ({...} ou [...])"""
+
+    def __init__(self, openers="{["):
+        self.openers = openers
+        self.value = None
+        self.done = False
+        self._start = None   # posição (no texto acumulado) do início do candidato
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """Acrescenta texto; devolve True quando um valor completo foi encontrado"""
+        if self.done:
+            return True
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text):
+            char = text[self._pos]
+            self._pos += 1
+
+            if self._start is None:
+                if char in self.openers:
+                    self._start = self._pos - 1
+                    self._stack = ["}" if char == "{" else "]"]
+                    self._in_string = self._escape = False
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if char != self._stack[-1]:
+                    self._restart()
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    candidate = text[self._start:self._pos]
+                    try:
+                        self.value = json.loads(candidate)
+                    except ValueError:
+                        self._restart()
+                        continue
+                    self.done = True
+                    return True
+        return False
+
+    def _restart(self):
+        # Candidato inválido: recomeçar a procura logo a seguir ao seu início
+        self._pos = self._start + 1
+        self._start = None
+        self._stack = []
+
+
+def extract_json(text, openers="{["):
+    """Primeiro objecto/array JSON válido no texto, ou None"""
+    extractor = JsonExtractor(openers)
+    extractor.feed(text or "")
+    return extractor.value
+
+
+# ----------------------------------------------------------------------
+# Esquemas
+# ----------------------------------------------------------------------
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError("booleano não é número")
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        match = _NUMBER.search(str(value))
+        if match is None:
+            raise ValueError(f"sem número em {value!r}")
+        number = float(match.group().replace(",", "."))
+    # json.loads aceita Infinity/NaN e 1e400 vira inf: não há inteiro para eles
+    if not math.isfinite(number):
+        raise ValueError(f"número não finito: {value!r}")
+    return number
+
+
+def integer(minimum=None, maximum=None):
+    """Campo inteiro: aceita números em texto e limita ao intervalo"""
+    def coerce(value):
+        number = int(round(_to_number(value)))
+        if minimum is not None:
+            number = max(minimum, number)
+        if maximum is not None:
+            number = min(maximum, number)
+        return number
+    return coerce
+
+
+def text(max_length=None):
+    """Campo de texto: espaços normalizados e truncado a `max_length`"""
+    def coerce(value):
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value)
+        result = " ".join(str(value).split())
+        if not result:
+            raise ValueError("texto vazio")
+        if max_length is not None and len(result) > max_length:
+            result = result[:max_length - 1].rstrip() + "…"
+        return result
+    return coerce
+
+
+def temperature_range(max_length=40):
+    """Range de temperatura: aceita "20-25°C", 22, [20, 25] ou {"min", "max"}"""
+    fallback = text(max_length)
+
+    def coerce(value):
+        if isinstance(value, dict) and "min" in value and "max" in value:
+            value = [value["min"], value["max"]]
+        if isinstance(value, (list, tuple)) and len(value) == 2:
+            low, high = sorted(_to_number(v) for v in value)
+            return f"{low:g}-{high:g}°C"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f"{value:g}°C"
+        return fallback(value)
+    return coerce
+
+
+def compile_schema(fields):
+    """
+    Compila {campo: coerção} num validador
+    O validador devolve um dict só com os campos do esquema, ou None se algum
+    faltar ou não puder ser convertido
+    """
+    compiled = tuple(fields.items())
+
+    def validate(entry):
+        if not isinstance(entry, dict):
+            return None
+        result = {}
+        for name, coerce in compiled:
+            value = entry.get(name)
+            if value is None:
+                return None
+            try:
+                result[name] = coerce(value)
+            except (TypeError, ValueError, OverflowError):
+                return None
+        return result
+
+    return validate
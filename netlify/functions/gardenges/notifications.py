@@ -0,0 +1,248 @@
+"""
+GardenGes - Notificações ntfy
+Pipeline de alertas de rega: deduplicação, digest por tópico e rate limiting
+
+    1. Deduplicação: cada (planta, estado) só volta a ser notificado depois de
+       NOTIFY_COOLDOWN segundos
+    2. Digest: os alertas de todos os andares e sites acumulam-se por tópico e
+       seguem numa só mensagem, no máximo uma vez por DIGEST_INTERVAL
+    3. Rate limiting: token bucket por tópico (NOTIFY_BURST mensagens seguidas,
+       repostas ao ritmo de NOTIFY_PER_HOUR)
+
+O estado fica num ficheiro JSON partilhado pelos processos do container. Os
+digests seguem para a outbox durável (ver outbox.py), drenada em background
+fora do caminho do pedido. Um digest que fica pronto sem novos alertas é
+enviado pelo próprio drainer (ver flush_due), sem esperar pelo próximo notify().
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): sem lock entre processos
+    fcntl = None
+
+from gardenges import outbox
+
+# Estado da pipeline (alertas pendentes, último envio, token buckets)
+NOTIFY_STATE_FILE = Path(os.environ.get("GARDENGES_NOTIFY_STATE", "/tmp/gardenges_notify.json"))
+
+# Janela de deduplicação por (planta, estado), em segundos
+NOTIFY_COOLDOWN = float(os.environ.get("GARDENGES_NOTIFY_COOLDOWN", str(6 * 3600)))
+
+# Intervalo mínimo entre digests do mesmo tópico, em segundos
+DIGEST_INTERVAL = float(os.environ.get("GARDENGES_NOTIFY_DIGEST_INTERVAL", "900"))
+
+# Token bucket por tópico
+NOTIFY_BURST = float(os.environ.get("GARDENGES_NOTIFY_BURST", "3"))
+NOTIFY_PER_HOUR = float(os.environ.get("GARDENGES_NOTIFY_PER_HOUR", "4"))
+
+# Diferença (%) a partir da qual o digest segue com prioridade alta
+HIGH_PRIORITY_DIFF = 10
+
+_state_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket simples (capacidade + reposição contínua)"""
+
+    def __init__(self, capacity=NOTIFY_BURST, per_hour=NOTIFY_PER_HOUR, tokens=None, updated=None):
+        self.capacity = capacity
+        self.rate = per_hour / 3600
+        self.tokens = capacity if tokens is None else tokens
+        self.updated = updated
+
+    def take(self, now):
+        """Consome um token; False se o bucket estiver vazio"""
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait(self, now):
+        """Segundos até haver um token, sem o consumir (None se não há reposição)"""
+        tokens = self.tokens
+        if self.updated is not None:
+            tokens = min(self.capacity, tokens + (now - self.updated) * self.rate)
+        if tokens >= 1:
+            return 0
+        return (1 - tokens) / self.rate if self.rate else None
+
+    def to_dict(self):
+        return {"tokens": self.tokens, "updated": self.updated}
+
+
+def dedup_key(rec):
+    return f"{rec['plant_id']}:{rec['status']}"
+
+
+@contextmanager
+def _state():
+    """Estado da pipeline, lido e gravado sob lock (thread + processo)"""
+    with _state_lock:
+        lock_file = None
+        if fcntl is not None:
+            lock_file = open(NOTIFY_STATE_FILE.with_name(NOTIFY_STATE_FILE.name + ".lock"), 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(NOTIFY_STATE_FILE, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            for section in ("sent", "pending", "last_digest", "buckets"):
+                state.setdefault(section, {})
+
+            yield state
+
+            tmp_path = NOTIFY_STATE_FILE.with_name(NOTIFY_STATE_FILE.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, NOTIFY_STATE_FILE)
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+
+def submit(topic, recommendations, sites=None, now=None):
+    """
+    Junta ao digest pendente do tópico os alertas que não estão em cooldown
+    `sites` ({andar: site}) permite agrupar o digest por site
+    """
+    now = time.time() if now is None else now
+    queued = suppressed = 0
+    with _state() as state:
+        sent = state["sent"]
+        for key in [k for k, ts in sent.items() if now - ts >= NOTIFY_COOLDOWN]:
+            del sent[key]
+
+        pending = state["pending"].setdefault(topic, {})
+        for rec in recommendations:
+            if rec["status"] == "ok":
+                continue
+            if dedup_key(rec) in sent:
+                suppressed += 1
+                continue
+            # Coalescer: a planta aparece uma vez por digest, com o estado mais recente
+            pending[rec["plant_id"]] = {
+                "plant_id": rec["plant_id"],
+                "plant_name": rec["plant_name"],
+                "floor": rec["floor"],
+                "site": (sites or {}).get(rec["floor"]),
+                "status": rec["status"],
+                "difference": rec["difference"],
+                "sprays_needed": rec["sprays_needed"]
+            }
+            queued += 1
+        return {"queued": queued, "suppressed": suppressed, "pending": len(pending)}
+
+
+def _dispatch(state, topic, now):
+    """
+    Passa o digest do tópico para a outbox se o intervalo passou e o token
+    bucket o permitir. Os alertas só saem dos pendentes e entram em cooldown
+    depois de a outbox aceitar a mensagem: se o enqueue falhar, a excepção
+    atravessa _state() e o estado não é gravado
+    """
+    pending = state["pending"].get(topic)
+    if not pending:
+        return None
+    if now - state["last_digest"].get(topic, 0) < DIGEST_INTERVAL:
+        return None
+
+    bucket = TokenBucket(**state["buckets"].get(topic, {}))
+    allowed = bucket.take(now)
+    state["buckets"][topic] = bucket.to_dict()
+    if not allowed:
+        return None
+
+    entries = list(pending.values())
+    title, message, priority = build_digest(entries)
+    message_id = outbox.enqueue(topic, title, message, priority)
+
+    state["pending"][topic] = {}
+    state["last_digest"][topic] = now
+    for entry in entries:
+        state["sent"][dedup_key(entry)] = now
+    return message_id
+
+
+def _digest_wait(state, topic, now):
+    """Segundos até o digest pendente do tópico poder seguir (None: nunca)"""
+    interval = state["last_digest"].get(topic, 0) + DIGEST_INTERVAL - now
+    bucket = TokenBucket(**state["buckets"].get(topic, {})).wait(now)
+    return None if bucket is None else max(interval, bucket, 0)
+
+
+def build_digest(entries):
+    """Título, mensagem e prioridade do digest (agrupado por site e andar)"""
+    entries = sorted(entries, key=lambda e: (str(e.get("site") or ""), e["floor"] or 0))
+    lines = []
+    current_site = None
+    multi_site = len({e.get("site") for e in entries}) > 1
+    for entry in entries:
+        if multi_site and entry.get("site") != current_site:
+            current_site = entry.get("site")
+            lines.append(f"\n📍 {current_site or 'Sem site'}")
+        lines.append(
+            f"• {entry['plant_name']} ({entry['floor']}º andar): {entry['sprays_needed']} spray(s)"
+        )
+
+    total_sprays = sum(e["sprays_needed"] for e in entries)
+    message = (
+        "🌱 Rega Necessária\n\n" + "\n".join(lines).lstrip("\n")
+        + f"\n\nTotal: {total_sprays} spray(s) em {len(entries)} planta(s)"
+    )
+    high = any(e["difference"] > HIGH_PRIORITY_DIFF for e in entries)
+    return "GardenGes - Alerta de Rega", message, "high" if high else "default"
+
+
+def dispatch(topic, now=None):
+    """
+    Passa o digest do tópico para a outbox, se houver um pronto
+    Devolve o ID da mensagem na outbox, ou None
+    """
+    now = time.time() if now is None else now
+    with _state() as state:
+        return _dispatch(state, topic, now)
+
+
+def flush_due(now=None):
+    """
+    Passa para a outbox os digests de todos os tópicos que já estão prontos
+    Chamado pelo drainer da outbox; devolve segundos até ao próximo digest
+    pendente poder seguir, ou None se não há nenhum
+    """
+    now = time.time() if now is None else now
+    next_in = None
+    with _state() as state:
+        for topic, pending in list(state["pending"].items()):
+            if not pending or _dispatch(state, topic, now) is not None:
+                continue
+            wait = _digest_wait(state, topic, now)
+            if wait is not None:
+                next_in = wait if next_in is None else min(next_in, wait)
+    return next_in
+
+
+def notify(topic, recommendations, sites=None):
+    """
+    Regista os alertas e, se o digest estiver pronto, coloca-o na outbox
+    Não espera pelo ntfy.sh: o envio fica a cargo do drainer da outbox
+    """
+    result = submit(topic, recommendations, sites)
+    result["message_id"] = dispatch(topic) if result["pending"] else None
+    return result
+
+
+# Digests que ficam prontos sem novo notify() seguem na próxima drenagem
+outbox.add_producer(flush_due)
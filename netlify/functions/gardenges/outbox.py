@@ -0,0 +1,289 @@
+"""
+GardenGes - Outbox de notificações
+Fila durável (log append-only em /tmp) com drenagem em background e retries
+
+Cada mensagem recebe um ID (ver ids.py) no momento em que entra na fila e o
+pedido HTTP não espera pelo envio. Um único drainer por container envia as
+mensagens pendentes; falhas voltam à fila com backoff exponencial até
+OUTBOX_MAX_ATTEMPTS. O estado de cada mensagem pode ser consultado pelo ID.
+
+Registos do log (uma linha JSON cada):
+    {"op": "enqueue", "message": {...}}           nova mensagem
+    {"op": "update", "id": ..., "changes": {...}}  tentativa de envio
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): sem lock entre processos
+    fcntl = None
+
+from gardenges import httpclient
+from gardenges.ids import new_id
+
+NTFY_URL = os.environ.get("NTFY_URL", "https://ntfy.sh")
+
+OUTBOX_FILE = Path(os.environ.get("GARDENGES_OUTBOX_FILE", "/tmp/gardenges_outbox.jsonl"))
+
+# Retries: nº máximo de tentativas e backoff exponencial (segundos)
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("GARDENGES_OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF = float(os.environ.get("GARDENGES_OUTBOX_BACKOFF", "15"))
+OUTBOX_MAX_BACKOFF = 3600
+
+# Timeout de cada envio (o drainer corre fora do pedido)
+SEND_TIMEOUT = 10
+
+# Mensagens terminadas (sent/failed) mantidas no log depois da compactação
+OUTBOX_RETENTION = 7 * 24 * 3600
+COMPACT_MIN_RECORDS = 256
+
+# Estados de uma mensagem
+PENDING, SENT, FAILED = "pending", "sent", "failed"
+
+_lock = threading.RLock()
+_wakeup = threading.Event()
+_drainer = None
+
+# Funções chamadas em cada drenagem, antes do envio, que podem enfileirar
+# mensagens (ex.: digests prontos de notifications.py); cada uma devolve os
+# segundos até voltar a ter algo para enfileirar, ou None
+_producers = []
+
+
+@contextmanager
+def _locked():
+    """Lock exclusivo (thread + processo) para ler e escrever o log"""
+    with _lock:
+        lock_file = None
+        if fcntl is not None:
+            lock_file = open(OUTBOX_FILE.with_name(OUTBOX_FILE.name + ".lock"), 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+
+def _append(*records):
+    line = "".join(
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records
+    )
+    with open(OUTBOX_FILE, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def _load():
+    """Estado de todas as mensagens {id: mensagem} e nº de registos no log"""
+    messages = {}
+    records = 0
+    try:
+        with open(OUTBOX_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Linha incompleta de uma escrita interrompida
+                    continue
+                records += 1
+                if record.get("op") == "enqueue":
+                    message = record["message"]
+                    messages[message["id"]] = message
+                elif record.get("op") == "update" and record.get("id") in messages:
+                    messages[record["id"]].update(record["changes"])
+    except FileNotFoundError:
+        pass
+    return messages, records
+
+
+def _compact(messages, now):
+    """Reescreve o log sem as mensagens terminadas há mais de OUTBOX_RETENTION"""
+    tmp_path = OUTBOX_FILE.with_name(OUTBOX_FILE.name + ".compact")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for message in messages.values():
+            if message["status"] != PENDING and now - message["updated"] > OUTBOX_RETENTION:
+                continue
+            record = {"op": "enqueue", "message": message}
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, OUTBOX_FILE)
+
+
+def add_producer(producer):
+    """Regista uma função a chamar em cada drenagem (ver _producers)"""
+    with _lock:
+        if producer not in _producers:
+            _producers.append(producer)
+
+
+def _run_producers(now):
+    """Corre os produtores; devolve os segundos até ao próximo ou None"""
+    next_in = None
+    for producer in list(_producers):
+        try:
+            wait = producer(now)
+        except Exception as e:
+            print(f"Erro ao produzir mensagens para a outbox: {e}")
+            wait = OUTBOX_BACKOFF
+        if wait is not None:
+            next_in = wait if next_in is None else min(next_in, wait)
+    return next_in
+
+
+def enqueue(topic, title, message, priority="default", tags="seedling,droplet"):
+    """Acrescenta uma mensagem à outbox e acorda o drainer; devolve o ID"""
+    now = time.time()
+    entry = {
+        "id": new_id(),
+        "topic": topic,
+        "title": title,
+        "message": message,
+        "priority": priority,
+        "tags": tags,
+        "status": PENDING,
+        "attempts": 0,
+        "next_at": now,
+        "created": now,
+        "updated": now,
+        "error": None
+    }
+    with _locked():
+        _append({"op": "enqueue", "message": entry})
+    start_drainer()
+    _wakeup.set()
+    return entry["id"]
+
+
+def status(message_id):
+    """Estado público de uma mensagem (sem o conteúdo), ou None"""
+    with _locked():
+        messages, _ = _load()
+    message = messages.get(message_id)
+    if message is None:
+        return None
+    return {key: message[key] for key in (
+        "id", "topic", "status", "attempts", "next_at", "created", "updated", "error"
+    )}
+
+
+def stats():
+    """Nº de mensagens por estado"""
+    with _locked():
+        messages, _ = _load()
+    counts = {PENDING: 0, SENT: 0, FAILED: 0}
+    for message in messages.values():
+        counts[message["status"]] = counts.get(message["status"], 0) + 1
+    return counts
+
+
+def _send(message):
+    try:
+        response = httpclient.post(
+            f"{NTFY_URL}/{message['topic']}",
+            data=message["message"].encode('utf-8'),
+            headers={
+                "Title": message["title"],
+                "Priority": message["priority"],
+                "Tags": message["tags"]
+            },
+            timeout=SEND_TIMEOUT
+        )
+    except Exception as e:
+        return str(e)
+    if response.status_code == 200:
+        return None
+    return f"HTTP {response.status_code}"
+
+
+@contextmanager
+def _drain_lock():
+    """
+    Só um drainer de cada vez entre processos (lock não bloqueante)
+    Produz False se outro processo já está a drenar
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(OUTBOX_FILE.with_name(OUTBOX_FILE.name + ".drain"), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def drain(now=None, limit=None):
+    """
+    Envia as mensagens pendentes cujo instante de envio já chegou, depois de
+    dar aos produtores a oportunidade de enfileirar as suas
+    Devolve (nº de envios tentados, segundos até à próxima mensagem ou None)
+    """
+    with _drain_lock() as acquired:
+        if not acquired:
+            return 0, OUTBOX_BACKOFF
+
+        now = time.time() if now is None else now
+        produce_in = _run_producers(now)
+        with _locked():
+            messages, records = _load()
+            if records >= COMPACT_MIN_RECORDS and records > 2 * len(messages):
+                _compact(messages, now)
+        due = sorted(
+            (m for m in messages.values() if m["status"] == PENDING and m["next_at"] <= now),
+            key=lambda m: m["next_at"]
+        )[:limit]
+
+        for message in due:
+            error = _send(message)
+            attempts = message["attempts"] + 1
+            sent_at = time.time()
+            if error is None:
+                changes = {"status": SENT, "attempts": attempts, "updated": sent_at, "error": None}
+            elif attempts >= OUTBOX_MAX_ATTEMPTS:
+                changes = {"status": FAILED, "attempts": attempts, "updated": sent_at, "error": error}
+            else:
+                delay = min(OUTBOX_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+                changes = {
+                    "attempts": attempts, "next_at": sent_at + delay,
+                    "updated": sent_at, "error": error
+                }
+            message.update(changes)
+            with _locked():
+                _append({"op": "update", "id": message["id"], "changes": changes})
+
+    waiting = [
+        max(m["next_at"] - time.time(), 0) for m in messages.values() if m["status"] == PENDING
+    ]
+    if produce_in is not None:
+        waiting.append(produce_in)
+    return len(due), (min(waiting) if waiting else None)
+
+
+def _drain_forever():
+    while True:
+        _wakeup.clear()
+        try:
+            _, wait_for = drain()
+        except Exception as e:
+            print(f"Erro ao drenar a outbox: {e}")
+            wait_for = OUTBOX_BACKOFF
+        _wakeup.wait(timeout=wait_for)
+
+
+def start_drainer():
+    """Arranca (uma vez por container) o drainer em background"""
+    global _drainer
+    with _lock:
+        if _drainer is None or not _drainer.is_alive():
+            _drainer = threading.Thread(target=_drain_forever, name="outbox-drainer", daemon=True)
+            _drainer.start()
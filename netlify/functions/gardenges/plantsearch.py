@@ -0,0 +1,98 @@
+"""
+GardenGes - Pesquisa de plantas por nome
+Índice de nomes normalizados (sem acentos), aliases e trigramas
+
+A pesquisa é feita por ordem de confiança:
+    1. nome ou alias exacto, depois de normalizado ("Jalapeno" = "jalapeño")
+    2. nome do catálogo contido no pedido ("tomate cherry grande" → "tomate cherry")
+       ou pedido contido num nome ("reaper" → "carolina reaper")
+    3. semelhança de trigramas (erros de escrita: "manjericao" → "manjericão")
+
+Os candidatos dos passos 2 e 3 vêm do índice invertido de trigramas, pelo que
+o custo depende do nº de nomes parecidos e não do tamanho do catálogo.
+"""
+
+import re
+import unicodedata
+
+# Semelhança mínima (coeficiente de Dice dos trigramas) para um match aproximado
+MIN_FUZZY_SCORE = 0.5
+
+# Pontuações dos matches por contenção (acima de qualquer match aproximado)
+CONTAINED_KEY_SCORE = 0.9
+CONTAINED_QUERY_SCORE = 0.8
+
+_NON_ALNUM = re.compile(r"[^a-z0-9º]+")
+
+
+def normalize(name):
+    """Minúsculas, sem acentos, pontuação como espaço ("Piri-Piri" → "piri piri")"""
+    folded = unicodedata.normalize("NFKD", str(name).lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", folded).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlantIndex:
+    """Índice de pesquisa sobre os nomes do catálogo e respectivos aliases"""
+
+    def __init__(self, names, aliases=None):
+        # Forma normalizada -> nome do catálogo (os aliases apontam para o nome)
+        self.keys = {}
+        for name in names:
+            self.keys.setdefault(normalize(name), name)
+        for alias, name in (aliases or {}).items():
+            self.keys.setdefault(normalize(alias), name)
+
+        self._grams = {}
+        self._index = {}
+        for key in self.keys:
+            grams = trigrams(key)
+            self._grams[key] = grams
+            for gram in grams:
+                self._index.setdefault(gram, []).append(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query, limit=5):
+        """Melhores matches: lista de (pontuação, nome do catálogo), por ordem"""
+        query = normalize(query)
+        if not query:
+            return []
+        if query in self.keys:
+            return [(1.0, self.keys[query])]
+
+        grams = trigrams(query)
+        shared = {}
+        for gram in grams:
+            for key in self._index.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+
+        best = {}
+        padded_query = f" {query} "
+        for key, common in shared.items():
+            if f" {key} " in padded_query:
+                score = CONTAINED_KEY_SCORE + 0.09 * len(key) / len(query)
+            elif query in key:
+                score = CONTAINED_QUERY_SCORE + 0.09 * len(query) / len(key)
+            else:
+                score = 2 * common / (len(grams) + len(self._grams[key]))
+                if score < MIN_FUZZY_SCORE:
+                    continue
+                score *= CONTAINED_QUERY_SCORE - 0.01
+            name = self.keys[key]
+            if score > best.get(name, 0):
+                best[name] = score
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        return [(round(score, 4), name) for name, score in ranked[:limit]]
+
+    def best(self, query):
+        """Nome do catálogo que melhor corresponde ao pedido, ou None"""
+        matches = self.search(query, limit=1)
+        return matches[0][1] if matches else None
@@ -0,0 +1,141 @@
+"""
+GardenGes - Perfil de imports (cold start)
+Tempo de import por módulo, como `python -X importtime`, medido dentro da função
+
+Desligado por omissão. Com GARDENGES_PROFILE_IMPORTS=1, cada função chama
+start() antes dos restantes imports e a primeira resposta do container leva:
+
+    Server-Timing: import;dur=182.4
+    X-Import-Profile: numpy=105.1;datetime=2.0;gardenges.notifications=1.7;...
+
+O relatório completo (tempo próprio e cumulativo de cada módulo) vai também
+para os logs da função. Os imports lazy (ver lazy.py) feitos durante o
+primeiro pedido entram no relatório.
+"""
+
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+
+PROFILE_IMPORTS = os.environ.get("GARDENGES_PROFILE_IMPORTS", "") == "1"
+
+# Nº de módulos (os mais lentos) no header X-Import-Profile
+PROFILE_TOP = int(os.environ.get("GARDENGES_PROFILE_TOP", "8"))
+
+_original_import = None
+_records = {}      # módulo -> (ms próprios, ms cumulativos, profundidade)
+_total = [0.0]     # ms dos imports de topo (sem contar os aninhados duas vezes)
+_local = threading.local()
+_reported = False
+
+
+def _timed_import(name):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0)
+    started = time.perf_counter()
+    loaded = False
+    try:
+        _original_import(name)
+        loaded = True
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        else:
+            _total[0] += elapsed
+        if loaded:
+            _records.setdefault(name, (elapsed - nested, elapsed, len(stack)))
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    if name not in sys.modules:
+        _timed_import(name)
+
+    # `from pacote import submódulo`: o submódulo é importado pelo importlib
+    # sem passar por __import__, por isso mede-se aqui à parte
+    package = sys.modules.get(name)
+    if fromlist and hasattr(package, "__path__"):
+        for item in fromlist:
+            submodule = f"{name}.{item}"
+            if item == "*" or submodule in sys.modules or hasattr(package, item):
+                continue
+            try:
+                _timed_import(submodule)
+            except ModuleNotFoundError as e:
+                if e.name != submodule:
+                    raise
+
+    return _original_import(name, globals, locals, fromlist, level)
+
+
+def start():
+    """Começa a medir os imports (só com GARDENGES_PROFILE_IMPORTS=1)"""
+    global _original_import
+    if not PROFILE_IMPORTS or _original_import is not None:
+        return
+    _original_import = builtins.__import__
+    builtins.__import__ = _profiled_import
+
+
+def stop():
+    """Repõe o __import__ original"""
+    global _original_import
+    if _original_import is not None:
+        builtins.__import__ = _original_import
+        _original_import = None
+
+
+def report(top=None, max_depth=None):
+    """
+    Total e módulos ordenados pelo tempo cumulativo de import
+    `max_depth=0` fica só com os imports feitos directamente pelas funções
+    (os aninhados já contam no cumulativo de quem os importou)
+    """
+    ranked = sorted(_records.items(), key=lambda item: -item[1][1])
+    if max_depth is not None:
+        ranked = [item for item in ranked if item[1][2] <= max_depth]
+    if top is not None:
+        ranked = ranked[:top]
+    return {
+        "total_ms": round(_total[0], 1),
+        "modules": [
+            {
+                "module": name,
+                "self_ms": round(own, 1),
+                "cumulative_ms": round(cumulative, 1),
+                "depth": depth
+            }
+            for name, (own, cumulative, depth) in ranked
+        ]
+    }
+
+
+def response_headers():
+    """
+    Headers com o perfil, só na primeira resposta do container ({} nas
+    seguintes ou com o perfil desligado); o relatório vai também para os logs
+    """
+    global _reported
+    if _original_import is None or _reported:
+        return {}
+    _reported = True
+
+    profile = report()
+    print(f"Perfil de imports: {json.dumps(profile)}")
+    modules = ";".join(
+        f"{entry['module']}={entry['cumulative_ms']}"
+        for entry in report(PROFILE_TOP, max_depth=0)["modules"]
+    )
+    return {
+        "Server-Timing": f"import;dur={profile['total_ms']}",
+        "X-Import-Profile": modules
+    }
@@ -0,0 +1,58 @@
+"""
+GardenGes - Respostas HTTP
+Headers CORS e respostas JSON partilhados pelas Netlify Functions
+
+    headers = cors_headers("GET, OPTIONS")
+    early = preflight(event, headers, "GET")
+    if early:
+        return early
+    return respond(headers, 200, {"ok": True})
+
+Com o perfil de imports activo (ver profiling.py), a primeira resposta de
+cada container leva também os tempos de import nos headers.
+"""
+
+import json
+
+from gardenges import profiling
+
+
+def cors_headers(methods, allow_headers="Content-Type"):
+    """Headers CORS + JSON para uma função que aceita `methods` ("GET, OPTIONS")"""
+    return {
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Headers": allow_headers,
+        "Access-Control-Allow-Methods": methods,
+        "Content-Type": "application/json"
+    }
+
+
+def respond(headers, status, body, ensure_ascii=True):
+    """Resposta da função; `body` que não seja texto é serializado em JSON"""
+    if not isinstance(body, str):
+        body = json.dumps(body, ensure_ascii=ensure_ascii)
+    timing = profiling.response_headers()
+    return {
+        "statusCode": status,
+        "headers": {**headers, **timing} if timing else headers,
+        "body": body
+    }
+
+
+def error(headers, status, message):
+    """Resposta de erro {"error": message}"""
+    return respond(headers, status, {"error": message})
+
+
+def preflight(event, headers, *methods):
+    """
+    Resposta ao preflight CORS (OPTIONS) ou 405 se o método não for um de
+    `methods`; None se o pedido deve seguir para o handler
+    """
+    method = event.get("httpMethod")
+    if method == "OPTIONS":
+        return respond(headers, 200, "")
+    if methods and method not in methods:
+        allowed = " ou ".join(methods)
+        return error(headers, 405, f"Apenas {allowed} é permitido")
+    return None
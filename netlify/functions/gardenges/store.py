@@ -0,0 +1,555 @@
+"""
+GardenGes - Plant Store
+Motor de armazenamento das plantas: log append-only com compactação periódica
+
+Cada mutação acrescenta um registo JSON (uma linha) ao log, em vez de
+reescrever o ficheiro inteiro. Em memória mantém-se um índice primário por
+`id` e um índice secundário único por `(andar, slot_index)`.
+
+Os stores abertos ficam em cache ao nível do módulo, partilhada por todas as
+funções do mesmo container. Invocações "warm" validam a cache com um único
+stat() (inode, tamanho, mtime) e só lêem do disco os registos acrescentados
+desde a última leitura.
+
+As mutações correm sob um lock exclusivo (fcntl) num ficheiro `.lock` ao lado
+do log: o store sincroniza-se com o disco, valida e só então acrescenta o
+registo, pelo que escritores concorrentes nunca perdem plantas. A compactação
+escreve num ficheiro temporário e faz rename atómico, e os leitores só aplicam
+linhas completas, nunca vendo um ficheiro truncado.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): sem lock entre processos
+    fcntl = None
+
+# Log de registos (uma linha JSON por mutação)
+LOG_FILE = Path(os.environ.get("GARDENGES_STORE_FILE", "/tmp/plants_data.jsonl"))
+
+# Ficheiro antigo (documento JSON completo), importado na primeira abertura
+LEGACY_DATA_FILE = LOG_FILE.with_suffix(".json")
+
+# Compactar quando existirem mais registos mortos do que plantas vivas
+COMPACT_MIN_GARBAGE = 64
+
+# Cache de stores por caminho (vive enquanto o container estiver "warm")
+_STORES = {}
+_CACHE_STATS = {"hits": 0, "misses": 0, "tail_reads": 0}
+
+# Nº de alterações recentes (IDs) guardadas para consumidores incrementais
+JOURNAL_SIZE = 4096
+
+# Espera máxima pelo lock de escrita (segundos) e intervalo inicial entre tentativas
+LOCK_TIMEOUT = 5.0
+LOCK_RETRY_DELAY = 0.002
+
+
+class SlotConflictError(ValueError):
+    """O slot (andar, slot_index) já está ocupado por outra planta"""
+
+    def __init__(self, message, conflicts=None):
+        super().__init__(message)
+        self.conflicts = conflicts or []  # índices das plantas em conflito (lotes)
+
+
+class VersionConflictError(ValueError):
+    """A planta foi alterada por outro pedido (versão esperada não coincide)"""
+
+
+class StoreBusyError(RuntimeError):
+    """Não foi possível obter o lock de escrita dentro do tempo limite"""
+
+
+def slot_key(plant):
+    """Chave do índice secundário: (andar, slot_index)"""
+    if plant.get("andar") is None or plant.get("slot_index") is None:
+        return None
+    return (int(plant["andar"]), int(plant["slot_index"]))
+
+
+def name_key(plant):
+    """Chave do índice por nome (sem distinção de maiúsculas)"""
+    return str(plant.get("nome", "")).lower()
+
+
+class PlantStore:
+    """Store de plantas com índices em memória sobre um log append-only"""
+
+    def __init__(self, path=LOG_FILE, legacy_path=LEGACY_DATA_FILE):
+        self.path = Path(path)
+        self._plants = {}   # id -> planta (índice primário)
+        self._slots = {}    # (andar, slot_index) -> id (índice secundário)
+        self._garbage = 0   # registos no log que já não representam estado vivo
+        self._offset = 0    # bytes do log já aplicados aos índices
+        self._torn = False  # o log termina numa linha incompleta
+        self._stat_key = None
+        self._lock_depth = 0
+        # Índices ordenados para consultas, construídos na primeira consulta e
+        # descartados a cada mutação (reconstruídos de uma vez na seguinte):
+        # {"ids": [id], "names": [(nome, id)], "floors": {andar: [slot_index]}}
+        self._ordered = None
+        # Alterações recentes: cada registo aplicado incrementa `generation` e
+        # junta o ID ao journal; `_journal_base` é a 1ª geração coberta
+        self.generation = 0
+        self._journal = deque(maxlen=JOURNAL_SIZE)
+        self._journal_base = 0
+
+        if self.path.exists():
+            self._stat_key = self._replay()
+        elif legacy_path and Path(legacy_path).exists():
+            with self._write_lock():
+                if not self.path.exists():
+                    self._import_legacy(Path(legacy_path))
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def all(self):
+        """Lista de todas as plantas (ordem de inserção)"""
+        return list(self._plants.values())
+
+    def get(self, plant_id):
+        """Planta por ID, ou None"""
+        return self._plants.get(plant_id)
+
+    def get_by_slot(self, andar, slot_index):
+        """Planta que ocupa o slot, ou None"""
+        plant_id = self._slots.get((int(andar), int(slot_index)))
+        return self._plants.get(plant_id) if plant_id is not None else None
+
+    def query(self, andar=None, slot_min=None, slot_max=None, prefix=None,
+              after=None, limit=None):
+        """
+        Consulta servida pelos índices ordenados
+        Devolve (plantas, chave_seguinte); a chave serve de cursor (`after`)
+        para a página seguinte e é None quando não há mais resultados
+
+        Ordem: por slot_index quando se filtra por andar, por nome quando há
+        prefixo, e por ID (ordem de criação) nos restantes casos.
+        """
+        ordered = self._ensure_ordered()
+        prefix = prefix.lower() if prefix else None
+
+        if andar is not None:
+            andar = int(andar)
+            slots = ordered["floors"].get(andar, [])
+            start = bisect_left(slots, slot_min) if slot_min is not None else 0
+            if after is not None:
+                start = max(start, bisect_right(slots, after))
+            stop = bisect_right(slots, slot_max) if slot_max is not None else len(slots)
+            candidates = (
+                (slots[i], self._plants[self._slots[(andar, slots[i])]])
+                for i in range(start, stop)
+            )
+        elif prefix:
+            names = ordered["names"]
+            start = bisect_left(names, (prefix,))
+            if after is not None:
+                start = max(start, bisect_right(names, tuple(after)))
+            candidates = (
+                ([names[i][0], names[i][1]], self._plants[names[i][1]])
+                for i in range(start, len(names))
+            )
+        else:
+            ids = ordered["ids"]
+            start = bisect_right(ids, after) if after is not None else 0
+            candidates = ((ids[i], self._plants[ids[i]]) for i in range(start, len(ids)))
+
+        page = []
+        last_key = None
+        for key, plant in candidates:
+            if prefix and not name_key(plant).startswith(prefix):
+                if andar is None:
+                    break  # índice por nome: acabaram os nomes com este prefixo
+                continue
+            if andar is None and (slot_min is not None or slot_max is not None):
+                slot = plant.get("slot_index")
+                if slot is None:
+                    continue
+                if slot_min is not None and int(slot) < slot_min:
+                    continue
+                if slot_max is not None and int(slot) > slot_max:
+                    continue
+            if limit is not None and len(page) == limit:
+                return page, last_key
+            page.append(plant)
+            last_key = key
+
+        return page, None
+
+    def iter_plants(self):
+        """Itera as plantas sem construir uma lista"""
+        return iter(self._plants.values())
+
+    def changes_since(self, generation):
+        """
+        IDs das plantas criadas, alteradas ou removidas depois de `generation`
+        None se o journal já não cobre esse ponto (reload ou demasiadas alterações)
+        """
+        missing = self.generation - generation
+        if missing < 0 or generation < self._journal_base or missing > len(self._journal):
+            return None
+        if not missing:
+            return set()
+        return set(list(self._journal)[-missing:])
+
+    def __len__(self):
+        return len(self._plants)
+
+    # ------------------------------------------------------------------
+    # Mutações (O(1) amortizado)
+    # ------------------------------------------------------------------
+
+    def insert(self, plant):
+        """Adiciona uma planta nova; falha se o slot estiver ocupado"""
+        with self._write_lock():
+            key = slot_key(plant)
+            if key is not None and key in self._slots:
+                raise SlotConflictError("Este slot já está ocupado")
+
+            plant = {**plant, "version": 1}
+            self._append({"op": "put", "plant": plant})
+            self._apply_put(plant)
+            self._maybe_compact()
+            return plant
+
+    def insert_many(self, plants):
+        """
+        Adiciona um lote de plantas numa única escrita (tudo ou nada)
+        Os conflitos de slot, com o store e dentro do próprio lote, são
+        detectados numa só passagem antes de gravar
+        """
+        with self._write_lock():
+            seen = set()
+            conflicts = []
+            for index, plant in enumerate(plants):
+                key = slot_key(plant)
+                if key is None:
+                    continue
+                if key in self._slots or key in seen:
+                    conflicts.append(index)
+                seen.add(key)
+            if conflicts:
+                raise SlotConflictError("Slots já ocupados", conflicts)
+
+            stored = [{**plant, "version": 1} for plant in plants]
+            self._append_many([{"op": "put", "plant": plant} for plant in stored])
+            for plant in stored:
+                self._apply_put(plant)
+            self._maybe_compact()
+            return stored
+
+    def update(self, plant_id, changes, expected_version=None):
+        """
+        Actualiza campos de uma planta; devolve a planta ou None se não existir
+        Com `expected_version`, falha se a planta já tiver sido alterada (CAS)
+        """
+        with self._write_lock():
+            current = self._plants.get(plant_id)
+            if current is None:
+                return None
+
+            version = current.get("version", 0)
+            if expected_version is not None and int(expected_version) != version:
+                raise VersionConflictError(
+                    f"A planta foi alterada entretanto (versão actual: {version})"
+                )
+
+            updated = {**current, **changes, "id": plant_id, "version": version + 1}
+            key = slot_key(updated)
+            owner = self._slots.get(key) if key is not None else None
+            if owner is not None and owner != plant_id:
+                raise SlotConflictError("Este slot já está ocupado")
+
+            self._append({"op": "put", "plant": updated})
+            self._apply_put(updated)
+            self._maybe_compact()
+            return updated
+
+    def delete(self, plant_id):
+        """Remove uma planta; devolve True se existia"""
+        with self._write_lock():
+            if plant_id not in self._plants:
+                return False
+
+            self._append({"op": "del", "id": plant_id})
+            self._apply_delete(plant_id)
+            self._maybe_compact()
+            return True
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        Lock exclusivo entre processos, reentrante dentro do mesmo store
+        Ao entrar, sincroniza os índices com o que outros escritores gravaram
+        """
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+
+        lock_path = self.path.with_name(self.path.name + ".lock")
+        with open(lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                _acquire(lock_file)
+            self._lock_depth = 1
+            try:
+                if self._stat_key is not None or self.path.exists():
+                    self.refresh()
+                yield
+            finally:
+                self._lock_depth = 0
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Log e índices
+    # ------------------------------------------------------------------
+
+    def _record_change(self, plant_id):
+        self.generation += 1
+        self._journal.append(plant_id)
+
+    def _apply_put(self, plant):
+        plant_id = plant["id"]
+        self._record_change(plant_id)
+        previous = self._plants.get(plant_id)
+        if previous is not None:
+            self._garbage += 1
+            old_key = slot_key(previous)
+            if old_key is not None and self._slots.get(old_key) == plant_id:
+                del self._slots[old_key]
+
+        self._plants[plant_id] = plant
+        key = slot_key(plant)
+        if key is not None:
+            self._slots[key] = plant_id
+        self._ordered = None
+
+    def _apply_delete(self, plant_id):
+        previous = self._plants.pop(plant_id, None)
+        if previous is None:
+            return
+        self._record_change(plant_id)
+        # O put original e o próprio registo de remoção ficam mortos
+        self._garbage += 2
+        key = slot_key(previous)
+        if key is not None and self._slots.get(key) == plant_id:
+            del self._slots[key]
+        self._ordered = None
+
+    def _ensure_ordered(self):
+        """
+        Constrói os índices ordenados de uma vez (O(n log n)) se não existirem
+        Uma mutação só os descarta (O(1)), em vez de os manter com insort, que
+        desloca O(n) elementos por planta inserida ou alterada
+        """
+        if self._ordered is None:
+            floors = {}
+            for andar, slot in self._slots:
+                floors.setdefault(andar, []).append(slot)
+            for slots in floors.values():
+                slots.sort()
+            self._ordered = {
+                "ids": sorted(self._plants),
+                "names": sorted((name_key(p), p["id"]) for p in self._plants.values()),
+                "floors": floors,
+            }
+        return self._ordered
+
+    def _apply(self, record):
+        if record.get("op") == "put":
+            self._apply_put(record["plant"])
+        elif record.get("op") == "del":
+            self._apply_delete(record["id"])
+
+    def _reset(self):
+        self._plants.clear()
+        self._slots.clear()
+        self._ordered = None
+        self._garbage = 0
+        self._offset = 0
+        # Quem acompanhava o journal tem de recomeçar do zero
+        self.generation += 1
+        self._journal.clear()
+        self._journal_base = self.generation
+
+    def _replay(self):
+        """Reconstrói os índices a partir do log; devolve a chave do ficheiro lido"""
+        self._reset()
+        with open(self.path, 'rb') as f:
+            return self._read_tail(f)
+
+    def _read_tail(self, f):
+        """
+        Aplica os registos completos do ficheiro aberto `f` escritos depois de
+        `self._offset`. A chave (inode, tamanho, mtime) devolvida vem do fstat
+        do mesmo descritor, pelo que descreve exactamente o que foi lido
+        """
+        st = os.fstat(f.fileno())
+        f.seek(self._offset)
+        chunk = f.read(max(st.st_size - self._offset, 0))
+
+        end = chunk.rfind(b"\n") + 1
+        self._torn = end < len(chunk)
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Linha corrompida por uma escrita interrompida
+                continue
+            self._apply(record)
+        self._offset += end
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _current_stat_key(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def refresh(self):
+        """
+        Sincroniza os índices com o log no disco
+        Devolve "hit" (nada mudou), "tail" (só registos novos) ou "reload"
+        """
+        if self._current_stat_key() == self._stat_key:
+            return "hit"
+
+        # A decisão e a leitura usam o mesmo descritor: uma compactação entre
+        # o stat() acima e o open() não pode fazer ler o ficheiro novo a
+        # partir do offset do antigo
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._reset()
+            self._stat_key = None
+            return "reload"
+
+        with f:
+            st = os.fstat(f.fileno())
+            old = self._stat_key
+            if old is not None and st.st_ino == old[0] and st.st_size >= self._offset:
+                # Mesmo ficheiro, só cresceu: ler apenas o que foi acrescentado
+                result = "tail"
+            else:
+                # Ficheiro substituído (compactação) ou truncado
+                self._reset()
+                result = "reload"
+            self._stat_key = self._read_tail(f)
+        return result
+
+    def _append(self, record):
+        self._append_many([record])
+
+    def _append_many(self, records):
+        line = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        )
+        if self._torn:
+            # Isolar a linha incompleta deixada por uma escrita interrompida
+            line = "\n" + line
+            self._torn = False
+        data = line.encode('utf-8')
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            self._offset = f.tell()
+        self._stat_key = self._current_stat_key()
+
+    def _maybe_compact(self):
+        if self._garbage >= COMPACT_MIN_GARBAGE and self._garbage > len(self._plants):
+            self.compact()
+
+    def compact(self):
+        """Reescreve o log apenas com o estado vivo (temp + rename atómico)"""
+        with self._write_lock():
+            tmp_path = self.path.with_name(self.path.name + ".compact")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for plant in self._plants.values():
+                    record = {"op": "put", "plant": plant}
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._garbage = 0
+            self._torn = False
+            self._offset = os.path.getsize(self.path)
+            self._stat_key = self._current_stat_key()
+
+    def _import_legacy(self, legacy_path):
+        """Importa o documento JSON antigo ({"plants": [...]}) para o log"""
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+
+        for plant in data.get("plants", []):
+            if "id" in plant:
+                self._apply_put(plant)
+        self.compact()
+
+
+def _acquire(lock_file):
+    """Tenta obter o lock com backoff exponencial até LOCK_TIMEOUT"""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    delay = LOCK_RETRY_DELAY
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                raise StoreBusyError("Base de dados ocupada, tente novamente")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+def open_store(path=LOG_FILE):
+    """
+    Abre o store de plantas partilhado pelas funções
+    Reutiliza o store em cache se o log não mudou desde a última invocação
+    """
+    path = Path(path)
+    store = _STORES.get(path)
+
+    if store is None:
+        store = PlantStore(path)
+        _STORES[path] = store
+        _CACHE_STATS["misses"] += 1
+        return store
+
+    result = store.refresh()
+    if result == "hit":
+        _CACHE_STATS["hits"] += 1
+    elif result == "tail":
+        _CACHE_STATS["tail_reads"] += 1
+    else:
+        _CACHE_STATS["misses"] += 1
+    return store
+
+
+def cache_stats():
+    """Contadores da cache de stores (hits, misses, tail_reads)"""
+    return dict(_CACHE_STATS)
+
+
+def clear_cache():
+    """Esquece todos os stores em cache (o próximo acesso relê o log)"""
+    _STORES.clear()
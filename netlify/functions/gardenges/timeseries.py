@@ -0,0 +1,264 @@
+"""
+GardenGes - Séries temporais dos sensores
+Ingestão das leituras num ring buffer binário (memory-mapped) por andar,
+com agregados móveis de 1h/24h/7d mantidos em O(1) por amostra
+
+Layout de cada ficheiro (little-endian, registos de largura fixa):
+    cabeçalho   magic, capacidade, próxima posição, nº de amostras, último ts
+    EMA         média exponencial por janela e métrica
+    buckets     por janela, B buckets com contagem, soma, mínimo e máximo
+    ring        `capacidade` registos (ts, humidade, temperatura, luz)
+
+Cada amostra actualiza a EMA e um bucket por janela; ler os agregados só
+percorre os buckets (60 + 96 + 168), nunca as amostras em bruto.
+"""
+
+import math
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): sem lock entre processos
+    fcntl = None
+
+# Directório dos ficheiros (um por andar)
+SERIES_DIR = Path(os.environ.get("GARDENGES_SERIES_DIR", "/tmp/gardenges_series"))
+
+# Capacidade do ring buffer (amostras por andar): 7 dias a 1 amostra/minuto
+SERIES_CAPACITY = int(os.environ.get("GARDENGES_SERIES_CAPACITY", str(7 * 24 * 60)))
+
+METRICS = ("humidity", "temperature", "light")
+
+# Janelas: (nome, duração em segundos, nº de buckets)
+WINDOWS = (
+    ("1h", 3600, 60),        # buckets de 1 minuto
+    ("24h", 86400, 96),      # buckets de 15 minutos
+    ("7d", 604800, 168),     # buckets de 1 hora
+)
+
+# Valores em float64: as leituras voltam tal como chegaram (55.3, não
+# 55.29999923706055). "GGT2" substitui o formato antigo em float32 ("GGTS"),
+# que é reinicializado ao abrir
+MAGIC = b"GGT2"
+HEADER = struct.Struct("<4sIIId")
+EMA = struct.Struct("<" + "d" * (len(WINDOWS) * len(METRICS)))
+BUCKET = struct.Struct("<dI" + "ddd" * len(METRICS))
+RECORD = struct.Struct("<d" + "d" * len(METRICS))
+
+EMA_OFFSET = HEADER.size
+BUCKETS_OFFSET = EMA_OFFSET + EMA.size
+RING_OFFSET = BUCKETS_OFFSET + BUCKET.size * sum(b for _, _, b in WINDOWS)
+
+_EMPTY_BUCKET = (0.0, 0) + (0.0, math.inf, -math.inf) * len(METRICS)
+
+# Séries abertas (mmap reutilizado entre invocações no mesmo container)
+_series = {}
+
+
+class FloorSeries:
+    """Ring buffer e agregados de um andar"""
+
+    def __init__(self, path, capacity=SERIES_CAPACITY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, 'r+b')
+        with self._locked():
+            size = os.fstat(fd).st_size
+            if size < RING_OFFSET:
+                self._initialize(capacity)
+            else:
+                header = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+                if header[0] != MAGIC:
+                    self._initialize(capacity)
+            self._map = mmap.mmap(fd, 0)
+        self.capacity = self._header()[1]
+
+    def _initialize(self, capacity):
+        fd = self._file.fileno()
+        os.ftruncate(fd, 0)
+        os.ftruncate(fd, RING_OFFSET + RECORD.size * capacity)
+        os.pwrite(fd, HEADER.pack(MAGIC, capacity, 0, 0, 0.0), 0)
+        empty = BUCKET.pack(*_EMPTY_BUCKET)
+        total = sum(b for _, _, b in WINDOWS)
+        os.pwrite(fd, empty * total, BUCKETS_OFFSET)
+
+    @contextmanager
+    def _locked(self, exclusive=True):
+        """Lock exclusivo para escrever, partilhado para ler"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _header(self):
+        return HEADER.unpack_from(self._map, 0)
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def append(self, ts, values):
+        """
+        Acrescenta uma amostra (O(1)); `values` segue a ordem de METRICS
+        Amostras mais antigas do que a última são ignoradas
+        """
+        with self._locked():
+            _, capacity, head, count, last_ts = self._header()
+            if count and ts <= last_ts:
+                return False
+
+            RECORD.pack_into(self._map, RING_OFFSET + head * RECORD.size, ts, *values)
+
+            # Médias exponenciais: constante de tempo igual à duração da janela
+            emas = list(EMA.unpack_from(self._map, EMA_OFFSET))
+            dt = ts - last_ts
+            for w, (_, seconds, _) in enumerate(WINDOWS):
+                alpha = 1.0 if not count else 1.0 - math.exp(-dt / seconds)
+                for m, value in enumerate(values):
+                    i = w * len(METRICS) + m
+                    emas[i] += alpha * (value - emas[i])
+            EMA.pack_into(self._map, EMA_OFFSET, *emas)
+
+            # Um bucket por janela
+            offset = BUCKETS_OFFSET
+            for _, seconds, buckets in WINDOWS:
+                width = seconds / buckets
+                start = math.floor(ts / width) * width
+                position = offset + (int(start / width) % buckets) * BUCKET.size
+                bucket = list(BUCKET.unpack_from(self._map, position))
+                if bucket[0] != start or not bucket[1]:
+                    bucket = [start, 0] + [0.0, math.inf, -math.inf] * len(METRICS)
+                bucket[1] += 1
+                for m, value in enumerate(values):
+                    base = 2 + m * 3
+                    bucket[base] += value
+                    bucket[base + 1] = min(bucket[base + 1], value)
+                    bucket[base + 2] = max(bucket[base + 2], value)
+                BUCKET.pack_into(self._map, position, *bucket)
+                offset += buckets * BUCKET.size
+
+            HEADER.pack_into(
+                self._map, 0, MAGIC, capacity, (head + 1) % capacity,
+                min(count + 1, capacity), ts
+            )
+            return True
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return self._header()[3]
+
+    def latest(self):
+        """Última amostra como (ts, {métrica: valor}), ou None"""
+        with self._locked(exclusive=False):
+            _, capacity, head, count, _ = self._header()
+            if not count:
+                return None
+            position = RING_OFFSET + ((head - 1) % capacity) * RECORD.size
+            record = RECORD.unpack_from(self._map, position)
+        return record[0], dict(zip(METRICS, record[1:]))
+
+    def samples(self, since=None):
+        """Amostras em bruto (ordem cronológica), opcionalmente desde `since`"""
+        _, capacity, head, count, _ = self._header()
+        for k in range(count):
+            index = (head - count + k) % capacity
+            record = RECORD.unpack_from(self._map, RING_OFFSET + index * RECORD.size)
+            if since is None or record[0] >= since:
+                yield record[0], dict(zip(METRICS, record[1:]))
+
+    def aggregates(self, now=None):
+        """
+        Agregados por janela: {janela: {métrica: {min, max, mean, ema}, "count": n}}
+        Só lê os buckets; o bucket mais antigo pode cobrir parte da janela
+        """
+        now = time.time() if now is None else now
+        with self._locked(exclusive=False):
+            if not len(self):
+                return {}
+            emas = EMA.unpack_from(self._map, EMA_OFFSET)
+            raw_buckets = self._map[BUCKETS_OFFSET:RING_OFFSET]
+
+        result = {}
+        offset = 0
+        for w, (name, seconds, buckets) in enumerate(WINDOWS):
+            width = seconds / buckets
+            count = 0
+            sums = [0.0] * len(METRICS)
+            mins = [math.inf] * len(METRICS)
+            maxs = [-math.inf] * len(METRICS)
+            for b in range(buckets):
+                bucket = BUCKET.unpack_from(raw_buckets, offset + b * BUCKET.size)
+                start, n = bucket[0], bucket[1]
+                if not n or start + width <= now - seconds or start > now:
+                    continue
+                count += n
+                for m in range(len(METRICS)):
+                    base = 2 + m * 3
+                    sums[m] += bucket[base]
+                    mins[m] = min(mins[m], bucket[base + 1])
+                    maxs[m] = max(maxs[m], bucket[base + 2])
+            offset += buckets * BUCKET.size
+
+            window = {"count": count}
+            for m, metric in enumerate(METRICS):
+                window[metric] = {
+                    "min": round(mins[m], 2) if count else None,
+                    "max": round(maxs[m], 2) if count else None,
+                    "mean": round(sums[m] / count, 2) if count else None,
+                    "ema": round(emas[w * len(METRICS) + m], 2)
+                }
+            result[name] = window
+        return result
+
+
+def open_series(floor):
+    """Série de um andar (aberta uma vez por container)"""
+    series = _series.get(floor)
+    if series is None:
+        series = FloorSeries(SERIES_DIR / f"floor_{floor}.bin")
+        _series[floor] = series
+    return series
+
+
+def ingest_readings(sensors, ts=None):
+    """
+    Regista as leituras {andar: {"humidity", "temperature", "light"}}
+    Devolve o nº de amostras gravadas
+    """
+    ts = time.time() if ts is None else ts
+    written = 0
+    for floor, reading in sensors.items():
+        values = [float(reading.get(metric) or 0) for metric in METRICS]
+        if open_series(int(floor)).append(ts, values):
+            written += 1
+    return written
+
+
+def latest_readings(floors, max_age=None):
+    """Última leitura de cada andar (com no máximo `max_age` segundos)"""
+    now = time.time()
+    readings = {}
+    for floor in floors:
+        latest = open_series(floor).latest()
+        if latest and (max_age is None or now - latest[0] <= max_age):
+            readings[floor] = latest[1]
+    return readings
+
+
+def floor_aggregates(floors, now=None):
+    """Agregados móveis de vários andares"""
+    return {floor: open_series(floor).aggregates(now) for floor in floors}
@@ -0,0 +1,166 @@
+"""
+GardenGes - Topologia da instalação
+Modelo site → torre → andar → slot, carregado uma vez por container
+
+Cada andar tem um ID global (o campo `andar` das plantas), único em toda a
+instalação; sites e torres agrupam andares. Sem configuração, a topologia é a
+estufa original: um site, uma torre e os andares 1 a 3 com 12 slots.
+
+Configuração (JSON) em GARDENGES_TOPOLOGY ou num ficheiro indicado em
+GARDENGES_TOPOLOGY_FILE:
+
+    {"sites": [{"id": "casa", "towers": [
+        {"id": "estufa", "floors": [
+            {"id": 1, "slots": 12, "device": "1000abcd"},
+            {"id": 2}, {"id": 3}
+        ]}
+    ]}]}
+"""
+
+import json
+import os
+import re
+
+DEFAULT_SITE = "default"
+DEFAULT_TOWER = "default"
+DEFAULT_FLOORS = (1, 2, 3)
+DEFAULT_SLOTS = 12  # 6 colunas x 2 linhas
+
+_topology = None
+
+
+class Floor:
+    """Andar de uma torre, com o sensor eWeLink que o serve"""
+
+    __slots__ = ("id", "site", "tower", "level", "slots", "device_id", "_tag_re", "_name_re")
+
+    def __init__(self, floor_id, site, tower, level, slots=DEFAULT_SLOTS, device_id=""):
+        self.id = floor_id
+        self.site = site
+        self.tower = tower
+        self.level = level
+        self.slots = slots
+        self.device_id = device_id
+
+        # Detecção por tags ("floor_1", "andar_1") ou nome ("1º andar", "floor 1");
+        # o número não pode continuar noutro dígito ("floor 1" ≠ "floor 12")
+        self._tag_re = re.compile(rf"(?:floor|andar)_{floor_id}(?!\d)")
+        self._name_re = re.compile(rf"(?:floor|andar)[ _]{floor_id}(?!\d)|(?<!\d){floor_id}º")
+
+    def matches_tags(self, tags_text):
+        return self._tag_re.search(tags_text) is not None
+
+    def matches_name(self, name):
+        return self._name_re.search(name) is not None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "site": self.site,
+            "tower": self.tower,
+            "level": self.level,
+            "slots": self.slots
+        }
+
+
+class Topology:
+    """Índice de andares por ID, por site/torre e por dispositivo"""
+
+    def __init__(self, floors):
+        self.floors = {floor.id: floor for floor in floors}
+        self._by_device = {f.device_id: f.id for f in floors if f.device_id}
+
+    def floor_ids(self, site=None, tower=None):
+        """IDs dos andares, opcionalmente de um só site/torre"""
+        return [
+            floor.id for floor in self.floors.values()
+            if (site is None or floor.site == site) and (tower is None or floor.tower == tower)
+        ]
+
+    def site_of(self, floor_id):
+        floor = self.floors.get(floor_id)
+        return floor.site if floor else None
+
+    def site_map(self):
+        """Site de cada andar: {andar: site}"""
+        return {floor_id: floor.site for floor_id, floor in self.floors.items()}
+
+    def empty_readings(self):
+        """Leituras a zero para todos os andares"""
+        return {floor_id: {"humidity": 0, "temperature": 0, "light": 0} for floor_id in self.floors}
+
+    def floor_for_device(self, device_id, name="", tags=None):
+        """
+        Determina o andar de um dispositivo: primeiro pelos IDs configurados,
+        depois pelas tags e por fim pelo nome
+        """
+        floor_id = self._by_device.get(device_id)
+        if floor_id is not None:
+            return floor_id
+
+        tags_text = str(tags or {})
+        for floor in self.floors.values():
+            if floor.matches_tags(tags_text):
+                return floor.id
+        for floor in self.floors.values():
+            if floor.matches_name(name):
+                return floor.id
+        return None
+
+    def to_dict(self):
+        return {"floors": [floor.to_dict() for floor in self.floors.values()]}
+
+
+def _configured_device(floor_id, declared=""):
+    # A variável de ambiente tem prioridade sobre o ficheiro de topologia
+    return os.environ.get(f"EWELINK_DEVICE_FLOOR_{floor_id}", "") or declared or ""
+
+
+def _default_topology():
+    return Topology([
+        Floor(floor_id, DEFAULT_SITE, DEFAULT_TOWER, level, device_id=_configured_device(floor_id))
+        for level, floor_id in enumerate(DEFAULT_FLOORS, start=1)
+    ])
+
+
+def parse_topology(config):
+    """Constrói a topologia a partir da configuração JSON (já descodificada)"""
+    floors = []
+    for site in config.get("sites", []):
+        site_id = str(site.get("id", DEFAULT_SITE))
+        for tower in site.get("towers", []):
+            tower_id = str(tower.get("id", DEFAULT_TOWER))
+            for level, floor in enumerate(tower.get("floors", []), start=1):
+                floor_id = int(floor["id"])
+                floors.append(Floor(
+                    floor_id,
+                    site_id,
+                    tower_id,
+                    int(floor.get("level", level)),
+                    int(floor.get("slots", DEFAULT_SLOTS)),
+                    _configured_device(floor_id, floor.get("device", ""))
+                ))
+
+    ids = [floor.id for floor in floors]
+    if len(set(ids)) != len(ids):
+        raise ValueError("IDs de andar repetidos na topologia")
+    return Topology(floors)
+
+
+def load_topology():
+    """Topologia da instalação (lida uma vez e reutilizada no container)"""
+    global _topology
+    if _topology is None:
+        raw = os.environ.get("GARDENGES_TOPOLOGY")
+        path = os.environ.get("GARDENGES_TOPOLOGY_FILE")
+        if not raw and path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        _topology = parse_topology(json.loads(raw)) if raw else _default_topology()
+    return _topology
+
+
+def reset_topology():
+    """Força nova leitura da configuração no próximo acesso"""
+    global _topology
+    _topology = None
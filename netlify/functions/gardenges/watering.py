@@ -0,0 +1,184 @@
+"""
+GardenGes - Motor de Rega
+Cálculo das necessidades de rega em lote, por colunas
+
+As plantas e as leituras dos sensores são convertidas em colunas (arrays
+NumPy ou, sem NumPy, buffers do módulo `array`) e a diferença, ml, gotas,
+sprays, estado e resumo são calculados numa única passagem. Os dicts por
+planta só são construídos quando alguém os pede.
+"""
+
+from array import array
+
+from gardenges.lazy import optional
+
+# NumPy é opcional (sem ele: buffers `array` e um ciclo simples); importado
+# só na primeira avaliação, para não pesar no cold start
+np = optional("numpy")
+
+# Constantes de cálculo
+ML_PER_PERCENT = 2.0  # ml de água por % de humidade a subir
+DROPPER_ML = 0.55  # ml por gota (padrão)
+SPRAY_ML = 0.55  # ml por spray de pulverizador
+
+# Valores por omissão (planta sem target, andar sem sensor)
+DEFAULT_HUMIDITY = 50
+DEFAULT_TARGET = 65
+
+# Diferença máxima (%) para uma rega leve
+LIGHT_WATER_MAX_DIFF = 5
+
+# Estados, pela ordem dos códigos guardados na coluna `status`
+STATUSES = ("ok", "light_water", "needs_water")
+
+
+class WateringResult:
+    """Resultado de uma avaliação em lote (colunas + resumo)"""
+
+    def __init__(self, plants, current, target, ml, drops, sprays, status, summary):
+        self.plants = plants
+        self.current = current    # humidade actual por planta (valores originais)
+        self.target = target      # humidade alvo por planta (valores originais)
+        self.ml = ml
+        self.drops = drops
+        self.sprays = sprays
+        self.status = status      # códigos: índice em STATUSES
+        self.summary = summary
+        self._recommendations = None
+
+    def __len__(self):
+        return len(self.plants)
+
+    def recommendation(self, i):
+        """Dict de recomendação para a planta na posição `i`"""
+        plant = self.plants[i]
+        status = STATUSES[self.status[i]]
+        current = self.current[i]
+        target = self.target[i]
+
+        if status == "ok":
+            ml_needed, drops, sprays = 0, 0, 0
+            message = "Humidade adequada"
+        else:
+            ml_needed = float(self.ml[i])
+            drops = int(self.drops[i])
+            sprays = int(self.sprays[i])
+            if status == "light_water":
+                message = f"Rega leve: {sprays} spray(s) ({ml_needed}ml)"
+            else:
+                message = f"Regar: {sprays} spray(s) ({ml_needed}ml)"
+
+        return {
+            "plant_id": plant["id"],
+            "plant_name": plant["nome"],
+            "floor": plant.get("andar"),
+            "slot": plant.get("slot_index"),
+            "current_humidity": current,
+            "target_humidity": target,
+            "difference": target - current,
+            "ml_needed": ml_needed,
+            "drops_needed": drops,
+            "sprays_needed": sprays,
+            "status": status,
+            "message": message
+        }
+
+    def recommendations(self):
+        """Lista completa de recomendações (construída uma vez, a pedido)"""
+        if self._recommendations is None:
+            self._recommendations = [self.recommendation(i) for i in range(len(self.plants))]
+        return self._recommendations
+
+    def grouped_summary(self, labels):
+        """
+        Resumo por grupo numa só passagem sobre as colunas
+        `labels` tem o grupo de cada planta (ex.: o site do seu andar)
+        """
+        groups = {}
+        for i, label in enumerate(labels):
+            counts = groups.get(label)
+            if counts is None:
+                counts = groups[label] = [0, 0, 0, 0.0]
+            code = self.status[i]
+            counts[code] += 1
+            if code:
+                counts[3] += float(self.ml[i])
+        return {
+            str(label): _summary(sum(c[:3]), c, c[3]) for label, c in groups.items()
+        }
+
+    def needing_water(self):
+        """Recomendações apenas das plantas que precisam de água"""
+        if self._recommendations is not None:
+            return [r for r in self._recommendations if r["status"] != "ok"]
+        return [self.recommendation(i) for i in range(len(self.plants)) if self.status[i]]
+
+
+def _columns(plants, sensors):
+    """Extrai as colunas de humidade actual e alvo"""
+    humidity_by_floor = {
+        floor: sensor.get("humidity", DEFAULT_HUMIDITY) for floor, sensor in sensors.items()
+    }
+    current = [humidity_by_floor.get(p.get("andar"), DEFAULT_HUMIDITY) for p in plants]
+    target = [p.get("targets_humidade", DEFAULT_TARGET) for p in plants]
+    return current, target
+
+
+def _evaluate_numpy(current, target):
+    diff = np.asarray(target, dtype=np.float64) - np.asarray(current, dtype=np.float64)
+    thirsty = diff > 0
+    ml = np.where(thirsty, np.round(diff * ML_PER_PERCENT, 1), 0.0)
+    drops = np.rint(ml / DROPPER_ML)
+    sprays = np.rint(ml / SPRAY_ML)
+    status = thirsty.astype(np.int8) + (diff > LIGHT_WATER_MAX_DIFF)
+    counts = np.bincount(status, minlength=len(STATUSES))
+    summary = _summary(len(diff), counts.tolist(), float(ml.sum()))
+    return ml, drops, sprays, status, summary
+
+
+def _evaluate_array(current, target):
+    n = len(current)
+    ml = array('d', bytes(8 * n))
+    drops = array('l', bytes(array('l').itemsize * n))
+    sprays = array('l', bytes(array('l').itemsize * n))
+    status = array('b', bytes(n))
+    counts = [0, 0, 0]
+    total_ml = 0.0
+
+    for i in range(n):
+        diff = target[i] - current[i]
+        if diff <= 0:
+            counts[0] += 1
+            continue
+        code = 1 if diff <= LIGHT_WATER_MAX_DIFF else 2
+        ml_needed = round(diff * ML_PER_PERCENT, 1)
+        ml[i] = ml_needed
+        drops[i] = round(ml_needed / DROPPER_ML)
+        sprays[i] = round(ml_needed / SPRAY_ML)
+        status[i] = code
+        counts[code] += 1
+        total_ml += ml_needed
+
+    return ml, drops, sprays, status, _summary(n, counts, total_ml)
+
+
+def _summary(total, counts, total_ml):
+    return {
+        "total_plants": total,
+        "needs_water": counts[2],
+        "light_water": counts[1],
+        "ok": counts[0],
+        "total_ml_needed": round(total_ml, 1)
+    }
+
+
+def evaluate(plants, sensors):
+    """
+    Avalia as necessidades de rega de todas as plantas numa só passagem
+    Fórmula: (Target - Atual) * ML_PER_PERCENT / DROPPER_ML
+    """
+    plants = plants if isinstance(plants, list) else list(plants)
+    current, target = _columns(plants, sensors)
+    engine = _evaluate_numpy if np is not None else _evaluate_array
+    ml, drops, sprays, status, summary = engine(current, target)
+    return WateringResult(plants, current, target, ml, drops, sprays, status, summary)
@@ -0,0 +1,42 @@
+"""
+GardenGes - Notification Status API
+Netlify Function para consultar o estado das mensagens na outbox de notificações
+"""
+
+# Perfil de imports do cold start (só com GARDENGES_PROFILE_IMPORTS=1): tem de
+# arrancar antes dos restantes imports
+from gardenges import profiling
+profiling.start()
+
+from gardenges import outbox
+from gardenges.responses import cors_headers, error, preflight, respond
+
+
+def handler(event, context):
+    """Handler principal da função Netlify"""
+
+    headers = cors_headers("GET, OPTIONS")
+
+    early = preflight(event, headers, "GET")
+    if early:
+        return early
+
+    try:
+        # Cada consulta garante que o drainer está a correr neste container
+        outbox.start_drainer()
+
+        params = event.get("queryStringParameters") or {}
+        message_id = params.get("id")
+
+        # Sem ID: contagem de mensagens por estado
+        if not message_id:
+            return respond(headers, 200, {"outbox": outbox.stats()})
+
+        message = outbox.status(message_id)
+        if message is None:
+            return error(headers, 404, "Mensagem não encontrada")
+
+        return respond(headers, 200, message)
+
+    except Exception as e:
+        return error(headers, 500, str(e))
@@ -3,114 +3,297 @@ GardenGes - Plants API
 Netlify Function para gerir dados das plantas
 """
 
+# Perfil de imports do cold start (só com GARDENGES_PROFILE_IMPORTS=1): tem de
+# arrancar antes dos restantes imports
+from gardenges import profiling
+profiling.start()
+
 import json
 import os
 from datetime import datetime
-from pathlib import Path
 
-# Simular base de dados com ficheiro JSON
+from gardenges.ids import new_id
+from gardenges.lazy import lazy
+from gardenges.responses import cors_headers, error, preflight, respond
+from gardenges.store import (
+    SlotConflictError,
+    StoreBusyError,
+    VersionConflictError,
+    open_store,
+)
+
+base64 = lazy("base64")
+
+# Simular base de dados com log append-only em /tmp (ver gardenges/store.py)
 # Em produção, usar uma base de dados real (Supabase, PlanetScale, etc.)
-DATA_FILE = Path("/tmp/plants_data.json")
 
 
-def get_plants_data():
-    """Carrega dados do ficheiro JSON"""
-    if DATA_FILE.exists():
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"plants": []}
+# Campos obrigatórios para criar uma planta
+REQUIRED_FIELDS = ["nome", "andar", "slot_index", "data_inicio", "ciclo_total", "targets_humidade"]
+
+# Campos guardados como inteiros (o índice por slot depende de andar/slot_index)
+NUMERIC_FIELDS = ("andar", "slot_index", "ajuste_dias", "ciclo_total", "targets_humidade")
+
+
+# Paginação do GET /plants
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
+# Parâmetros que activam a consulta paginada
+QUERY_PARAMS = ("andar", "slot_min", "slot_max", "prefix", "limit", "cursor", "fields")
 
-def save_plants_data(data):
-    """Guarda dados no ficheiro JSON"""
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def get_plants_data():
+    """Carrega dados do store de plantas"""
+    return {"plants": open_store().all()}
 
 
 def generate_id():
-    """Gera ID único baseado em timestamp"""
-    return str(int(datetime.now().timestamp() * 1000))
+    """Gera ID único e ordenável no tempo (ver gardenges/ids.py)"""
+    return new_id()
+
+
+def missing_field(body):
+    """Devolve o primeiro campo obrigatório em falta, ou None"""
+    for field in REQUIRED_FIELDS:
+        if field not in body:
+            return field
+    return None
+
+
+def build_plant(body):
+    """Cria o registo de uma nova planta a partir do body do pedido"""
+    return {
+        "id": generate_id(),
+        "nome": body["nome"],
+        "andar": int(body["andar"]),
+        "slot_index": int(body["slot_index"]),
+        "data_inicio": body["data_inicio"],
+        "ajuste_dias": int(body.get("ajuste_dias", 0)),
+        "ciclo_total": int(body["ciclo_total"]),
+        "targets_humidade": int(body["targets_humidade"]),
+        "created_at": datetime.now().isoformat()
+    }
+
+
+def build_changes(body):
+    """
+    Alterações de um PUT, com os campos numéricos convertidos como em
+    build_plant (TypeError/ValueError se algum não for um inteiro)
+    ID e versão não podem ser alterados
+    """
+    changes = {key: value for key, value in body.items() if key not in ("id", "version")}
+    for field in NUMERIC_FIELDS:
+        if field in changes:
+            changes[field] = int(changes[field])
+    changes["updated_at"] = datetime.now().isoformat()
+    return changes
+
+
+def parse_expected_version(value):
+    """
+    Versão esperada a partir do If-Match (ETag: "3", W/"3" ou *) ou do body
+    Devolve None sem verificação de versão; ValueError se não for um inteiro
+    """
+    if value is None or type(value) is int:
+        return value
+    value = str(value).strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    return int(value.strip('"'))
+
+
+def is_ndjson(event):
+    """Verifica se o pedido usa JSON Lines (Content-Type ou ?format=ndjson)"""
+    query = event.get("queryStringParameters") or {}
+    request_headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    content_type = request_headers.get("content-type", "")
+    return query.get("format") == "ndjson" or "ndjson" in content_type
+
+
+def parse_batch(event):
+    """
+    Lê um lote de plantas do body: NDJSON, array JSON ou {"plants": [...]}
+    Devolve None se o pedido for de uma única planta; ValueError se o body
+    não for um objecto nem um array
+    """
+    raw = event.get("body") or ""
+    if is_ndjson(event):
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+    body = json.loads(raw or "{}")
+    if not isinstance(body, (dict, list)):
+        raise ValueError("esperado um objecto ou um array")
+    if isinstance(body, list):
+        return body
+    if isinstance(body.get("plants"), list):
+        return body["plants"]
+    return None
+
+
+def encode_cursor(key):
+    """Cursor opaco a partir da chave de ordenação da última planta"""
+    raw = json.dumps(key, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Chave de ordenação a partir do cursor"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+
+
+def optional_int(query, name):
+    value = query.get(name)
+    return int(value) if value not in (None, "") else None
+
+
+def query_plants(query):
+    """
+    GET /plants com filtros, projecção e paginação por cursor
+    ?andar=1&slot_min=0&slot_max=11&prefix=tom&fields=nome,slot_index&limit=50&cursor=...
+    """
+    limit = optional_int(query, "limit") or DEFAULT_PAGE_SIZE
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = query.get("cursor")
+
+    plants, next_key = open_store().query(
+        andar=optional_int(query, "andar"),
+        slot_min=optional_int(query, "slot_min"),
+        slot_max=optional_int(query, "slot_max"),
+        prefix=query.get("prefix") or None,
+        after=decode_cursor(cursor) if cursor else None,
+        limit=limit,
+    )
+
+    fields = [f.strip() for f in (query.get("fields") or "").split(",") if f.strip()]
+    if fields:
+        # O ID é sempre devolvido para permitir PUT/DELETE
+        wanted = ["id"] + [f for f in fields if f != "id"]
+        plants = [{f: plant[f] for f in wanted if f in plant} for plant in plants]
+
+    return {
+        "plants": plants,
+        "count": len(plants),
+        "next_cursor": encode_cursor(next_key) if next_key is not None else None
+    }
+
+
+def export_ndjson(plants):
+    """
+    Exportação em NDJSON, uma planta por linha
+    As Netlify Functions em Python devolvem respostas buffered (o body é uma
+    string única), por isso a exportação é montada inteira em memória
+    """
+    return "".join(json.dumps(plant, ensure_ascii=False) + "\n" for plant in plants)
+
+
+def batch_handler(items, headers):
+    """
+    Importa um lote de plantas: valida tudo numa passagem e grava uma só vez
+    Se alguma planta for inválida ou estiver em conflito, nada é gravado
+    """
+    if not items:
+        return error(headers, 400, "Lote vazio: nenhuma planta para adicionar")
+
+    errors = []
+    new_plants = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "Planta inválida"})
+            continue
+        field = missing_field(item)
+        if field:
+            errors.append({"index": index, "error": f"Campo obrigatório em falta: {field}"})
+            continue
+        try:
+            new_plants.append(build_plant(item))
+        except (TypeError, ValueError):
+            errors.append({"index": index, "error": "Valor numérico inválido"})
+
+    if errors:
+        return respond(headers, 400, {"error": "Lote inválido", "errors": errors}, ensure_ascii=False)
+
+    try:
+        stored = open_store().insert_many(new_plants)
+    except SlotConflictError as e:
+        errors = [{"index": index, "error": "Este slot já está ocupado"} for index in e.conflicts]
+        return respond(headers, 409, {"error": str(e), "errors": errors}, ensure_ascii=False)
+
+    return respond(headers, 201, {
+        "plants": stored,
+        "count": len(stored),
+        "message": f"{len(stored)} planta(s) adicionada(s) com sucesso"
+    }, ensure_ascii=False)
 
 
 def handler(event, context):
     """Handler principal da função Netlify"""
     
     # Headers CORS
-    headers = {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type",
-        "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-        "Content-Type": "application/json"
-    }
+    headers = cors_headers("GET, POST, PUT, DELETE, OPTIONS", "Content-Type, If-Match")
     
     # Handle preflight
-    if event.get("httpMethod") == "OPTIONS":
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": ""
-        }
+    early = preflight(event, headers)
+    if early:
+        return early
     
     method = event.get("httpMethod", "GET")
     path = event.get("path", "")
     
     try:
+        # GET /plants?format=ndjson - Exportar todas as plantas (JSON Lines)
+        if method == "GET" and is_ndjson(event):
+            ndjson_headers = {**headers, "Content-Type": "application/x-ndjson"}
+            return respond(ndjson_headers, 200, export_ndjson(open_store().iter_plants()))
+        
+        # GET /plants?andar=...&limit=... - Consulta paginada
+        elif method == "GET" and any(p in (event.get("queryStringParameters") or {}) for p in QUERY_PARAMS):
+            try:
+                data = query_plants(event["queryStringParameters"])
+            except (TypeError, ValueError):
+                return error(headers, 400, "Parâmetros de consulta inválidos")
+            return respond(headers, 200, data, ensure_ascii=False)
+        
         # GET /plants - Listar todas as plantas
-        if method == "GET":
+        elif method == "GET":
             data = get_plants_data()
-            return {
-                "statusCode": 200,
-                "headers": headers,
-                "body": json.dumps(data, ensure_ascii=False)
-            }
+            return respond(headers, 200, data, ensure_ascii=False)
         
-        # POST /plants - Adicionar nova planta
+        # POST /plants - Adicionar nova planta (ou lote: array, {"plants": [...]} ou NDJSON)
         elif method == "POST":
+            try:
+                batch = parse_batch(event)
+            except ValueError:
+                return error(headers, 400, "JSON inválido no body do request")
+            if batch is not None:
+                return batch_handler(batch, headers)
+            
             body = json.loads(event.get("body", "{}"))
             
             # Validar campos obrigatórios
-            required_fields = ["nome", "andar", "slot_index", "data_inicio", "ciclo_total", "targets_humidade"]
-            for field in required_fields:
-                if field not in body:
-                    return {
-                        "statusCode": 400,
-                        "headers": headers,
-                        "body": json.dumps({"error": f"Campo obrigatório em falta: {field}"})
-                    }
+            field = missing_field(body)
+            if field:
+                return error(headers, 400, f"Campo obrigatório em falta: {field}")
             
             # Criar nova planta
-            new_plant = {
-                "id": generate_id(),
-                "nome": body["nome"],
-                "andar": int(body["andar"]),
-                "slot_index": int(body["slot_index"]),
-                "data_inicio": body["data_inicio"],
-                "ajuste_dias": int(body.get("ajuste_dias", 0)),
-                "ciclo_total": int(body["ciclo_total"]),
-                "targets_humidade": int(body["targets_humidade"]),
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Guardar
-            data = get_plants_data()
-            
-            # Verificar se slot já está ocupado
-            for plant in data["plants"]:
-                if plant["andar"] == new_plant["andar"] and plant["slot_index"] == new_plant["slot_index"]:
-                    return {
-                        "statusCode": 409,
-                        "headers": headers,
-                        "body": json.dumps({"error": "Este slot já está ocupado"})
-                    }
+            try:
+                new_plant = build_plant(body)
+            except (TypeError, ValueError):
+                return error(headers, 400, "Valor numérico inválido")
             
-            data["plants"].append(new_plant)
-            save_plants_data(data)
+            # Guardar (o índice por slot rejeita slots ocupados)
+            try:
+                new_plant = open_store().insert(new_plant)
+            except SlotConflictError as e:
+                return error(headers, 409, str(e))
             
-            return {
-                "statusCode": 201,
-                "headers": headers,
-                "body": json.dumps({"plant": new_plant, "message": "Planta adicionada com sucesso"})
-            }
+            return respond(headers, 201, {
+                "plant": new_plant,
+                "message": "Planta adicionada com sucesso"
+            })
         
         # PUT /plants/{id} - Atualizar planta
         elif method == "PUT":
@@ -119,42 +302,37 @@ def handler(event, context):
             plant_id = path_parts[-1] if len(path_parts) > 0 else None
             
             if not plant_id:
-                return {
-                    "statusCode": 400,
-                    "headers": headers,
-                    "body": json.dumps({"error": "ID da planta não fornecido"})
-                }
+                return error(headers, 400, "ID da planta não fornecido")
             
             body = json.loads(event.get("body", "{}"))
-            data = get_plants_data()
+            if not isinstance(body, dict):
+                return error(headers, 400, "JSON inválido no body do request")
+            
+            # Versão esperada (optimistic locking): header If-Match ou campo no body
+            request_headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+            expected_version = body.pop("expected_version", None)
+            if expected_version is None:
+                expected_version = request_headers.get("if-match")
+            try:
+                expected_version = parse_expected_version(expected_version)
+            except ValueError:
+                return error(headers, 400, "Versão esperada inválida (If-Match ou expected_version)")
             
-            # Encontrar e atualizar planta
-            plant_found = False
-            for i, plant in enumerate(data["plants"]):
-                if plant["id"] == plant_id:
-                    # Atualizar apenas campos fornecidos
-                    for key, value in body.items():
-                        if key != "id":  # Não permitir alterar ID
-                            data["plants"][i][key] = value
-                    data["plants"][i]["updated_at"] = datetime.now().isoformat()
-                    plant_found = True
-                    updated_plant = data["plants"][i]
-                    break
+            # Atualizar apenas campos fornecidos (não permitir alterar ID nem versão)
+            try:
+                changes = build_changes(body)
+            except (TypeError, ValueError):
+                return error(headers, 400, "Valor numérico inválido")
             
-            if not plant_found:
-                return {
-                    "statusCode": 404,
-                    "headers": headers,
-                    "body": json.dumps({"error": "Planta não encontrada"})
-                }
+            try:
+                updated_plant = open_store().update(plant_id, changes, expected_version)
+            except (SlotConflictError, VersionConflictError) as e:
+                return error(headers, 409, str(e))
             
-            save_plants_data(data)
+            if updated_plant is None:
+                return error(headers, 404, "Planta não encontrada")
             
-            return {
-                "statusCode": 200,
-                "headers": headers,
-                "body": json.dumps({"plant": updated_plant, "message": "Planta atualizada"})
-            }
+            return respond(headers, 200, {"plant": updated_plant, "message": "Planta atualizada"})
         
         # DELETE /plants/{id} - Remover planta
         elif method == "DELETE":
@@ -162,47 +340,19 @@ def handler(event, context):
             plant_id = path_parts[-1] if len(path_parts) > 0 else None
             
             if not plant_id:
-                return {
-                    "statusCode": 400,
-                    "headers": headers,
-                    "body": json.dumps({"error": "ID da planta não fornecido"})
-                }
-            
-            data = get_plants_data()
-            original_count = len(data["plants"])
-            data["plants"] = [p for p in data["plants"] if p["id"] != plant_id]
-            
-            if len(data["plants"]) == original_count:
-                return {
-                    "statusCode": 404,
-                    "headers": headers,
-                    "body": json.dumps({"error": "Planta não encontrada"})
-                }
+                return error(headers, 400, "ID da planta não fornecido")
             
-            save_plants_data(data)
+            if not open_store().delete(plant_id):
+                return error(headers, 404, "Planta não encontrada")
             
-            return {
-                "statusCode": 200,
-                "headers": headers,
-                "body": json.dumps({"message": "Planta removida com sucesso"})
-            }
+            return respond(headers, 200, {"message": "Planta removida com sucesso"})
         
         else:
-            return {
-                "statusCode": 405,
-                "headers": headers,
-                "body": json.dumps({"error": "Método não permitido"})
-            }
+            return error(headers, 405, "Método não permitido")
     
     except json.JSONDecodeError:
-        return {
-            "statusCode": 400,
-            "headers": headers,
-            "body": json.dumps({"error": "JSON inválido no body do request"})
-        }
+        return error(headers, 400, "JSON inválido no body do request")
+    except StoreBusyError as e:
+        return error({**headers, "Retry-After": "1"}, 503, str(e))
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": headers,
-            "body": json.dumps({"error": f"Erro interno: {str(e)}"})
-        }
+        return error(headers, 500, f"Erro interno: {str(e)}")
@@ -0,0 +1,116 @@
+"""
+GardenGes - Sensor History API (Python)
+Netlify Function para consultar o histórico local dos sensores por andar
+
+Lê os rollups de gardenges/history.py: cada pedido usa o tier mais grosseiro
+que ainda dá o nº de pontos pedido (ex.: 30d com 300 pontos → tier "hour").
+"""
+
+# Perfil de imports do cold start (só com GARDENGES_PROFILE_IMPORTS=1): tem de
+# arrancar antes dos restantes imports
+from gardenges import profiling
+profiling.start()
+
+import time
+from datetime import datetime, timezone
+
+from gardenges import history
+from gardenges.responses import cors_headers, error, preflight, respond
+from gardenges.topology import load_topology
+
+# Ranges suportados (os mesmos de get-history.js), em segundos
+RANGES = {"24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+DEFAULT_RANGE = "24h"
+
+# Nº de pontos por omissão e máximo do gráfico
+DEFAULT_POINTS = 300
+MAX_POINTS = 5000
+
+# Nomes das métricas na resposta (compatíveis com get-history.js)
+FIELDS = {"temperature": "temperatura", "humidity": "humidade", "light": "luz"}
+DATA_FIELDS = {"temperature": "temperatura_c", "humidity": "humidade_perc", "light": "luz"}
+
+
+def floor_history(floor, range_name, points, now=None):
+    """Série e estatísticas de um andar no range pedido"""
+    end = time.time() if now is None else now
+    start = end - RANGES[range_name]
+    floor_data = history.open_history(floor, create=False)
+    if floor_data is None:
+        # Andar sem leituras registadas: série vazia, sem criar ficheiros
+        resolution, width = history.tier_for(start, end, points=points)
+        return {
+            "range": range_name,
+            "floor": floor,
+            "resolution": resolution,
+            "bucket_seconds": width,
+            "count": 0,
+            "stats": {FIELDS[metric]: empty for metric, empty in history.empty_stats().items()},
+            "data": []
+        }
+    tier, columns = floor_data.query(start, end, points=points)
+    timestamps, values = history.series(tier, columns)
+
+    data = [
+        {
+            "timestamp": datetime.fromtimestamp(float(ts), timezone.utc).isoformat(),
+            **{
+                DATA_FIELDS[metric]: round(float(values[metric][i]), 1)
+                for metric in history.METRICS
+            }
+        }
+        for i, ts in enumerate(timestamps)
+    ]
+    stats = history.stats(tier, columns)
+
+    return {
+        "range": range_name,
+        "floor": floor,
+        "resolution": tier.name,
+        "bucket_seconds": tier.width,
+        "count": len(data),
+        "stats": {FIELDS[metric]: stats[metric] for metric in history.METRICS},
+        "data": data
+    }
+
+
+def handler(event, context):
+    """Handler principal da função Netlify"""
+
+    headers = cors_headers("GET, OPTIONS")
+
+    early = preflight(event, headers, "GET")
+    if early:
+        return early
+
+    if not history.available():
+        return error(headers, 501, "Histórico indisponível (NumPy não instalado)")
+
+    params = event.get("queryStringParameters") or {}
+    range_name = params.get("range", DEFAULT_RANGE)
+    if range_name not in RANGES:
+        range_name = DEFAULT_RANGE
+
+    try:
+        points = min(max(int(params.get("points", DEFAULT_POINTS)), 1), MAX_POINTS)
+        floors = load_topology().floor_ids()
+        if params.get("floor"):
+            floor = int(params["floor"])
+            # Só andares da topologia: cada andar consultado teria ficheiros próprios
+            if floor not in floors:
+                return error(headers, 404, "Andar não encontrado")
+            floors = [floor]
+    except ValueError:
+        return error(headers, 400, "Parâmetros inválidos (floor e points são inteiros)")
+
+    try:
+        now = time.time()
+        floors_history = [floor_history(floor, range_name, points, now) for floor in floors]
+        body = floors_history[0] if params.get("floor") else {
+            "range": range_name,
+            "floors": floors_history
+        }
+        return respond(headers, 200, body)
+
+    except Exception as e:
+        return error(headers, 500, str(e))
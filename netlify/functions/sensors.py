@@ -3,33 +3,180 @@ GardenGes - Sensors API (eWeLink Integration)
 Netlify Function para obter dados dos sensores via eWeLink API
 """
 
+# Perfil de imports do cold start (só com GARDENGES_PROFILE_IMPORTS=1): tem de
+# arrancar antes dos restantes imports
+from gardenges import profiling
+profiling.start()
+
 import json
 import os
-import requests
 from datetime import datetime
-import hashlib
-import hmac
-import base64
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): só lock dentro do processo
+    fcntl = None
+
+from gardenges import forecast, history, httpclient
+from gardenges.lazy import lazy
+from gardenges.responses import cors_headers, error, preflight, respond
+from gardenges.timeseries import floor_aggregates, ingest_readings
+from gardenges.topology import load_topology
+
+# Assinatura dos pedidos e hash do inventário: só importados quando usados
+base64 = lazy("base64")
+hashlib = lazy("hashlib")
+hmac = lazy("hmac")
 
 # Configuração eWeLink
-EWELINK_API_URL = "https://eu-apia.coolkit.cc"  # Servidor Europa
+EWELINK_API_URL = os.environ.get("EWELINK_API_URL", "https://eu-apia.coolkit.cc")  # Servidor Europa
 # Alternativas: cn-apia.coolkit.cc (China), us-apia.coolkit.cc (EUA)
 
+# Leitura de status em paralelo: nº de pedidos simultâneos, timeout por pedido
+# e prazo global (segundos) após o qual se devolvem resultados parciais
+STATUS_MAX_WORKERS = int(os.environ.get("EWELINK_STATUS_WORKERS", "8"))
+STATUS_CALL_TIMEOUT = float(os.environ.get("EWELINK_STATUS_TIMEOUT", "5"))
+STATUS_DEADLINE = float(os.environ.get("EWELINK_STATUS_DEADLINE", "8"))
+
+# Pool reutilizado entre invocações no mesmo container
+_status_executor = None
+
+# Registar também as leituras mock na série temporal (demo/desenvolvimento)
+INGEST_MOCK = os.environ.get("GARDENGES_INGEST_MOCK", "") == "1"
+
+# Cache do access token: em memória (container "warm") e em ficheiro local
+TOKEN_CACHE_FILE = Path(os.environ.get("EWELINK_TOKEN_CACHE_FILE", "/tmp/ewelink_token.json"))
+TOKEN_TTL = float(os.environ.get("EWELINK_TOKEN_TTL", str(30 * 24 * 3600)))  # at válido 30 dias
+TOKEN_REFRESH_MARGIN = float(os.environ.get("EWELINK_TOKEN_REFRESH_MARGIN", "3600"))
+
+# Códigos de erro da API que indicam token inválido ou expirado
+AUTH_ERROR_CODES = {401, 402}
+
+# Cache do inventário de dispositivos (thingList) e do mapa device_id -> andar
+DEVICE_CACHE_TTL = float(os.environ.get("EWELINK_DEVICE_CACHE_TTL", "900"))
+
+_token_cache = {"token": None, "account": None, "obtained_at": 0.0}
+_device_registry = {"devices": None, "fetched_at": 0.0, "hash": None, "floor_map": {}}
+_token_lock = threading.Lock()
+
+
+# Credenciais necessárias para o login (sem elas, dados mock)
+CREDENTIAL_VARS = ("EWELINK_EMAIL", "EWELINK_PASSWORD", "EWELINK_APP_ID", "EWELINK_APP_SECRET")
+
+
+def ewelink_configured():
+    """Indica se as credenciais eWeLink estão todas definidas"""
+    return all(os.environ.get(name) for name in CREDENTIAL_VARS)
+
+
+def _token_account():
+    """Identifica a conta das credenciais actuais (a cache não passa entre contas)"""
+    raw = f"{os.environ.get('EWELINK_EMAIL')}:{os.environ.get('EWELINK_APP_ID')}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _token_is_fresh(entry, account):
+    # Renovar proactivamente TOKEN_REFRESH_MARGIN segundos antes de expirar
+    age = time.time() - entry.get("obtained_at", 0)
+    return bool(entry.get("token")) and entry.get("account") == account \
+        and age < TOKEN_TTL - TOKEN_REFRESH_MARGIN
+
+
+def _cached_token(account):
+    """Token válido da memória ou, em cold start, do ficheiro local"""
+    if _token_cache["token"] is None and TOKEN_CACHE_FILE.exists():
+        try:
+            with open(TOKEN_CACHE_FILE, 'r', encoding='utf-8') as f:
+                _token_cache.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    if _token_is_fresh(_token_cache, account):
+        return _token_cache["token"]
+    return None
+
+
+def _save_token(token, account):
+    _token_cache.update({"token": token, "account": account, "obtained_at": time.time()})
+    try:
+        tmp_path = TOKEN_CACHE_FILE.with_name(TOKEN_CACHE_FILE.name + ".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(_token_cache, f)
+        os.replace(tmp_path, TOKEN_CACHE_FILE)
+    except OSError as e:
+        print(f"Não foi possível guardar a cache do token: {e}")
+
+
+def invalidate_ewelink_token(token):
+    """Esquece o token (ex.: a API respondeu com erro de autenticação)"""
+    with _token_lock:
+        if _token_cache["token"] == token:
+            _token_cache.update({"token": None, "obtained_at": 0.0})
+            try:
+                TOKEN_CACHE_FILE.unlink()
+            except OSError:
+                pass
+
+
+def is_token_valid(token):
+    """Indica se o token ainda não foi invalidado"""
+    return bool(token) and _token_cache["token"] == token
+
 
 def get_ewelink_token():
     """
-    Obtém token de autenticação da eWeLink
+    Obtém token de autenticação da eWeLink, reutilizando o token em cache
+    Só um pedido de login de cada vez (single-flight): os restantes esperam
+    e usam o token obtido pelo primeiro
+    Sem credenciais (modo mock) devolve None sem tocar na cache nem no lock
+    """
+    if not ewelink_configured():
+        return None
+
+    account = _token_account()
+    token = _cached_token(account)
+    if token:
+        return token
+
+    with _token_lock:
+        lock_file = None
+        if fcntl is not None:
+            lock_file = open(TOKEN_CACHE_FILE.with_name(TOKEN_CACHE_FILE.name + ".lock"), 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Outro pedido (ou processo) pode ter renovado entretanto
+            _token_cache["token"] = None
+            token = _cached_token(account)
+            if token:
+                return token
+
+            token = login_ewelink()
+            if token:
+                _save_token(token, account)
+            return token
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+
+def login_ewelink():
+    """
+    Faz login na eWeLink e devolve um novo access token
     Requer EWELINK_EMAIL, EWELINK_PASSWORD e EWELINK_APP_ID nas env vars
     """
+    if not ewelink_configured():
+        return None
+    
     email = os.environ.get("EWELINK_EMAIL")
     password = os.environ.get("EWELINK_PASSWORD")
     app_id = os.environ.get("EWELINK_APP_ID")
     app_secret = os.environ.get("EWELINK_APP_SECRET")
     
-    if not all([email, password, app_id, app_secret]):
-        return None
-    
     try:
         # Timestamp em milissegundos
         ts = str(int(time.time() * 1000))
@@ -56,7 +203,7 @@ def get_ewelink_token():
             "countryCode": "+351"  # Portugal
         }
         
-        response = requests.post(
+        response = httpclient.post(
             f"{EWELINK_API_URL}/v2/user/login",
             headers=headers,
             json=payload,
@@ -90,7 +237,7 @@ def get_ewelink_devices(token):
             "Authorization": f"Bearer {token}"
         }
         
-        response = requests.get(
+        response = httpclient.get(
             f"{EWELINK_API_URL}/v2/device/thing",
             headers=headers,
             timeout=10
@@ -99,6 +246,8 @@ def get_ewelink_devices(token):
         data = response.json()
         if data.get("error") == 0:
             return data.get("data", {}).get("thingList", [])
+        if data.get("error") in AUTH_ERROR_CODES:
+            invalidate_ewelink_token(token)
         
         return []
         
@@ -107,7 +256,7 @@ def get_ewelink_devices(token):
         return []
 
 
-def get_device_status(token, device_id):
+def get_device_status(token, device_id, timeout=10):
     """
     Obtém status atual de um dispositivo específico
     """
@@ -123,16 +272,18 @@ def get_device_status(token, device_id):
             "Authorization": f"Bearer {token}"
         }
         
-        response = requests.get(
+        response = httpclient.get(
             f"{EWELINK_API_URL}/v2/device/thing/status",
             headers=headers,
             params={"type": 1, "id": device_id},
-            timeout=10
+            timeout=timeout
         )
         
         data = response.json()
         if data.get("error") == 0:
             return data.get("data", {}).get("params", {})
+        if data.get("error") in AUTH_ERROR_CODES:
+            invalidate_ewelink_token(token)
         
         return None
         
@@ -141,51 +292,135 @@ def get_device_status(token, device_id):
         return None
 
 
-def parse_sensor_data(devices, device_status_map):
+def get_devices_status(token, device_ids, deadline=STATUS_DEADLINE):
     """
-    Converte dados dos dispositivos eWeLink para formato da aplicação
-    Usa IDs configurados nas variáveis de ambiente ou detecta por nome/tags
+    Obtém o status de vários dispositivos em paralelo (pool limitado)
+    Cada pedido tem STATUS_CALL_TIMEOUT; ao fim de `deadline` devolve o que
+    já chegou. Devolve (status_map, timed_out, failed)
     """
-    sensors = {
-        1: {"humidity": 0, "temperature": 0, "light": 0},
-        2: {"humidity": 0, "temperature": 0, "light": 0},
-        3: {"humidity": 0, "temperature": 0, "light": 0}
-    }
-    
-    # IDs configurados manualmente (têm prioridade)
-    configured_devices = {
-        1: os.environ.get("EWELINK_DEVICE_FLOOR_1", ""),
-        2: os.environ.get("EWELINK_DEVICE_FLOOR_2", ""),
-        3: os.environ.get("EWELINK_DEVICE_FLOOR_3", "")
+    global _status_executor
+    device_ids = [d for d in device_ids if d]
+    if not token or not device_ids:
+        return {}, [], []
+
+    if _status_executor is None:
+        _status_executor = ThreadPoolExecutor(
+            max_workers=STATUS_MAX_WORKERS, thread_name_prefix="ewelink-status"
+        )
+
+    futures = {
+        _status_executor.submit(get_device_status, token, device_id, STATUS_CALL_TIMEOUT): device_id
+        for device_id in device_ids
     }
-    
+    done, pending = wait(futures, timeout=deadline)
+
+    status_map = {}
+    failed = []
+    for future in done:
+        device_id = futures[future]
+        status = future.result()
+        if status:
+            status_map[device_id] = status
+        else:
+            failed.append(device_id)
+
+    timed_out = []
+    for future in pending:
+        future.cancel()  # Se ainda estiver na fila, não chega a ser enviado
+        timed_out.append(futures[future])
+
+    return status_map, sorted(timed_out), sorted(failed)
+
+
+def fetch_devices_status(token, device_ids):
+    """
+    get_devices_status com renovação do token: se o token foi rejeitado
+    durante o fan-out (ex.: inventário vindo da cache com o token expirado),
+    obtém um novo e repete uma vez o pedido para os dispositivos que falharam
+    Devolve (token, status_map, timed_out, failed)
+    """
+    status_map, timed_out, failed = get_devices_status(token, device_ids)
+    if failed and not is_token_valid(token):
+        token = get_ewelink_token()
+        if token:
+            retried, retry_timed_out, failed = get_devices_status(token, failed)
+            status_map.update(retried)
+            timed_out = sorted(timed_out + retry_timed_out)
+    return token, status_map, timed_out, failed
+
+
+def build_floor_map(devices):
+    """
+    Mapa device_id -> andar
+    Usa IDs configurados nas variáveis de ambiente ou detecta por nome/tags
+    """
+    topology = load_topology()
+    floor_map = {}
     for device in devices:
         device_id = device.get("itemData", {}).get("deviceid")
         name = device.get("itemData", {}).get("name", "").lower()
         tags = device.get("itemData", {}).get("tags", {})
         
-        # Determinar andar: primeiro verifica IDs configurados
-        floor = None
-        for floor_num, configured_id in configured_devices.items():
-            if configured_id and device_id == configured_id:
-                floor = floor_num
-                break
-        
-        # Se não configurado, tenta detectar pelo nome ou tags
-        if not floor:
-            for tag_name in ["floor_1", "floor_2", "floor_3", "andar_1", "andar_2", "andar_3"]:
-                if tag_name in str(tags) or tag_name.replace("_", " ") in name:
-                    floor = int(tag_name[-1])
-                    break
-        
-        # Também verificar "1º andar", "2º andar", etc.
-        if not floor:
-            for i in [1, 2, 3]:
-                if f"{i}º" in name or f"andar {i}" in name or f"floor {i}" in name:
-                    floor = i
-                    break
-        
-        if floor and device_id in device_status_map:
+        # Determinar andar: IDs configurados, depois tags e por fim o nome
+        floor = topology.floor_for_device(device_id, name, tags)
+        if device_id and floor:
+            floor_map[device_id] = floor
+    return floor_map
+
+
+def _inventory_hash(devices):
+    """Hash dos campos do inventário que influenciam o mapa de andares"""
+    inventory = sorted(
+        (
+            d.get("itemData", {}).get("deviceid") or "",
+            d.get("itemData", {}).get("name", ""),
+            json.dumps(d.get("itemData", {}).get("tags", {}), sort_keys=True)
+        )
+        for d in devices
+    )
+    return hashlib.sha256(json.dumps(inventory).encode()).hexdigest()
+
+
+def get_device_registry(token, force_refresh=False):
+    """
+    Inventário de dispositivos em cache durante DEVICE_CACHE_TTL segundos
+    O mapa de andares só é recalculado quando o hash do inventário muda.
+    Devolve (devices, floor_map)
+    """
+    registry = _device_registry
+    fresh = time.time() - registry["fetched_at"] < DEVICE_CACHE_TTL
+    if registry["devices"] is not None and fresh and not force_refresh:
+        return registry["devices"], registry["floor_map"]
+
+    devices = get_ewelink_devices(token)
+    if not devices:
+        # Falha temporária: manter o inventário anterior se o token for válido
+        if registry["devices"] and is_token_valid(token):
+            return registry["devices"], registry["floor_map"]
+        return [], {}
+
+    inventory_hash = _inventory_hash(devices)
+    if inventory_hash != registry["hash"]:
+        registry["floor_map"] = build_floor_map(devices)
+        registry["hash"] = inventory_hash
+    registry["devices"] = devices
+    registry["fetched_at"] = time.time()
+    return devices, registry["floor_map"]
+
+
+def parse_sensor_data(devices, device_status_map, floor_map=None):
+    """
+    Converte dados dos dispositivos eWeLink para formato da aplicação
+    Os andares vêm da topologia da instalação (gardenges/topology.py); com
+    `floor_map` (device_id -> andar) já calculado, não há detecção por nome/tags
+    """
+    topology = load_topology()
+    sensors = topology.empty_readings()
+    if floor_map is None:
+        floor_map = build_floor_map(devices)
+    
+    for device_id, floor in floor_map.items():
+        if floor in sensors and device_id in device_status_map:
             status = device_status_map[device_id]
             
             # Sensores TH (temperatura/humidade)
@@ -209,6 +444,39 @@ def parse_sensor_data(devices, device_status_map):
     return sensors
 
 
+def reported_floors(device_status_map, floor_map, skipped=()):
+    """
+    Andares com uma leitura real de humidade: o dispositivo respondeu (não
+    está em `skipped`, i.e. timed_out/failed) e o status traz a humidade
+    Só estes são registados; os restantes ficam a zero na resposta mas não
+    podem entrar nas séries, senão a rega veria humidade 0 e alertaria
+    """
+    skipped = set(skipped)
+    floors = set()
+    for device_id, floor in floor_map.items():
+        status = device_status_map.get(device_id)
+        if device_id in skipped or not status:
+            continue
+        for field in ("currentHumidity", "humidity"):
+            try:
+                float(status[field])
+            except (KeyError, TypeError, ValueError):
+                continue
+            floors.add(floor)
+            break
+    return floors
+
+
+# Valores base dos dados mock por andar:
+# (humidade, fase e período da variação, temperatura, luz, amplitude da luz)
+MOCK_BASE = {
+    1: (55, 0, 10, 23, 800, 100),
+    2: (62, 3, 8, 22, 720, 80),
+    3: (58, 5, 12, 24, 650, 50)
+}
+MOCK_DEFAULT = (58, 0, 10, 23, 700, 80)
+
+
 def get_mock_sensor_data():
     """
     Dados mock para desenvolvimento/demo
@@ -218,23 +486,36 @@ def get_mock_sensor_data():
     
     base_time = int(time.time())
     
-    return {
-        1: {
-            "humidity": 55 + random.randint(-5, 5) + (base_time % 10),
-            "temperature": 23 + random.uniform(-1, 1),
-            "light": 800 + random.randint(-100, 100)
-        },
-        2: {
-            "humidity": 62 + random.randint(-5, 5) + ((base_time + 3) % 8),
-            "temperature": 22 + random.uniform(-1, 1),
-            "light": 720 + random.randint(-80, 80)
-        },
-        3: {
-            "humidity": 58 + random.randint(-5, 5) + ((base_time + 5) % 12),
-            "temperature": 24 + random.uniform(-1, 1),
-            "light": 650 + random.randint(-50, 50)
+    sensors = {}
+    for floor in load_topology().floor_ids():
+        humidity, phase, period, temperature, light, spread = MOCK_BASE.get(floor, MOCK_DEFAULT)
+        sensors[floor] = {
+            "humidity": humidity + random.randint(-5, 5) + ((base_time + phase) % period),
+            "temperature": temperature + random.uniform(-1, 1),
+            "light": light + random.randint(-spread, spread)
         }
-    }
+    return sensors
+
+
+def aggregates_for(query):
+    """Agregados móveis (1h/24h/7d) por andar, se pedidos com ?aggregates=1"""
+    if query.get("aggregates") not in ("1", "true"):
+        return None
+    return floor_aggregates(load_topology().floor_ids())
+
+
+def record_readings(sensors):
+    """
+    Acrescenta as leituras à série temporal e ao histórico de cada andar e
+    actualiza o modelo de secagem (sem falhar o pedido)
+    """
+    try:
+        ts = time.time()
+        ingest_readings(sensors, ts)
+        history.append_readings(sensors, ts)
+        forecast.update_models(sensors, ts)
+    except Exception as e:
+        print(f"Erro ao registar leituras: {e}")
 
 
 def list_devices_handler(headers):
@@ -245,35 +526,35 @@ def list_devices_handler(headers):
     token = get_ewelink_token()
     
     if not token:
-        return {
-            "statusCode": 401,
-            "headers": headers,
-            "body": json.dumps({
-                "error": "Não foi possível autenticar no eWeLink",
-                "help": "Verifica EWELINK_EMAIL, EWELINK_PASSWORD, EWELINK_APP_ID e EWELINK_APP_SECRET"
-            })
-        }
+        return respond(headers, 401, {
+            "error": "Não foi possível autenticar no eWeLink",
+            "help": "Verifica EWELINK_EMAIL, EWELINK_PASSWORD, EWELINK_APP_ID e EWELINK_APP_SECRET"
+        })
     
-    devices = get_ewelink_devices(token)
+    # Listagem para descoberta de dispositivos: ignorar a cache do inventário
+    devices, _ = get_device_registry(token, force_refresh=True)
+    if not devices and not is_token_valid(token):
+        # Token rejeitado pela API: renovar uma vez
+        token = get_ewelink_token()
+        devices, _ = get_device_registry(token, force_refresh=True)
     
     if not devices:
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
-                "devices": [],
-                "message": "Nenhum dispositivo encontrado na conta"
-            })
-        }
+        return respond(headers, 200, {
+            "devices": [],
+            "message": "Nenhum dispositivo encontrado na conta"
+        })
+    
+    # Obter status atual de todos os dispositivos em paralelo
+    token, device_status_map, timed_out, failed = fetch_devices_status(
+        token, [device.get("itemData", {}).get("deviceid", "") for device in devices]
+    )
     
     # Formatar lista de dispositivos
     device_list = []
     for device in devices:
         item = device.get("itemData", {})
         device_id = item.get("deviceid", "")
-        
-        # Obter status atual
-        status = get_device_status(token, device_id)
+        status = device_status_map.get(device_id)
         
         device_list.append({
             "id": device_id,
@@ -285,36 +566,23 @@ def list_devices_handler(headers):
             "config_example": f'EWELINK_DEVICE_FLOOR_X={device_id}'
         })
     
-    return {
-        "statusCode": 200,
-        "headers": headers,
-        "body": json.dumps({
-            "devices": device_list,
-            "total": len(device_list),
-            "instructions": "Copia o ID do dispositivo para o .env no campo EWELINK_DEVICE_FLOOR_1, _2 ou _3"
-        }, indent=2)
-    }
+    return respond(headers, 200, json.dumps({
+        "devices": device_list,
+        "total": len(device_list),
+        "timed_out": timed_out,
+        "failed": failed,
+        "instructions": "Copia o ID do dispositivo para o .env no campo EWELINK_DEVICE_FLOOR_<andar> (ex.: EWELINK_DEVICE_FLOOR_1)"
+    }, indent=2))
 
 
 def handler(event, context):
     """Handler principal da função Netlify"""
     
-    headers = {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type",
-        "Access-Control-Allow-Methods": "GET, OPTIONS",
-        "Content-Type": "application/json"
-    }
-    
-    if event.get("httpMethod") == "OPTIONS":
-        return {"statusCode": 200, "headers": headers, "body": ""}
+    headers = cors_headers("GET, OPTIONS")
     
-    if event.get("httpMethod") != "GET":
-        return {
-            "statusCode": 405,
-            "headers": headers,
-            "body": json.dumps({"error": "Apenas GET é permitido"})
-        }
+    early = preflight(event, headers, "GET")
+    if early:
+        return early
     
     # Verificar se é pedido para listar dispositivos
     path = event.get("path", "")
@@ -328,47 +596,49 @@ def handler(event, context):
         token = get_ewelink_token()
         
         if token:
-            devices = get_ewelink_devices(token)
+            devices, floor_map = get_device_registry(token)
+            if not devices and not is_token_valid(token):
+                # Token rejeitado pela API: renovar uma vez
+                token = get_ewelink_token()
+                devices, floor_map = get_device_registry(token) if token else ([], {})
             
             if devices:
-                # Obter status de cada dispositivo
-                device_status_map = {}
-                for device in devices:
-                    device_id = device.get("itemData", {}).get("deviceid")
-                    if device_id:
-                        status = get_device_status(token, device_id)
-                        if status:
-                            device_status_map[device_id] = status
+                # Obter em paralelo o status dos dispositivos associados a um andar
+                token, device_status_map, timed_out, failed = fetch_devices_status(
+                    token, list(floor_map)
+                )
                 
-                sensors = parse_sensor_data(devices, device_status_map)
+                sensors = parse_sensor_data(devices, device_status_map, floor_map)
+                # Registar só os andares cujo sensor respondeu com humidade
+                reported = reported_floors(device_status_map, floor_map, timed_out + failed)
+                record_readings({
+                    floor: reading for floor, reading in sensors.items() if floor in reported
+                })
                 
-                return {
-                    "statusCode": 200,
-                    "headers": headers,
-                    "body": json.dumps({
-                        "sensors": sensors,
-                        "source": "ewelink",
-                        "timestamp": datetime.now().isoformat()
-                    })
-                }
+                return respond(headers, 200, {
+                    "sensors": sensors,
+                    "aggregates": aggregates_for(query),
+                    "topology": load_topology().to_dict(),
+                    "source": "ewelink",
+                    "partial": bool(timed_out or failed),
+                    "timed_out": timed_out,
+                    "failed": failed,
+                    "timestamp": datetime.now().isoformat()
+                })
         
         # Fallback para dados mock
         sensors = get_mock_sensor_data()
+        if INGEST_MOCK:
+            record_readings(sensors)
         
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
-                "sensors": sensors,
-                "source": "mock",
-                "timestamp": datetime.now().isoformat(),
-                "note": "Dados simulados. Configure EWELINK_* env vars para dados reais."
-            })
-        }
+        return respond(headers, 200, {
+            "sensors": sensors,
+            "aggregates": aggregates_for(query),
+            "topology": load_topology().to_dict(),
+            "source": "mock",
+            "timestamp": datetime.now().isoformat(),
+            "note": "Dados simulados. Configure EWELINK_* env vars para dados reais."
+        })
         
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": headers,
-            "body": json.dumps({"error": f"Erro interno: {str(e)}"})
-        }
+        return error(headers, 500, f"Erro interno: {str(e)}")
@@ -14,8 +14,8 @@ CREATE TABLE IF NOT EXISTS plants (
   id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
   user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
   nome VARCHAR(255) NOT NULL,
-  andar INTEGER NOT NULL CHECK (andar >= 1 AND andar <= 3),
-  slot_index INTEGER NOT NULL CHECK (slot_index >= 0 AND slot_index < 12),
+  andar INTEGER NOT NULL CHECK (andar >= 1),  -- ID global do andar na topologia
+  slot_index INTEGER NOT NULL CHECK (slot_index >= 0),  -- limite por andar definido na topologia
   data_inicio DATE NOT NULL DEFAULT CURRENT_DATE,
   ajuste_dias INTEGER DEFAULT 0,
   ciclo_total INTEGER NOT NULL DEFAULT 60,